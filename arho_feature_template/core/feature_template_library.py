@@ -1,101 +1,196 @@
 from __future__ import annotations
 
 import logging
-from collections import defaultdict
-
-from qgis.core import QgsFeature, QgsProject, QgsVectorLayer
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsCoordinateTransform,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsProject,
+    QgsTask,
+    QgsVectorLayer,
+)
 from qgis.gui import QgsMapToolDigitizeFeature
-from qgis.PyQt.QtCore import QItemSelectionModel
+from qgis.PyQt.QtCore import QItemSelectionModel, QObject, QTimer, pyqtSignal
 from qgis.PyQt.QtGui import QStandardItem, QStandardItemModel
 from qgis.utils import iface
 
-from arho_feature_template.core.template_library_config import (
-    FeatureTemplate,
-    TemplateLibraryConfig,
-    TemplateLibraryVersionError,
-    TemplateSyntaxError,
-    parse_template_library_config,
+from arho_feature_template.core.feature_tree_writer import (
+    FeatureTreeWriteError,
+    build_feature_tree,
+    stamp_template,
+    write_feature_tree,
+)
+from arho_feature_template.core.layer_registry import (
+    LayerNotFoundError,
+    LayerNotVectorTypeError,
+    get_layer_from_project,
+    get_layer_registry,
 )
+from arho_feature_template.core.template_edit_session import DEFERRED_COMMIT_SETTING, TemplateEditSession
+from arho_feature_template.core.template_library_cache import TemplateLibraryCache
+from arho_feature_template.core.template_library_loader import TemplateLibraryLoadTask, TemplateTrigramIndexTask
+from arho_feature_template.core.template_search import TemplateSearchIndex
+from arho_feature_template.core.template_validation import TemplateValidator
 from arho_feature_template.gui.template_attribute_form import TemplateAttributeForm
-from arho_feature_template.gui.template_dock import TemplateLibraryDock
-from arho_feature_template.resources.template_libraries import library_config_files
+from arho_feature_template.gui.template_dock import TemplateFilterProxyModel, TemplateLibraryDock
+from arho_feature_template.gui.template_tree_model import TEMPLATE_INDEX_ROLE, TEMPLATE_ROLE, TemplateTreeModel
+from arho_feature_template.qgis_plugin_tools.tools.resources import plugin_name
+from arho_feature_template.utils.settings import get_setting, set_setting
 
-logger = logging.getLogger(__name__)
+if TYPE_CHECKING:
+    from collections.abc import Iterator
 
+    from qgis.core import QgsGeometry
 
-class LayerNotFoundError(Exception):
-    def __init__(self, layer_name: str):
-        super().__init__(f"Layer {layer_name} not found")
+    from arho_feature_template.core.template_library_config import (
+        FeatureTemplate,
+        TemplateLibraryConfig,
+        TemplateLibraryMeta,
+    )
+    from arho_feature_template.core.template_search import TemplateSearchResult, TemplateTrigramIndex
 
+logger = logging.getLogger(__name__)
 
-class LayerNotVectorTypeError(Exception):
-    def __init__(self, layer_name: str):
-        super().__init__(f"Layer {layer_name} is not a vector layer")
+# Number of fully parsed template libraries kept in memory
+LIBRARY_CACHE_SIZE_SETTING = "template_library_cache_size"
+DEFAULT_LIBRARY_CACHE_SIZE = 3
 
+# Libraries with at least this many templates are searched in a background thread
+BACKGROUND_SEARCH_TEMPLATE_COUNT = 5000
 
-def get_layer_from_project(layer_name: str) -> QgsVectorLayer:
-    project = QgsProject.instance()
-    if not project:
-        raise LayerNotFoundError(layer_name)
+# Number of results shown when searching all libraries
+GLOBAL_SEARCH_RESULT_LIMIT = 100
 
-    layers = project.mapLayersByName(layer_name)
-    if not layers:
-        raise LayerNotFoundError(layer_name)
 
-    if len(layers) > 1:
-        logger.warning("Multiple layers with the same name found. Using the first one.")
+def template_library_cache_dir() -> Path:
+    return Path(QgsApplication.qgisSettingsDirPath()) / "cache" / plugin_name() / "template_libraries"
 
-    layer = layers[0]
-    if not isinstance(layer, QgsVectorLayer):
-        raise LayerNotVectorTypeError(layer_name)
 
-    return layer
+def _selected_geometries(source_layer: QgsVectorLayer, target_layer: QgsVectorLayer) -> Iterator[QgsGeometry]:
+    """Yield the selected geometries of the source layer in the coordinate system of the target layer"""
+    transform = None
+    if source_layer.crs() != target_layer.crs():
+        transform = QgsCoordinateTransform(source_layer.crs(), target_layer.crs(), QgsProject.instance())
+
+    for feature in source_layer.getSelectedFeatures(QgsFeatureRequest().setNoAttributes()):
+        geometry = feature.geometry()
+        if transform is not None:
+            geometry.transform(transform)
+        yield geometry
 
 
 class TemplateItem(QStandardItem):
-    def __init__(self, template_config: FeatureTemplate) -> None:
-        self.config = template_config
+    def __init__(self, template_config: FeatureTemplate, template_index: int) -> None:
         super().__init__(template_config.name)
+        self.setData(template_index, TEMPLATE_INDEX_ROLE)
+        self.setData(template_config, TEMPLATE_ROLE)
 
-    def is_valid(self) -> bool:
-        """Check if the template is valid agains current QGIS project
 
-        Checks if the layer and attributes defined in the template acutally exists"""
-        try:
-            get_layer_from_project(self.config.feature.layer)  # TODO: check child features recursively
-        except (LayerNotFoundError, LayerNotVectorTypeError):
-            return False
-        else:
-            return True
+class TemplateGeometryDigitizeMapTool(QgsMapToolDigitizeFeature): ...
 
 
-class TemplateGeometryDigitizeMapTool(QgsMapToolDigitizeFeature): ...
+class TemplateSearchWorker(QObject):
+    """Runs template searches in a background thread
+
+    Only the result of the latest search is current, results of earlier searches
+    should be ignored."""
+
+    search_finished = pyqtSignal(int, object)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.request_id = 0
+
+    def search(self, search_index: TemplateSearchIndex, search_text: str) -> None:
+        self.request_id += 1
+        self.executor.submit(self._search, self.request_id, search_index, search_text)
+
+    def cancel(self) -> None:
+        self.request_id += 1
+
+    def is_current(self, request_id: int) -> bool:
+        return request_id == self.request_id
+
+    def _search(self, request_id: int, search_index: TemplateSearchIndex, search_text: str) -> None:
+        # Skip searches that were superseded while waiting in the queue
+        if self.is_current(request_id):
+            self.search_finished.emit(request_id, search_index.search(search_text))
 
 
 class FeatureTemplater:
     def __init__(self) -> None:
-        self.library_configs: dict[str, TemplateLibraryConfig] = {}
+        self.library_files: dict[str, Path] = {}
+        # Parsed libraries in least recently used order
+        self.library_configs: OrderedDict[str, TemplateLibraryConfig] = OrderedDict()
+        self.library_configs_max_size = max(1, get_setting(LIBRARY_CACHE_SIZE_SETTING, DEFAULT_LIBRARY_CACHE_SIZE))
+        self.library_cache = TemplateLibraryCache(template_library_cache_dir())
+        self.loading_library_names: set[str] = set()
+        self.library_tasks: list[QgsTask] = []
+
+        self.active_template: FeatureTemplate | None = None
 
         self.template_dock = TemplateLibraryDock()
         self.template_dock.hide()
 
-        self.template_model = QStandardItemModel()
-        self.template_dock.template_list.setModel(self.template_model)
+        # Built template tree and search index of each parsed library
+        self.library_models: dict[str, tuple[TemplateTreeModel, TemplateSearchIndex]] = {}
+        # Template trees of the libraries being parsed, filled as their templates are parsed
+        self.streamed_models: dict[str, TemplateTreeModel] = {}
+        # Shown while the active library is being parsed
+        self.empty_template_model = TemplateTreeModel(())
+        self.template_model = self.empty_template_model
+        self.template_proxy_model = TemplateFilterProxyModel()
+        self.template_proxy_model.setSourceModel(self.template_model)
+        self.template_dock.template_list.setModel(self.template_proxy_model)
+
+        self.search_index: TemplateSearchIndex | None = None
+        self.search_worker = TemplateSearchWorker()
+        self.search_worker.search_finished.connect(self._on_background_search_finished)
+
+        # Template features waiting to be committed when committing is deferred
+        self.edit_session = TemplateEditSession()
+        self.edit_session.pending_count_changed.connect(self.template_dock.set_pending_feature_count)
+        self.template_dock.deferred_commit.setChecked(get_setting(DEFERRED_COMMIT_SETTING, False))
+        self.template_dock.deferred_commit.toggled.connect(self.on_deferred_commit_toggled)
+        self.template_dock.commit_pending.clicked.connect(self.edit_session.commit)
+        self.template_dock.apply_to_selected.clicked.connect(self.apply_template_to_selected_features)
+
+        self.template_validator = TemplateValidator(get_layer_registry())
+        self.template_validator.validity_changed.connect(self._on_template_validity_changed)
+        # Template models validated since the layers last changed
+        self.validated_models: set[TemplateTreeModel] = set()
+        # Validate once after a burst of layer changes, e.g. when a project is opened
+        self.validation_timer = QTimer()
+        self.validation_timer.setSingleShot(True)
+        self.validation_timer.timeout.connect(self._validate_shown_templates)
+
+        # Search over all libraries, the index is built when the search mode is enabled
+        self.global_search_index: TemplateTrigramIndex | None = None
+        self.global_search_task: TemplateTrigramIndexTask | None = None
+        self.global_search_model = QStandardItemModel()
 
         # Set the selection mode to allow single selection
         self.template_dock.template_list.setSelectionMode(self.template_dock.template_list.SingleSelection)
 
-        self._read_library_configs()
-
-        self.template_dock.library_selection.addItems(self.get_library_names())
-
         # Update template tree when library selection changes
         self.template_dock.library_selection.currentIndexChanged.connect(
             lambda: self.set_active_library(self.template_dock.library_selection.currentText())
         )
 
+        self._read_library_configs()
+
         # Update template tree when search text changes
-        self.template_dock.search_box.valueChanged.connect(self.on_template_search_text_changed)
+        self.template_dock.search_text_changed.connect(self.on_template_search_text_changed)
+        self.template_dock.search_all_libraries.toggled.connect(self.on_search_all_libraries_toggled)
 
         # Activate map tool when template is selected
         self.template_dock.template_list.clicked.connect(self.on_template_item_clicked)
@@ -105,19 +200,19 @@ class FeatureTemplater:
         self.digitize_map_tool.deactivated.connect(self.template_dock.template_list.clearSelection)
 
     def on_template_item_clicked(self, index):
-        item = self.template_model.itemFromIndex(index)
+        template = index.data(TEMPLATE_ROLE)
 
         # Do nothing if clicked item is a group
-        if item.hasChildren():
+        if template is None:
             return
 
         try:
-            layer = get_layer_from_project(item.config.feature.layer)
+            layer = get_layer_from_project(template.feature.layer)
         except (LayerNotFoundError, LayerNotVectorTypeError):
             logger.exception("Failed to activate template")
             return
 
-        self.active_template = item
+        self.active_template = template
         self.start_digitizing_for_layer(layer)
 
         # Reselect as a workaround for first selection visual clarity
@@ -126,44 +221,95 @@ class FeatureTemplater:
         )
 
     def on_template_search_text_changed(self, search_text: str) -> None:
-        search_text = search_text.lower()
-
-        for row in range(self.template_model.rowCount()):
-            group_item = self.template_model.item(row)
-            group_visible = False
-
-            for child_row in range(group_item.rowCount()):
-                child_item = group_item.child(child_row)
-
-                if child_item.hasChildren():
-                    subgroup_visible = False
-
-                    for template_row in range(child_item.rowCount()):
-                        template_item = child_item.child(template_row)
-                        matches = search_text in template_item.text().lower()
-                        template_item.setEnabled(matches)
-
-                        if matches:
-                            subgroup_visible = True
-
-                    child_item.setEnabled(subgroup_visible)
-                    group_visible = group_visible or subgroup_visible
-
-                    index = self.template_model.indexFromItem(child_item)
-                    self.template_dock.template_list.setExpanded(index, subgroup_visible)
-
-                else:
-                    template_item = child_item
-                    matches = search_text in template_item.text().lower()
-                    template_item.setEnabled(matches)
+        if self.template_dock.search_all_libraries.isChecked():
+            if self.global_search_index is not None:
+                self._show_global_search_results(
+                    self.global_search_index.search(search_text, GLOBAL_SEARCH_RESULT_LIMIT)
+                )
+            return
 
-                    if matches:
-                        group_visible = True
+        if self.search_index is None:
+            return
 
-            group_item.setEnabled(group_visible)
+        if not search_text.strip():
+            self.search_worker.cancel()
+            self._show_matching_templates(None)
+        elif len(self.search_index.all_templates) >= BACKGROUND_SEARCH_TEMPLATE_COUNT:
+            self.search_worker.search(self.search_index, search_text)
+        else:
+            self.search_worker.cancel()
+            self._show_matching_templates(self.search_index.search(search_text))
+
+    def _on_background_search_finished(self, request_id: int, matching_templates: frozenset[int]) -> None:
+        if self.search_worker.is_current(request_id):
+            self._show_matching_templates(matching_templates)
+
+    def _show_matching_templates(self, matching_templates: frozenset[int] | None) -> None:
+        self.template_proxy_model.set_matching_templates(matching_templates)
+        # Groups are expanded on demand when all templates are shown, as expanding
+        # every group would create the rows of the whole library
+        if matching_templates is not None:
+            self.template_dock.template_list.expandAll()
+
+    def on_search_all_libraries_toggled(self, checked: bool) -> None:  # noqa: FBT001
+        """Switch between searching the active library and fuzzy searching all libraries"""
+        self.template_dock.library_selection.setEnabled(not checked)
+        self.search_worker.cancel()
+        self.template_proxy_model.set_matching_templates(None)
+
+        if checked:
+            self.global_search_model.clear()
+            self.template_proxy_model.setSourceModel(self.global_search_model)
+            if self.global_search_index is None:
+                self._build_global_search_index()
+            else:
+                self.on_template_search_text_changed(self.template_dock.search_box.value())
+        else:
+            # Free the index of all libraries when it is not used
+            if self.global_search_task is not None:
+                self.global_search_task.cancel()
+                self.global_search_task = None
+            self.global_search_index = None
+            self.global_search_model.clear()
+            # The active library may still be being parsed
+            self.template_dock.set_loading(
+                self.template_dock.library_selection.currentText() in self.loading_library_names
+            )
+            self.template_proxy_model.setSourceModel(self.template_model)
+            self.on_template_search_text_changed(self.template_dock.search_box.value())
+
+    def _build_global_search_index(self) -> None:
+        self.template_dock.set_loading(True)
+        task = TemplateTrigramIndexTask(self.library_files, self.library_cache.load, self.library_configs)
+        task.index_built.connect(lambda index: self._on_global_search_index_built(task, index))
+        task.taskCompleted.connect(lambda: self._on_global_search_task_finished(task))
+        task.taskTerminated.connect(lambda: self._on_global_search_task_finished(task))
+        self.global_search_task = task
+        self._start_task(task)
+
+    def _on_global_search_index_built(self, task: TemplateTrigramIndexTask, index: TemplateTrigramIndex) -> None:
+        if task is not self.global_search_task:
+            # Search mode was switched off while the index was being built
+            return
+        self.global_search_index = index
+        self.on_template_search_text_changed(self.template_dock.search_box.value())
 
-            index = self.template_model.indexFromItem(group_item)
-            self.template_dock.template_list.setExpanded(index, group_visible)
+    def _on_global_search_task_finished(self, task: TemplateTrigramIndexTask) -> None:
+        if task is not self.global_search_task:
+            return
+        # The loading state is left only when the task has finished, also if it failed
+        self.global_search_task = None
+        self.template_dock.set_loading(False)
+
+    def _show_global_search_results(self, results: list[TemplateSearchResult]) -> None:
+        self.global_search_model.clear()
+        for result in results:
+            template_item = TemplateItem(result.template, -1)
+            template_item.setText(f"{result.template.name} ({result.library_name})")
+            template_item.setToolTip(result.template.description or "")
+            template_item.setEditable(False)
+            template_item.setEnabled(self.template_validator.is_valid(result.template))
+            self.global_search_model.appendRow(template_item)
 
     def start_digitizing_for_layer(self, layer: QgsVectorLayer) -> None:
         self.digitize_map_tool.clean()
@@ -176,72 +322,234 @@ class FeatureTemplater:
         iface.mapCanvas().setMapTool(self.digitize_map_tool)
 
     def ask_for_feature_attributes(self, feature: QgsFeature) -> None:
-        """Shows a dialog to ask for feature attributes and creates the feature"""
+        """Shows a dialog to ask for feature attributes and creates the feature with its child features"""
 
         if not self.active_template:
             return
 
-        attribute_form = TemplateAttributeForm(self.active_template.config)
+        attribute_form = TemplateAttributeForm(self.active_template)
 
         if attribute_form.exec_():
-            layer = get_layer_from_project(self.active_template.config.feature.layer)
-            # Save the feature
             attribute_form.set_feature_attributes(feature)
+            try:
+                if self.template_dock.deferred_commit.isChecked():
+                    self.edit_session.add(build_feature_tree(self.active_template.feature, feature))
+                else:
+                    write_feature_tree(self.active_template.feature, feature)
+            except (LayerNotFoundError, LayerNotVectorTypeError, FeatureTreeWriteError) as e:
+                iface.messageBar().pushMessage("Error", f"Failed to create feature from template: {e}", level=3)
+
+    def apply_template_to_selected_features(self) -> None:
+        """Create a feature with the selected template for each selected geometry of the active layer"""
+        template = self.template_dock.template_list.currentIndex().data(TEMPLATE_ROLE)
+        if template is None:
+            iface.messageBar().pushMessage("Error", "Valitse käytettävä templaatti.", level=Qgis.Warning)
+            return
 
-            layer.beginEditCommand("Create feature from template")
-            layer.addFeature(feature)
-            layer.commitChanges(stopEditing=False)
+        source_layer = iface.activeLayer()
+        if not isinstance(source_layer, QgsVectorLayer) or not source_layer.selectedFeatureCount():
+            iface.messageBar().pushMessage("Error", "Valitse kohteet aktiiviselta tasolta.", level=Qgis.Warning)
+            return
 
-    def get_library_names(self) -> list[str]:
-        return list(self.library_configs.keys())
+        try:
+            layer = get_layer_from_project(template.feature.layer)
+        except (LayerNotFoundError, LayerNotVectorTypeError) as e:
+            iface.messageBar().pushMessage("Error", str(e), level=Qgis.Critical)
+            return
 
-    def set_active_library(self, library_name: str) -> None:
-        self.template_model.clear()
+        # The attributes are asked once for all the features
+        attribute_form = TemplateAttributeForm(template)
+        if not attribute_form.exec_():
+            return
+        feature = QgsFeature(layer.fields())
+        attribute_form.set_feature_attributes(feature)
 
-        grouped_templates: defaultdict[str, defaultdict[str, list[FeatureTemplate]]] = defaultdict(
-            lambda: defaultdict(list)
+        start = time.perf_counter()
+        try:
+            tree = stamp_template(template.feature, feature, _selected_geometries(source_layer, layer))
+        except (LayerNotFoundError, LayerNotVectorTypeError, FeatureTreeWriteError) as e:
+            iface.messageBar().pushMessage(
+                "Error", f"Failed to create features from template: {e}", level=Qgis.Critical
+            )
+            return
+        elapsed = time.perf_counter() - start
+
+        feature_count = len(tree.layer_features[layer.id()])
+        total_count = sum(len(features) for features in tree.layer_features.values())
+        iface.messageBar().pushMessage(
+            "Templaatit",
+            f"Luotiin {feature_count} kohdetta templaatilla {template.name} "
+            f"({total_count / max(elapsed, 1e-6):.0f} kohdetta/s)",
+            level=Qgis.Success,
         )
+        logger.info("Created %d features in %.2f s", total_count, elapsed)
 
-        # Group templates by 'group' and 'sub_group'
-        for template in self.library_configs[library_name].templates:
-            group = getattr(template, "group", None) or "Ryhmittelemättömät"
-            sub_group = getattr(template, "sub_group", None)
-            if sub_group:
-                grouped_templates[group][sub_group].append(template)
-            else:
-                grouped_templates[group][""].append(template)
-
-        for group_name, sub_group_dict in grouped_templates.items():
-            group_item = QStandardItem(group_name)
-            group_item.setEditable(False)
-
-            for sub_group_name, templates in sub_group_dict.items():
-                if sub_group_name:
-                    sub_group_item = QStandardItem(sub_group_name)
-                    sub_group_item.setEditable(False)
-                    group_item.appendRow(sub_group_item)
-                    target_item = sub_group_item
-                else:
-                    # If template has no sub_group set, list it directly under group
-                    target_item = group_item
+    def on_deferred_commit_toggled(self, checked: bool) -> None:  # noqa: FBT001
+        set_setting(DEFERRED_COMMIT_SETTING, checked)
+        if not checked:
+            self.edit_session.commit()
+
+    def get_library_names(self) -> list[str]:
+        return list(self.library_files.keys())
+
+    def add_library_config(self, library_name: str, config: TemplateLibraryConfig) -> None:
+        self.library_configs[library_name] = config
+        while len(self.library_configs) > self.library_configs_max_size:
+            evicted_name, _ = self.library_configs.popitem(last=False)
+            evicted_model, _ = self.library_models.pop(evicted_name, (None, None))
+            self.validated_models.discard(evicted_model)
+
+    def set_active_library(self, library_name: str) -> None:
+        start = time.perf_counter()
+        self.search_worker.cancel()
+
+        library_config = self.library_configs.get(library_name)
+        if library_config is None:
+            # Templates are shown as they are parsed and can be searched once the library has been parsed
+            self._set_template_model(self.streamed_models.get(library_name, self.empty_template_model), None)
+            self._read_library_templates(library_name)
+            return
 
-                for template in templates:
-                    template_item = TemplateItem(template)
-                    template_item.setEditable(False)
-                    target_item.appendRow(template_item)
+        self.library_configs.move_to_end(library_name)
+        if self.global_search_task is None:
+            self.template_dock.set_loading(False)
+
+        # Reuse the model of a recently shown library instead of building it again
+        if library_name not in self.library_models:
+            self.library_models[library_name] = (
+                TemplateTreeModel(library_config.templates),
+                TemplateSearchIndex(library_config.templates),
+            )
+        self._set_template_model(*self.library_models[library_name])
+
+        # Keep the current search when the library changes
+        self.template_proxy_model.set_matching_templates(None)
+        self.on_template_search_text_changed(self.template_dock.search_box.value())
+        logger.debug("Activated template library %s in %.1f ms", library_name, (time.perf_counter() - start) * 1000)
+
+    def _set_template_model(self, model: TemplateTreeModel, search_index: TemplateSearchIndex | None) -> None:
+        self.template_model = model
+        self.search_index = search_index
+        if search_index is None:
+            # Templates cannot be searched before all of them have been parsed
+            self.template_proxy_model.set_matching_templates(None)
+        self._validate_template_model(model)
+        # The results of all libraries are shown while searching all libraries
+        if not self.template_dock.search_all_libraries.isChecked():
+            self.template_proxy_model.setSourceModel(model)
+
+    def _on_template_validity_changed(self) -> None:
+        self.validated_models.clear()
+        self.validation_timer.start()
+
+    def _validate_shown_templates(self) -> None:
+        if self.template_dock.search_all_libraries.isChecked():
+            # Show the global search results with their current validity
+            self.on_template_search_text_changed(self.template_dock.search_box.value())
+        else:
+            self._validate_template_model(self.template_model)
 
-            self.template_model.appendRow(group_item)
+    def _validate_template_model(self, model: TemplateTreeModel) -> None:
+        if model not in self.validated_models:
+            model.set_invalid_templates(self.template_validator.invalid_templates(model.templates))
+            self.validated_models.add(model)
 
-        self.template_dock.template_list.expandAll()
+    def unload(self) -> None:
+        self.edit_session.commit()
+        self.validation_timer.stop()
+        self.template_validator.unload()
+        for task in self.library_tasks:
+            task.cancel()
+        self.search_worker.executor.shutdown(wait=False)
 
     def _read_library_configs(self) -> None:
-        for config_file in library_config_files():
-            try:
-                config = parse_template_library_config(config_file)
-                self.library_configs[config.meta.name] = config
-            except (TemplateLibraryVersionError, TemplateSyntaxError) as e:
-                logger.warning("Failed to parse template library configuration: %s", e)
-
-        first_library_name = next(iter(self.library_configs), None)
-        if first_library_name:
-            self.set_active_library(first_library_name)
+        """Read the metadata of all template libraries in a background task
+
+        Each library is added to the library selection as soon as its metadata has been
+        read. The templates of a library are parsed only when the library is selected."""
+        self.template_dock.set_loading(True)
+
+        task = TemplateLibraryLoadTask("Luetaan templaattikirjastoja", self.library_cache.load_meta)
+        task.library_loaded.connect(self._on_library_meta_loaded)
+        task.library_failed.connect(self._on_library_failed)
+        task.taskCompleted.connect(self._on_library_metas_read)
+        task.taskTerminated.connect(self._on_library_metas_read)
+        self._start_task(task)
+
+    def _read_library_templates(self, library_name: str) -> None:
+        self.template_dock.set_loading(True)
+        if library_name in self.loading_library_names:
+            return
+        self.loading_library_names.add(library_name)
+
+        task = TemplateLibraryLoadTask(
+            f"Luetaan templaattikirjasto {library_name}",
+            self.library_cache.load,
+            [self.library_files[library_name]],
+            stream_templates=True,
+        )
+        task.templates_loaded.connect(lambda _, templates: self._on_library_templates_parsed(library_name, templates))
+        task.library_loaded.connect(lambda _, config: self._on_library_templates_loaded(library_name, config))
+        task.library_failed.connect(
+            lambda config_file, error: self._on_library_templates_failed(library_name, config_file, error)
+        )
+        # The task ends without either signal if it is canceled or fails unexpectedly
+        task.taskTerminated.connect(lambda: self._on_library_templates_done(library_name))
+        self._start_task(task)
+
+    def _start_task(self, task: QgsTask) -> None:
+        # Keep a reference to the task until the task manager is done with it
+        self.library_tasks.append(task)
+        task.taskCompleted.connect(lambda: self.library_tasks.remove(task))
+        task.taskTerminated.connect(lambda: self.library_tasks.remove(task))
+        QgsApplication.taskManager().addTask(task)
+
+    def _on_library_meta_loaded(self, config_file: Path, meta: TemplateLibraryMeta) -> None:
+        if config_file in self.library_files.values():
+            return
+        # Libraries are told apart by their names, so libraries with the same name are labeled with their files
+        library_name = meta.name
+        if library_name in self.library_files:
+            library_name = f"{meta.name} ({config_file.name})"
+        if library_name in self.library_files:
+            library_name = f"{meta.name} ({config_file})"
+        self.library_files[library_name] = config_file
+        # Selecting the first library activates it
+        self.template_dock.library_selection.addItem(library_name)
+
+    def _on_library_metas_read(self) -> None:
+        if not self.library_files:
+            self.template_dock.set_loading(False)
+
+    def _on_library_templates_parsed(self, library_name: str, templates: tuple[FeatureTemplate, ...]) -> None:
+        model = self.streamed_models.get(library_name)
+        if model is None:
+            model = self.streamed_models[library_name] = TemplateTreeModel([])
+            if self.template_dock.library_selection.currentText() == library_name:
+                self._set_template_model(model, None)
+        model.append_templates(templates)
+
+    def _on_library_templates_loaded(self, library_name: str, config: TemplateLibraryConfig) -> None:
+        self.loading_library_names.discard(library_name)
+        self.add_library_config(library_name, config)
+        model = self.streamed_models.pop(library_name, None)
+        if model is not None:
+            # Keep the rows the view already shows, the templates are validated once all have been parsed
+            self.validated_models.discard(model)
+            self.library_models[library_name] = (model, TemplateSearchIndex(config.templates))
+        if self.template_dock.library_selection.currentText() == library_name:
+            self.set_active_library(library_name)
+
+    def _on_library_templates_failed(self, library_name: str, config_file: Path, error: str) -> None:
+        self._on_library_templates_done(library_name)
+        self._on_library_failed(config_file, error)
+
+    def _on_library_templates_done(self, library_name: str) -> None:
+        self.loading_library_names.discard(library_name)
+        if self.streamed_models.pop(library_name, None) is self.template_model:
+            self._set_template_model(self.empty_template_model, None)
+        if self.global_search_task is None:
+            self.template_dock.set_loading(False)
+
+    def _on_library_failed(self, config_file: Path, error: str) -> None:
+        logger.warning("Failed to parse template library configuration %s: %s", config_file, error)
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import logging
+import uuid
+from typing import TYPE_CHECKING
+
+from qgis.core import NULL, QgsFeature
+from qgis.PyQt.QtCore import QVariant
+
+from arho_feature_template.core.layer_registry import get_layer_from_project, get_layer_registry
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from qgis.core import QgsFields, QgsGeometry, QgsRelation, QgsVectorLayer
+
+    from arho_feature_template.core.layer_registry import LayerRegistry
+    from arho_feature_template.core.template_library_config import Feature
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureTreeWriteError(Exception):
+    pass
+
+
+class MissingRelationError(FeatureTreeWriteError):
+    def __init__(self, parent_layer_name: str, child_layer_name: str):
+        super().__init__(f"No relation between layers {parent_layer_name} and {child_layer_name}")
+
+
+class UnknownFieldError(FeatureTreeWriteError):
+    def __init__(self, layer_name: str, field_name: str):
+        super().__init__(f"Layer {layer_name} has no field {field_name}")
+
+
+class LayerWriteError(FeatureTreeWriteError):
+    def __init__(self, layer_name: str, error: str):
+        super().__init__(f"Failed to add features to layer {layer_name}: {error}")
+
+
+class FeatureTree:
+    """Features of a template and its child features grouped by layer
+
+    Child features are linked to their parents through the relations of the project.
+    Keys of the referenced features are generated in memory as UUIDs when they are not
+    set, so the whole tree can be linked before anything is written. Keys that are not
+    strings or UUIDs must therefore be set in the template. Several features
+    of the same template can be added to write all of them at once.
+
+    The layers and relations are looked up from the project of the layer registry, by
+    default the current project. The features are built on the fields of the data providers
+    for `write_features`, or on the fields of the layers for adding them to the edit buffers."""
+
+    def __init__(self, layer_registry: LayerRegistry | None = None, *, provider_fields: bool = True) -> None:
+        self.layer_registry = layer_registry or get_layer_registry()
+        self.provider_fields = provider_fields
+        self.layers: dict[str, QgsVectorLayer] = {}
+        self.layer_features: dict[str, list[QgsFeature]] = {}
+        # Layer and a feature with the attribute defaults of each child feature config by id
+        self._child_prototypes: dict[int, tuple[QgsVectorLayer, QgsFeature]] = {}
+        # Referenced layer ids of each layer
+        self._dependencies: dict[str, set[str]] = {}
+        self._relations: dict[tuple[str, str], QgsRelation] = {
+            (relation.referencedLayerId(), relation.referencingLayerId()): relation
+            for relation in self.layer_registry.project.relationManager().relations().values()
+        }
+
+    def add(self, feature_config: Feature, feature: QgsFeature) -> None:
+        """Add the feature and the child features of the template feature config"""
+        self._add(feature_config, get_layer_from_project(feature_config.layer, self.layer_registry), feature)
+
+    def _add(self, feature_config: Feature, layer: QgsVectorLayer, feature: QgsFeature) -> None:
+        layer_id = layer.id()
+        self.layers[layer_id] = layer
+        self.layer_features.setdefault(layer_id, []).append(feature)
+        self._dependencies.setdefault(layer_id, set())
+
+        for child_config in feature_config.child_features:
+            child_layer, prototype = self._child_prototype(child_config)
+            # Copies share the attribute values of the prototype until they are modified
+            child_feature = QgsFeature(prototype)
+            self._link(layer, feature, child_layer, child_feature)
+            self._add(child_config, child_layer, child_feature)
+
+    def _child_prototype(self, child_config: Feature) -> tuple[QgsVectorLayer, QgsFeature]:
+        try:
+            return self._child_prototypes[id(child_config)]
+        except KeyError:
+            pass
+
+        child_layer = get_layer_from_project(child_config.layer, self.layer_registry)
+        prototype = feature_with_defaults(child_config, self.fields(child_layer))
+        self._child_prototypes[id(child_config)] = (child_layer, prototype)
+        return child_layer, prototype
+
+    def fields(self, layer: QgsVectorLayer) -> QgsFields:
+        """Return the fields the features of the layer are built on"""
+        return layer.dataProvider().fields() if self.provider_fields else layer.fields()
+
+    def _link(
+        self, parent_layer: QgsVectorLayer, parent: QgsFeature, child_layer: QgsVectorLayer, child: QgsFeature
+    ) -> None:
+        relation = self._relations.get((parent_layer.id(), child_layer.id()))
+        if relation is not None:
+            _set_foreign_key(relation, referenced=parent, referencing=child)
+            self._dependencies.setdefault(child_layer.id(), set()).add(parent_layer.id())
+            return
+
+        # The parent may also refer to the child, e.g. to a regulation group
+        relation = self._relations.get((child_layer.id(), parent_layer.id()))
+        if relation is not None:
+            _set_foreign_key(relation, referenced=child, referencing=parent)
+            self._dependencies.setdefault(parent_layer.id(), set()).add(child_layer.id())
+            return
+
+        raise MissingRelationError(parent_layer.name(), child_layer.name())
+
+    def write_order(self) -> list[str]:
+        """Return the layer ids so that referenced layers come before the layers referring to them"""
+        order: list[str] = []
+        visiting: set[str] = set()
+
+        def visit(layer_id: str) -> None:
+            if layer_id in order:
+                return
+            if layer_id in visiting:
+                msg = "Template layers refer to each other"
+                raise FeatureTreeWriteError(msg)
+            visiting.add(layer_id)
+            for referenced_layer_id in self._dependencies[layer_id]:
+                visit(referenced_layer_id)
+            order.append(layer_id)
+
+        for layer_id in self._dependencies:
+            visit(layer_id)
+        return order
+
+
+def feature_with_defaults(feature_config: Feature, fields: QgsFields) -> QgsFeature:
+    """Create a feature with the default attribute values of the template feature config"""
+    feature = QgsFeature(fields)
+    for attribute in feature_config.attributes:
+        if attribute.default is not None:
+            field_index = fields.lookupField(attribute.attribute)
+            if field_index < 0:
+                raise UnknownFieldError(feature_config.layer, attribute.attribute)
+            feature.setAttribute(field_index, attribute.default)
+    return feature
+
+
+def build_feature_tree(feature_config: Feature, feature: QgsFeature, *, provider_fields: bool = False) -> FeatureTree:
+    """Create the child features of the template feature config and link them to the feature
+
+    By default the features are built on the fields of the layers for their edit buffers."""
+    tree = FeatureTree(provider_fields=provider_fields)
+    layer = get_layer_from_project(feature_config.layer)
+    tree.add(feature_config, copy_feature(feature, tree.fields(layer)))
+    return tree
+
+
+def write_feature_tree(feature_config: Feature, feature: QgsFeature) -> FeatureTree:
+    """Write the feature and its child features with one `addFeatures` call per layer"""
+    tree = build_feature_tree(feature_config, feature, provider_fields=True)
+    write_features(tree)
+    return tree
+
+
+def stamp_template(
+    feature_config: Feature,
+    feature: QgsFeature,
+    geometries: Iterable[QgsGeometry],
+    layer_registry: LayerRegistry | None = None,
+) -> FeatureTree:
+    """Write a copy of the feature and its child features for each geometry
+
+    All features of a layer are written with one `addFeatures` call."""
+    tree = FeatureTree(layer_registry)
+    layer = get_layer_from_project(feature_config.layer, tree.layer_registry)
+    template_feature = to_provider_feature(layer, feature)
+    for geometry in geometries:
+        stamped_feature = QgsFeature(template_feature)
+        stamped_feature.setGeometry(geometry)
+        tree.add(feature_config, stamped_feature)
+    write_features(tree)
+    return tree
+
+
+def write_features(tree: FeatureTree) -> None:
+    """Write the features of the tree through the data providers in dependency order
+
+    If writing to a layer fails, the features already written are deleted."""
+    written_layer_ids: list[str] = []
+    for layer_id in tree.write_order():
+        layer = tree.layers[layer_id]
+        succeeded, features = layer.dataProvider().addFeatures(tree.layer_features[layer_id])
+        if not succeeded:
+            error = layer.dataProvider().lastError()
+            _delete_written_features(tree, written_layer_ids)
+            raise LayerWriteError(layer.name(), error)
+        # Features get their ids when they are written
+        tree.layer_features[layer_id] = features
+        written_layer_ids.append(layer_id)
+
+    for layer in tree.layers.values():
+        layer.updateExtents()
+        layer.triggerRepaint()
+
+
+def to_provider_feature(layer: QgsVectorLayer, feature: QgsFeature) -> QgsFeature:
+    """Copy the feature without the attributes the data provider does not have, e.g. virtual fields"""
+    return copy_feature(feature, layer.dataProvider().fields())
+
+
+def copy_feature(feature: QgsFeature, fields: QgsFields) -> QgsFeature:
+    """Copy the geometry and the attributes of the feature that have a field of the same name in the fields"""
+    copied_feature = QgsFeature(fields)
+    copied_feature.setGeometry(feature.geometry())
+    feature_fields = feature.fields()
+    for field_index, field in enumerate(fields):
+        source_index = feature_fields.lookupField(field.name())
+        if source_index >= 0:
+            copied_feature.setAttribute(field_index, feature.attribute(source_index))
+    return copied_feature
+
+
+def _set_foreign_key(relation: QgsRelation, referenced: QgsFeature, referencing: QgsFeature) -> None:
+    for referencing_field, referenced_field in relation.fieldPairs().items():
+        key = referenced.attribute(referenced_field)
+        if key is None or key == NULL:
+            field = referenced.fields().field(referenced_field)
+            if field.type() != QVariant.String and field.typeName().lower() != "uuid":
+                # Integer keys, e.g. serials, are only known after the feature has been written
+                msg = (
+                    f"Cannot generate a key for field {referenced_field} of layer "
+                    f"{relation.referencedLayer().name()} of type {field.typeName()}"
+                )
+                raise FeatureTreeWriteError(msg)
+            key = str(uuid.uuid4())
+            referenced.setAttribute(referenced_field, key)
+        referencing.setAttribute(referencing_field, key)
+
+
+def _delete_written_features(tree: FeatureTree, layer_ids: list[str]) -> None:
+    for layer_id in reversed(layer_ids):
+        layer = tree.layers[layer_id]
+        feature_ids = [feature.id() for feature in tree.layer_features[layer_id]]
+        if not layer.dataProvider().deleteFeatures(feature_ids):
+            logger.warning("Failed to delete features %s written to layer %s", feature_ids, layer.name())
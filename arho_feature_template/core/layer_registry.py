@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+from qgis.core import QgsProject, QgsVectorLayer
+from qgis.PyQt.QtCore import QObject, pyqtSignal
+
+if TYPE_CHECKING:
+    from qgis.core import QgsMapLayer
+
+logger = logging.getLogger(__name__)
+
+
+class LayerRegistry(QObject):
+    """Looks up the layers of a project by name or id without scanning every layer
+
+    The lookup tables are rebuilt on the next lookup after layers have been added,
+    removed or renamed. `layers_changed` is emitted when that happens."""
+
+    layers_changed = pyqtSignal()
+
+    def __init__(self, project: QgsProject) -> None:
+        super().__init__()
+        self.project = project
+        self._layers_by_id: dict[str, QgsMapLayer] | None = None
+        self._layers_by_name: dict[str, list[QgsMapLayer]] | None = None
+
+        self.project.layersAdded.connect(self._on_layers_added)
+        self.project.layersRemoved.connect(self.invalidate)
+        self.project.cleared.connect(self.invalidate)
+        for layer in self.project.mapLayers().values():
+            layer.nameChanged.connect(self.invalidate)
+
+    def unload(self) -> None:
+        self.project.layersAdded.disconnect(self._on_layers_added)
+        self.project.layersRemoved.disconnect(self.invalidate)
+        self.project.cleared.disconnect(self.invalidate)
+        for layer in self.project.mapLayers().values():
+            layer.nameChanged.disconnect(self.invalidate)
+
+    def invalidate(self) -> None:
+        self._layers_by_id = None
+        self._layers_by_name = None
+        self.layers_changed.emit()
+
+    def layer(self, layer_id: str) -> QgsMapLayer | None:
+        return self._layers().get(layer_id)
+
+    def layers_by_name(self, layer_name: str) -> list[QgsMapLayer]:
+        if self._layers_by_name is None:
+            layers_by_name: dict[str, list[QgsMapLayer]] = {}
+            for layer in self._layers().values():
+                layers_by_name.setdefault(layer.name(), []).append(layer)
+            self._layers_by_name = layers_by_name
+        return self._layers_by_name.get(layer_name, [])
+
+    def _layers(self) -> dict[str, QgsMapLayer]:
+        if self._layers_by_id is None:
+            self._layers_by_id = dict(self.project.mapLayers())
+        return self._layers_by_id
+
+    def _on_layers_added(self, layers: list[QgsMapLayer]) -> None:
+        for layer in layers:
+            layer.nameChanged.connect(self.invalidate)
+        self.invalidate()
+
+
+_layer_registry: LayerRegistry | None = None
+
+
+def get_layer_registry() -> LayerRegistry:
+    """Return the layer registry of the current project"""
+    global _layer_registry  # noqa: PLW0603
+    if _layer_registry is None:
+        _layer_registry = LayerRegistry(QgsProject.instance())
+    return _layer_registry
+
+
+def unload_layer_registry() -> None:
+    global _layer_registry  # noqa: PLW0603
+    if _layer_registry is not None:
+        _layer_registry.unload()
+        _layer_registry = None
+
+
+class LayerNotFoundError(Exception):
+    def __init__(self, layer_name: str):
+        super().__init__(f"Layer {layer_name} not found")
+
+
+class LayerNotVectorTypeError(Exception):
+    def __init__(self, layer_name: str):
+        super().__init__(f"Layer {layer_name} is not a vector layer")
+
+
+def get_layer_from_project(layer_name: str, layer_registry: LayerRegistry | None = None) -> QgsVectorLayer:
+    """Return the vector layer with the name from the registry, by default from the current project"""
+    layers = (layer_registry or get_layer_registry()).layers_by_name(layer_name)
+    if not layers:
+        raise LayerNotFoundError(layer_name)
+
+    if len(layers) > 1:
+        logger.warning("Multiple layers with the same name found. Using the first one.")
+
+    layer = layers[0]
+    if not isinstance(layer, QgsVectorLayer):
+        raise LayerNotVectorTypeError(layer_name)
+
+    return layer
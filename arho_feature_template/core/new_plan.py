@@ -1,17 +1,39 @@
-from qgis.core import QgsProject, QgsVectorLayer
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 from qgis.utils import iface
 
-from arho_feature_template.core.update_plan import LandUsePlan, update_selected_plan
+from arho_feature_template.core.layer_registry import get_layer_registry
+from arho_feature_template.core.plan_working_copy import close_working_copy
+from arho_feature_template.core.update_plan import LandUsePlan, get_plan_filter_manager, update_selected_plan
+
+if TYPE_CHECKING:
+    from qgis.core import QgsFeature, QgsVectorLayer
+    from qgis.gui import QgsMapTool
 
 
 class NewPlan:
+    def __init__(self):
+        self.committed_features: list[QgsFeature] = []
+        self.digitizing_layer: QgsVectorLayer | None = None
+
     def add_new_plan(self):
+        if self.digitizing_layer is not None:
+            # The new plan is already being digitized
+            return
+
+        # The new plan is added to the database, not to the working copy of the current plan
+        if not close_working_copy():
+            return
+
         # Filtered layers are not editable, so clear filters first.
         self.clear_all_filters()
 
-        layers = QgsProject.instance().mapLayersByName("Kaava")
+        layers = get_layer_registry().layers_by_name("Kaava")
         if not layers:
             iface.messageBar().pushMessage("Error", "Layer 'Kaava' not found", level=3)
+            get_plan_filter_manager().restore_filters()
             return
 
         kaava_layer = layers[0]
@@ -25,39 +47,57 @@ class NewPlan:
 
         # Connect the featureAdded signal
         kaava_layer.featureAdded.connect(self.feature_added)
+        # Changing the map tool before adding the plan cancels it
+        self.digitizing_layer = kaava_layer
+        iface.mapCanvas().mapToolSet.connect(self.on_map_tool_changed)
 
     def feature_added(self):
         kaava_layer = iface.activeLayer()
-        kaava_layer.featureAdded.disconnect()
-        feature_ids_before_commit = kaava_layer.allFeatureIds()
-        if kaava_layer.isEditable():
-            if not kaava_layer.commitChanges():
-                iface.messageBar().pushMessage("Error", "Failed to commit changes to the layer.", level=3)
-                return
-        else:
+        kaava_layer.featureAdded.disconnect(self.feature_added)
+        self.stop_digitizing()
+        if not kaava_layer.isEditable():
             iface.messageBar().pushMessage("Error", "Layer is not editable.", level=3)
             return
 
-        feature_ids_after_commit = kaava_layer.allFeatureIds()
-
-        # Find the new plan.id by comparing fids before and after commit.
-        new_feature_id = next((fid for fid in feature_ids_after_commit if fid not in feature_ids_before_commit), None)
+        # The committed features have the ids given by the data provider
+        self.committed_features = []
+        kaava_layer.committedFeaturesAdded.connect(self.on_committed_features_added)
+        try:
+            committed = kaava_layer.commitChanges()
+        finally:
+            kaava_layer.committedFeaturesAdded.disconnect(self.on_committed_features_added)
+        committed_features, self.committed_features = self.committed_features, []
+        if not committed:
+            iface.messageBar().pushMessage("Error", "Failed to commit changes to the layer.", level=3)
+            return
 
-        if new_feature_id is not None:
-            new_feature = kaava_layer.getFeature(new_feature_id)
+        if not committed_features:
+            iface.messageBar().pushMessage("Error", "No new feature was added.", level=3)
+            return
 
-            if new_feature.isValid():
-                feature_id_value = new_feature["id"]
-                update_selected_plan(LandUsePlan(feature_id_value))
-            else:
-                iface.messageBar().pushMessage("Error", "Invalid feature retrieved.", level=3)
+        # Fetch the feature again to get the values generated by the database, e.g. plan.id
+        new_feature = kaava_layer.getFeature(committed_features[-1].id())
+        if new_feature.isValid():
+            feature_id_value = new_feature["id"]
+            update_selected_plan(LandUsePlan(feature_id_value))
         else:
-            iface.messageBar().pushMessage("Error", "No new feature was added.", level=3)
+            iface.messageBar().pushMessage("Error", "Invalid feature retrieved.", level=3)
 
-    def clear_all_filters(self):
-        """Clear filters for all vector layers in the project."""
-        layers = QgsProject.instance().mapLayers().values()
+    def on_committed_features_added(self, layer_id: str, features: list[QgsFeature]):  # noqa: ARG002
+        self.committed_features.extend(features)
+
+    def on_map_tool_changed(self, new_tool: QgsMapTool, old_tool: QgsMapTool):  # noqa: ARG002
+        if self.digitizing_layer is not None:
+            self.digitizing_layer.featureAdded.disconnect(self.feature_added)
+        self.stop_digitizing()
+        # Show the plan that was shown before starting to add the new plan
+        get_plan_filter_manager().restore_filters()
 
-        for layer in layers:
-            if isinstance(layer, QgsVectorLayer):
-                layer.setSubsetString("")
+    def stop_digitizing(self):
+        if self.digitizing_layer is not None:
+            iface.mapCanvas().mapToolSet.disconnect(self.on_map_tool_changed)
+            self.digitizing_layer = None
+
+    def clear_all_filters(self):
+        """Clear the plan filters set by the plugin."""
+        get_plan_filter_manager().clear_filters()
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from qgis.core import QgsFeedback, QgsProviderConnectionException, QgsTask
+from qgis.PyQt.QtCore import pyqtSignal
+
+from arho_feature_template.utils.db_utils import get_database_connection
+from arho_feature_template.utils.settings import get_setting
+
+if TYPE_CHECKING:
+    from qgis.core import QgsAbstractDatabaseProviderConnection
+
+logger = logging.getLogger(__name__)
+
+# Number of plans fetched from the database at a time
+PLAN_PAGE_SIZE = 200
+# Number of fetched plans added to the plan list at a time
+ROW_CHUNK_SIZE = 50
+
+# Cached plan lists are used without checking the database for this long
+PLAN_CATALOG_TTL_SETTING = "plan_catalog_ttl_s"
+DEFAULT_PLAN_CATALOG_TTL_S = 300
+# Number of plan lists, i.e. connection and search text combinations, that are cached
+MAX_CACHED_PLAN_LISTS = 32
+
+# Number of plans and the latest modification time, changes when plans are added, removed or edited
+PlanCatalogVersion = Tuple[int, Optional[str]]
+
+_PLAN_CATALOG_FROM = """
+    FROM
+        hame.plan p
+    LEFT JOIN
+        codes.lifecycle_status l
+    ON
+        p.lifecycle_status_id = l.id
+    LEFT JOIN
+        codes.plan_type pt
+    ON
+        p.plan_type_id = pt.id
+"""
+
+# Separates the columns of the searched text, so that a search cannot match across columns
+HAYSTACK_SEPARATOR = "\n"
+
+# Columns shown in the plan list, in the order of the list columns
+_PLAN_CATALOG_COLUMNS = (
+    "p.id::text",
+    "p.producers_plan_identifier",
+    "p.name ->> 'fin'",
+    "l.name ->> 'fin'",
+    "pt.name ->> 'fin'",
+)
+
+
+def quote_literal(value: str) -> str:
+    """Quote the value as a PostgreSQL string literal"""
+    # Escape string syntax does not depend on the standard_conforming_strings setting
+    escaped = value.replace("\x00", "").replace("\\", "\\\\").replace("'", "''")
+    return f"E'{escaped}'"
+
+
+def like_pattern(text: str) -> str:
+    """Return an ILIKE pattern matching strings that contain the text"""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def plan_haystack(row: tuple[str | None, ...]) -> str:
+    """Return the lowercase text of the row searched by the plan list filter"""
+    return HAYSTACK_SEPARATOR.join(value for value in row if value is not None).lower()
+
+
+def _where_clause(search_text: str, after_id: str | None = None) -> str:
+    conditions = []
+    if search_text:
+        # Matches the same columns as the filter of the plan list. A trigram index on the
+        # expression makes this fast on large catalogs but is not required.
+        searched = f"concat_ws({quote_literal(HAYSTACK_SEPARATOR)}, {', '.join(_PLAN_CATALOG_COLUMNS)})"
+        conditions.append(f"{searched} ILIKE {quote_literal(like_pattern(search_text))}")
+    if after_id is not None:
+        conditions.append(f"p.id > {quote_literal(after_id)}")
+    return f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+
+_PLAN_CATALOG_VERSION_QUERY = "SELECT count(*), max(modified_at)::text FROM hame.plan"
+
+
+def plan_count_query(search_text: str) -> str:
+    return f"SELECT count(*) {_PLAN_CATALOG_FROM} {_where_clause(search_text)}"
+
+
+def plan_page_query(search_text: str, after_id: str | None, limit: int) -> str:
+    """Return the query of the plans after the plan with the given id
+
+    Paging by the id instead of an offset keeps the cost of a page independent of its
+    position in the catalog."""
+    return (
+        f"SELECT {', '.join(_PLAN_CATALOG_COLUMNS)} {_PLAN_CATALOG_FROM} {_where_clause(search_text, after_id)} "
+        f"ORDER BY p.id LIMIT {int(limit)}"
+    )
+
+
+def count_plans(
+    connection: QgsAbstractDatabaseProviderConnection, search_text: str = "", feedback: QgsFeedback | None = None
+) -> int:
+    """Count the plans matching the search text without fetching them"""
+    result = connection.executeSql(plan_count_query(search_text), feedback)
+    return int(result[0][0]) if result else 0
+
+
+def fetch_plans(
+    connection: QgsAbstractDatabaseProviderConnection,
+    search_text: str = "",
+    after_id: str | None = None,
+    limit: int = PLAN_PAGE_SIZE,
+    feedback: QgsFeedback | None = None,
+) -> list[tuple[str | None, ...]]:
+    """Fetch a page of the plans matching the search text, ordered by id"""
+    return [
+        tuple(None if value is None else str(value) for value in row)
+        for row in connection.executeSql(plan_page_query(search_text, after_id, limit), feedback)
+    ]
+
+
+def fetch_plan_catalog_version(
+    connection: QgsAbstractDatabaseProviderConnection, feedback: QgsFeedback | None = None
+) -> PlanCatalogVersion:
+    result = connection.executeSql(_PLAN_CATALOG_VERSION_QUERY, feedback)
+    count, modified_at = result[0]
+    return int(count), None if modified_at is None else str(modified_at)
+
+
+class CachedPlanList:
+    """Plans of a connection matching a search text, as far as they have been fetched"""
+
+    __slots__ = ("exhausted", "haystacks", "rows", "total_count", "version")
+
+    def __init__(self) -> None:
+        self.rows: list[tuple[str | None, ...]] = []
+        # Searched text of each row
+        self.haystacks: list[str] = []
+        # None until the plans have been counted
+        self.total_count: int | None = None
+        self.exhausted = False
+        # Version of the catalog when the plans were counted
+        self.version: PlanCatalogVersion | None = None
+
+
+class PlanCatalogCache:
+    """Plan lists fetched during the session, so that reopening a list does not query it again
+
+    The catalog version of a connection is checked again when it was last checked longer
+    than the TTL ago. Plan lists fetched with an older version are not current anymore."""
+
+    def __init__(self, max_size: int = MAX_CACHED_PLAN_LISTS) -> None:
+        self.max_size = max_size
+        self._plan_lists: OrderedDict[tuple[str, str], CachedPlanList] = OrderedDict()
+        # Latest catalog version and the monotonic time it was fetched per connection
+        self._versions: dict[str, tuple[PlanCatalogVersion, float]] = {}
+
+    def plan_list(self, connection_name: str, search_text: str) -> CachedPlanList:
+        """Return the cached plan list, or a new empty one if the list is not current"""
+        key = (connection_name, search_text)
+        plan_list = self._plan_lists.get(key)
+        if plan_list is None or not self.is_current(connection_name, plan_list):
+            plan_list = CachedPlanList()
+            self._plan_lists[key] = plan_list
+        self._plan_lists.move_to_end(key)
+        while len(self._plan_lists) > self.max_size:
+            self._plan_lists.popitem(last=False)
+        return plan_list
+
+    def is_current(self, connection_name: str, plan_list: CachedPlanList) -> bool:
+        version = self._versions.get(connection_name)
+        return plan_list.version is not None and version is not None and plan_list.version == version[0]
+
+    def needs_version_check(self, connection_name: str) -> bool:
+        version = self._versions.get(connection_name)
+        ttl = get_setting(PLAN_CATALOG_TTL_SETTING, DEFAULT_PLAN_CATALOG_TTL_S)
+        return version is None or time.monotonic() - version[1] >= ttl
+
+    def set_version(self, connection_name: str, version: PlanCatalogVersion) -> None:
+        self._versions[connection_name] = (version, time.monotonic())
+
+    def invalidate(self, connection_name: str) -> None:
+        """Forget the plan lists of the connection"""
+        self._versions.pop(connection_name, None)
+        for key in [key for key in self._plan_lists if key[0] == connection_name]:
+            del self._plan_lists[key]
+
+
+_plan_catalog_cache = PlanCatalogCache()
+
+
+def get_plan_catalog_cache() -> PlanCatalogCache:
+    return _plan_catalog_cache
+
+
+class PlanCatalogVersionTask(QgsTask):
+    """Fetches the catalog version of a connection in a background thread"""
+
+    version_fetched = pyqtSignal(object)
+
+    def __init__(self, connection_name: str):
+        super().__init__(f"Tarkistetaan kaavaluettelon muutokset yhteydestä {connection_name}", QgsTask.CanCancel)
+        self.connection_name = connection_name
+        self.feedback = QgsFeedback()
+
+    def cancel(self) -> None:
+        self.feedback.cancel()
+        super().cancel()
+
+    def run(self) -> bool:
+        try:
+            version = fetch_plan_catalog_version(get_database_connection(self.connection_name), self.feedback)
+        except QgsProviderConnectionException as e:
+            if not self.isCanceled():
+                logger.warning("Failed to check the plan catalog of %s: %s", self.connection_name, e)
+            return False
+        self.version_fetched.emit(version)
+        return True
+
+
+class PlanQueryTask(QgsTask):
+    """Fetches a page of the plan catalog in a background thread
+
+    The catalog version and the number of matching plans are emitted with `version_fetched`
+    and `count_fetched` first if requested.
+    The rows are then emitted in chunks with `rows_fetched`, so that they can be added
+    to the plan list without blocking the GUI. Canceling the task also cancels the
+    running query."""
+
+    version_fetched = pyqtSignal(object)
+    count_fetched = pyqtSignal(int)
+    rows_fetched = pyqtSignal(object)
+    query_failed = pyqtSignal(str)
+
+    def __init__(
+        self, connection_name: str, search_text: str, after_id: str | None, *, count: bool, limit: int = PLAN_PAGE_SIZE
+    ):
+        super().__init__(f"Haetaan kaavoja yhteydestä {connection_name}", QgsTask.CanCancel)
+        self.connection_name = connection_name
+        self.search_text = search_text
+        self.after_id = after_id
+        self.count = count
+        self.limit = limit
+        self.feedback = QgsFeedback()
+        self.error: str | None = None
+
+    def cancel(self) -> None:
+        self.feedback.cancel()
+        super().cancel()
+
+    def run(self) -> bool:
+        try:
+            # Connections must not be shared between threads
+            connection = get_database_connection(self.connection_name)
+            if self.count:
+                # The version is fetched first, so that changes made during the query make the list outdated
+                self.version_fetched.emit(fetch_plan_catalog_version(connection, self.feedback))
+                self.count_fetched.emit(count_plans(connection, self.search_text, self.feedback))
+            if self.isCanceled():
+                return False
+            self.setProgress(10)
+            rows = fetch_plans(connection, self.search_text, self.after_id, self.limit, self.feedback)
+        except QgsProviderConnectionException as e:
+            if not self.isCanceled():
+                self.error = str(e)
+            return False
+
+        for start in range(0, len(rows), ROW_CHUNK_SIZE):
+            if self.isCanceled():
+                return False
+            self.rows_fetched.emit(rows[start : start + ROW_CHUNK_SIZE])
+            self.setProgress(10 + 90 * (start + ROW_CHUNK_SIZE) / len(rows))
+        return True
+
+    def finished(self, result: bool) -> None:  # noqa: FBT001
+        if not result and self.error is not None:
+            logger.warning("Failed to query plans from %s: %s", self.connection_name, self.error)
+            self.query_failed.emit(self.error)
@@ -0,0 +1,519 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import marshal
+import re
+import tempfile
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Tuple
+
+from qgis.core import (
+    NULL,
+    Qgis,
+    QgsDataProvider,
+    QgsExpression,
+    QgsFeatureRequest,
+    QgsProject,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+)
+from qgis.utils import iface
+
+from arho_feature_template.core.feature_tree_writer import to_provider_feature
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from qgis.core import QgsFeature
+
+logger = logging.getLogger(__name__)
+
+# Whether the features of a loaded plan are edited in a local working copy
+WORKING_COPY_SETTING = "plan_working_copy"
+
+# Field identifying the features in the database and in the working copy
+ID_FIELD = "id"
+
+
+class WorkingCopyError(Exception):
+    pass
+
+
+class WorkingCopyWriteError(WorkingCopyError):
+    def __init__(self, layer_name: str, error: str):
+        super().__init__(f"Failed to write the working copy changes of layer {layer_name}: {error}")
+
+
+# Representations of the attribute values by the field names of the database layer and the digest of the geometry
+_FeatureValues = Tuple[Tuple[str, ...], bytes]
+
+# Version of the sync state file kept next to the working copy
+_STATE_VERSION = 1
+
+
+class _CopiedLayer:
+    __slots__ = ("database_digests", "field_names", "layer", "provider_key", "source", "table_name", "values")
+
+    def __init__(self, layer: QgsVectorLayer, table_name: str) -> None:
+        self.layer = layer
+        self.table_name = table_name
+        self.source = layer.source()
+        self.provider_key = layer.providerType()
+        self.field_names: list[str] = layer.dataProvider().fields().names()
+        # Values of the features in the copy by their ids, as of the last sync
+        self.values: dict[str, _FeatureValues] = {}
+        # Digests of the features in the database by their ids, as of the last sync
+        self.database_digests: dict[str, bytes] = {}
+
+
+class _LayerChanges:
+    __slots__ = ("added", "changed", "deleted_ids")
+
+    def __init__(self) -> None:
+        self.added: list[QgsFeature] = []
+        # Changed feature, names of the changed fields and whether the geometry changed by feature ids
+        self.changed: dict[str, tuple[QgsFeature, list[str], bool]] = {}
+        self.deleted_ids: list[str] = []
+
+
+class WorkingCopySyncResult:
+    __slots__ = ("change_count", "conflicts")
+
+    def __init__(self) -> None:
+        self.change_count = 0
+        # Layer names and ids of the features not written, because they were changed in the database
+        self.conflicts: list[str] = []
+
+
+def _geometry_digest(feature: QgsFeature) -> bytes:
+    return hashlib.blake2b(bytes(feature.geometry().asWkb()), digest_size=16).digest()
+
+
+def _digest(feature: QgsFeature) -> bytes:
+    digest = hashlib.blake2b(repr(feature.attributes()).encode(), digest_size=16)
+    digest.update(bytes(feature.geometry().asWkb()))
+    return digest.digest()
+
+
+def _feature_values(feature: QgsFeature, field_names: list[str]) -> _FeatureValues:
+    # Representations can be compared like the values and saved in the sync state
+    return tuple(repr(feature[name]) for name in field_names), _geometry_digest(feature)
+
+
+class PlanWorkingCopy:
+    """Local GeoPackage copy of the features of a plan, which the plan layers are switched to
+
+    The features of each layer are written to their own table with a spatial index, and
+    the data source of the layer is replaced with the table. Rendering and editing then
+    no longer query the database. Syncing writes only the attributes and geometries
+    changed since the copy was made or last synced, identified by the `id` field.
+    Features that have been changed or deleted in the database in the meantime are
+    not overwritten but reported as conflicts.
+
+    What has been synced is saved in a state file next to the copy, so that a copy
+    detached from the layers with unsynced changes can be reopened later."""
+
+    def __init__(self, plan_id: str, path: Path) -> None:
+        self.plan_id = plan_id
+        self.path = path
+        self.state_path = path.with_suffix(".state")
+        self._layers: list[_CopiedLayer] = []
+
+    def open(self, layers: list[QgsVectorLayer]) -> None:
+        """Copy the features the layers show and switch the layers to the copy
+
+        Referenced layers must be given before the layers referencing them."""
+        self._delete_files()
+        try:
+            for index, layer in enumerate(layers):
+                self._copy_layer(layer, f"layer_{index}")
+            self._write_state()
+        except WorkingCopyError:
+            self.close()
+            raise
+
+    def is_kept(self) -> bool:
+        """Return whether a copy of the plan was kept, e.g. with unsynced changes when the plugin was unloaded"""
+        return self.state_path.exists() and self.path.exists()
+
+    def reopen(self, layers: list[QgsVectorLayer]) -> bool:
+        """Switch the layers to the kept copy, returning False if the copy was made of other layers"""
+        try:
+            with self.state_path.open("rb") as f:
+                state = marshal.load(f)  # noqa: S302
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            msg = f"Failed to read the sync state of the working copy: {e}"
+            raise WorkingCopyError(msg) from e
+
+        if (
+            not isinstance(state, dict)
+            or state.get("version") != _STATE_VERSION
+            or state.get("plan_id") != self.plan_id
+            or len(state["layers"]) != len(layers)
+        ):
+            return False
+
+        copied_layers = []
+        for layer, layer_state in zip(layers, state["layers"]):
+            copied = _CopiedLayer(layer, layer_state["table_name"])
+            if (copied.source, copied.provider_key, copied.field_names) != (
+                layer_state["source"],
+                layer_state["provider_key"],
+                layer_state["field_names"],
+            ):
+                return False
+            copied.values = layer_state["values"]
+            copied.database_digests = layer_state["database_digests"]
+            copied_layers.append(copied)
+
+        try:
+            for copied in copied_layers:
+                self._switch_to_copy(copied)
+        except WorkingCopyError:
+            self.detach(keep_edits=False)
+            raise
+        return True
+
+    def set_aside(self) -> Path:
+        """Rename the kept copy so that a new copy can be made, returning its new path"""
+        index = 1
+        while (backup_path := self.path.with_name(f"{self.path.stem}_{index}{self.path.suffix}")).exists():
+            index += 1
+        self.path.rename(backup_path)
+        self.state_path.unlink()
+        return backup_path
+
+    def _copy_layer(self, layer: QgsVectorLayer, table_name: str) -> None:
+        if layer.fields().lookupField(ID_FIELD) < 0:
+            msg = f"Layer {layer.name()} has no {ID_FIELD} field"
+            raise WorkingCopyError(msg)
+
+        copied = _CopiedLayer(layer, table_name)
+        copied.database_digests = {
+            feature[ID_FIELD]: _digest(feature) for feature in layer.dataProvider().getFeatures()
+        }
+
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = "GPKG"
+        options.layerName = table_name
+        options.actionOnExistingFile = (
+            QgsVectorFileWriter.CreateOrOverwriteLayer
+            if self.path.exists()
+            else QgsVectorFileWriter.CreateOrOverwriteFile
+        )
+        # GeoPackage tables get a spatial index by default
+        result = QgsVectorFileWriter.writeAsVectorFormatV2(
+            layer, str(self.path), QgsProject.instance().transformContext(), options
+        )
+        if result[0] != QgsVectorFileWriter.NoError:
+            msg = f"Failed to copy layer {layer.name()}: {result[1]}"
+            raise WorkingCopyError(msg)
+
+        self._switch_to_copy(copied)
+        copied.values = {
+            feature[ID_FIELD]: _feature_values(feature, copied.field_names) for feature in layer.getFeatures()
+        }
+
+    def _switch_to_copy(self, copied: _CopiedLayer) -> None:
+        layer = copied.layer
+        layer.setDataSource(
+            f"{self.path}|layername={copied.table_name}", layer.name(), "ogr", QgsDataProvider.ProviderOptions()
+        )
+        self._layers.append(copied)
+        if not layer.isValid():
+            msg = f"Failed to open the working copy of layer {layer.name()}"
+            raise WorkingCopyError(msg)
+
+    def sync(self) -> WorkingCopySyncResult:
+        """Write the changes made to the copy to the database
+
+        Changes already written are not written again if writing fails, so syncing can be retried.
+        Conflicting changes are left in the copy and reported again on the next sync."""
+        for copied in self._layers:
+            if copied.layer.isModified():
+                msg = f"Layer {copied.layer.name()} has unsaved changes"
+                raise WorkingCopyError(msg)
+
+        changes = [self._layer_changes(copied) for copied in self._layers]
+        # The layers are written through layers of their own, so the project layers keep showing the copy
+        targets = [QgsVectorLayer(copied.source, copied.layer.name(), copied.provider_key) for copied in self._layers]
+
+        result = WorkingCopySyncResult()
+        try:
+            # Referenced features are added before and deleted after the features referencing them
+            for copied, target, layer_changes in zip(self._layers, targets, changes):
+                if layer_changes.added or layer_changes.changed:
+                    self._write_changes(copied, target, layer_changes, result)
+            for copied, target, layer_changes in reversed(list(zip(self._layers, targets, changes))):
+                if layer_changes.deleted_ids:
+                    self._delete_features(copied, target, layer_changes.deleted_ids, result)
+        finally:
+            self._write_state()
+        return result
+
+    def is_modified(self) -> bool:
+        """Return whether the layers have edits not saved to the copy"""
+        return any(copied.layer.isModified() for copied in self._layers)
+
+    def detach(self, *, keep_edits: bool) -> None:
+        """Switch the layers back to their original data sources, keeping the copy to be reopened
+
+        Unsaved edits of the layers are saved to the copy if keep_edits is set and rolled back otherwise."""
+        for copied in self._layers:
+            layer = copied.layer
+            if layer.isEditable() and not (keep_edits and layer.commitChanges()):
+                if keep_edits:
+                    logger.warning("Failed to save the edits of layer %s: %s", layer.name(), layer.commitErrors())
+                layer.rollBack()
+            layer.setDataSource(copied.source, layer.name(), copied.provider_key, QgsDataProvider.ProviderOptions())
+        self._layers.clear()
+
+    def close(self) -> None:
+        """Switch the layers back to their original data sources and delete the copy without syncing"""
+        self.detach(keep_edits=False)
+        self._delete_files()
+
+    def _write_state(self) -> None:
+        state = {
+            "version": _STATE_VERSION,
+            "plan_id": self.plan_id,
+            "layers": [
+                {
+                    "source": copied.source,
+                    "provider_key": copied.provider_key,
+                    "table_name": copied.table_name,
+                    "field_names": copied.field_names,
+                    "values": copied.values,
+                    "database_digests": copied.database_digests,
+                }
+                for copied in self._layers
+            ],
+        }
+        try:
+            with self.state_path.open("wb") as f:
+                marshal.dump(state, f)
+        except (OSError, ValueError) as e:
+            msg = f"Failed to save the sync state of the working copy: {e}"
+            raise WorkingCopyError(msg) from e
+
+    def _delete_files(self) -> None:
+        for path in (self.state_path, self.path):
+            try:
+                if path.exists():
+                    path.unlink()
+            except OSError as e:
+                logger.warning("Failed to delete %s: %s", path, e)
+
+    def _layer_changes(self, copied: _CopiedLayer) -> _LayerChanges:
+        changes = _LayerChanges()
+        id_index = copied.layer.fields().lookupField(ID_FIELD)
+        new_ids = {}
+        feature_ids = set()
+        for feature in copied.layer.getFeatures():
+            feature_id = feature[ID_FIELD]
+            if feature_id is None or feature_id == NULL:
+                # Ids of new features are generated like the ids of template features
+                feature_id = str(uuid.uuid4())
+                feature.setAttribute(id_index, feature_id)
+                new_ids[feature.id()] = {id_index: feature_id}
+            feature_ids.add(feature_id)
+            values = copied.values.get(feature_id)
+            if values is None:
+                changes.added.append(feature)
+                continue
+            attribute_values, geometry_digest = _feature_values(feature, copied.field_names)
+            changed_field_names = [
+                name
+                for name, old_value, value in zip(copied.field_names, values[0], attribute_values)
+                if old_value != value
+            ]
+            geometry_changed = geometry_digest != values[1]
+            if changed_field_names or geometry_changed:
+                changes.changed[feature_id] = (feature, changed_field_names, geometry_changed)
+        changes.deleted_ids = [feature_id for feature_id in copied.values if feature_id not in feature_ids]
+
+        # The generated ids are saved, so that the features are not added again when syncing is retried
+        if new_ids and not copied.layer.dataProvider().changeAttributeValues(new_ids):
+            raise WorkingCopyWriteError(copied.layer.name(), copied.layer.dataProvider().lastError())
+        return changes
+
+    def _write_changes(
+        self, copied: _CopiedLayer, target: QgsVectorLayer, changes: _LayerChanges, result: WorkingCopySyncResult
+    ) -> None:
+        provider = target.dataProvider()
+        written = {}
+        if changes.added:
+            success, _ = provider.addFeatures([to_provider_feature(target, feature) for feature in changes.added])
+            if not success:
+                raise WorkingCopyWriteError(copied.layer.name(), provider.lastError())
+            written.update((feature[ID_FIELD], feature) for feature in changes.added)
+
+        if changes.changed:
+            database_features = self._database_features(target, changes.changed)
+            attribute_changes = {}
+            geometry_changes = {}
+            for feature_id, (feature, changed_field_names, geometry_changed) in changes.changed.items():
+                database_feature = database_features.get(feature_id)
+                if database_feature is None or _digest(database_feature) != copied.database_digests.get(feature_id):
+                    result.conflicts.append(f"{copied.layer.name()} {feature_id}")
+                    continue
+                target_feature = to_provider_feature(target, feature)
+                if changed_field_names:
+                    attribute_changes[database_feature.id()] = {
+                        index: target_feature.attribute(index)
+                        for index in (provider.fields().lookupField(name) for name in changed_field_names)
+                    }
+                if geometry_changed:
+                    geometry_changes[database_feature.id()] = target_feature.geometry()
+                written[feature_id] = feature
+            if (attribute_changes or geometry_changes) and not provider.changeFeatures(
+                attribute_changes, geometry_changes
+            ):
+                raise WorkingCopyWriteError(copied.layer.name(), provider.lastError())
+
+        for feature_id, feature in written.items():
+            copied.values[feature_id] = _feature_values(feature, copied.field_names)
+        # The written features are read back, as the database may have set some of their values
+        for feature_id, database_feature in self._database_features(target, written).items():
+            copied.database_digests[feature_id] = _digest(database_feature)
+        result.change_count += len(written)
+
+    def _delete_features(
+        self, copied: _CopiedLayer, target: QgsVectorLayer, feature_ids: list[str], result: WorkingCopySyncResult
+    ) -> None:
+        database_features = self._database_features(target, feature_ids)
+        deleted_ids = []
+        target_ids = []
+        for feature_id in feature_ids:
+            database_feature = database_features.get(feature_id)
+            if database_feature is not None:
+                if _digest(database_feature) != copied.database_digests.get(feature_id):
+                    result.conflicts.append(f"{copied.layer.name()} {feature_id}")
+                    continue
+                target_ids.append(database_feature.id())
+            # Features already deleted in the database need no deleting
+            deleted_ids.append(feature_id)
+
+        provider = target.dataProvider()
+        if target_ids and not provider.deleteFeatures(target_ids):
+            raise WorkingCopyWriteError(copied.layer.name(), provider.lastError())
+        for feature_id in deleted_ids:
+            del copied.values[feature_id]
+            copied.database_digests.pop(feature_id, None)
+        result.change_count += len(target_ids)
+
+    def _database_features(self, target: QgsVectorLayer, feature_ids: Iterable[str]) -> dict[str, QgsFeature]:
+        """Return the features of the target layer with the given ids by their ids"""
+        quoted_ids = [QgsExpression.quotedValue(feature_id) for feature_id in feature_ids]
+        if not quoted_ids:
+            return {}
+        request = QgsFeatureRequest().setFilterExpression(
+            f"{QgsExpression.quotedColumnRef(ID_FIELD)} IN ({', '.join(quoted_ids)})"
+        )
+        return {feature[ID_FIELD]: feature for feature in target.dataProvider().getFeatures(request)}
+
+
+_working_copy: PlanWorkingCopy | None = None
+
+
+def get_working_copy() -> PlanWorkingCopy | None:
+    return _working_copy
+
+
+def open_working_copy(plan_id: str, layers: list[QgsVectorLayer]) -> None:
+    """Switch the layers to a working copy of the plan, showing a message if that fails
+
+    A copy of the plan kept with unsynced changes is reopened. If it was made of other
+    layers, it is renamed and a new copy is made."""
+    global _working_copy  # noqa: PLW0603
+    directory = Path(tempfile.gettempdir()) / "arho_feature_template"
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"plan_{re.sub(r'[^0-9A-Za-z_-]', '_', plan_id)}.gpkg"
+    try:
+        working_copy = PlanWorkingCopy(plan_id, path)
+        if working_copy.is_kept():
+            if working_copy.reopen(layers):
+                iface.messageBar().pushMessage(
+                    "Kaava",
+                    "Avattiin kaavan työkopio, jonka muutoksia ei ole tallennettu tietokantaan",
+                    level=Qgis.Info,
+                )
+                _working_copy = working_copy
+                return
+            backup_path = working_copy.set_aside()
+            logger.warning("Kept working copy of plan %s does not match the plan layers", plan_id)
+            iface.messageBar().pushMessage(
+                "Warning",
+                f"Kaavan aiempi työkopio ei vastaa kaavan tasoja, se on tallennettu tiedostoon {backup_path}",
+                level=Qgis.Warning,
+            )
+        working_copy.open(layers)
+    except (WorkingCopyError, OSError) as e:
+        logger.warning("Failed to create a working copy of plan %s: %s", plan_id, e)
+        iface.messageBar().pushMessage(
+            "Warning", f"Kaavan työkopion luominen epäonnistui, kaavaa muokataan tietokannassa: {e}", level=Qgis.Warning
+        )
+    else:
+        _working_copy = working_copy
+
+
+def sync_working_copy() -> bool:
+    """Write the changes of the working copy to the database, returning False if some were not written"""
+    if _working_copy is None:
+        return True
+    try:
+        result = _working_copy.sync()
+    except WorkingCopyError as e:
+        logger.warning("Failed to sync the working copy of plan %s: %s", _working_copy.plan_id, e)
+        iface.messageBar().pushMessage("Error", f"Kaavan työkopion tallentaminen epäonnistui: {e}", level=Qgis.Critical)
+        return False
+    if result.conflicts:
+        logger.warning(
+            "Features changed in the database were not synced from the working copy of plan %s: %s",
+            _working_copy.plan_id,
+            ", ".join(result.conflicts),
+        )
+        iface.messageBar().pushMessage(
+            "Kaava",
+            f"Tallennettiin {result.change_count} muutosta työkopiosta. {len(result.conflicts)} kohteen muutoksia ei "
+            "tallennettu, koska kohteita on muutettu tietokannassa. Muutokset jäävät työkopioon: "
+            + ", ".join(result.conflicts),
+            level=Qgis.Warning,
+        )
+        return False
+    iface.messageBar().pushMessage(
+        "Kaava", f"Tallennettiin {result.change_count} muutosta työkopiosta", level=Qgis.Success, duration=3
+    )
+    return True
+
+
+def close_working_copy() -> bool:
+    """Sync and close the working copy, returning False if it was left open because some changes were not written
+
+    The copy is only deleted when all of its changes have been written, and otherwise it is
+    left for the user to fix the changes or to discard them."""
+    if _working_copy is None:
+        return True
+    if not sync_working_copy():
+        return False
+    discard_working_copy()
+    return True
+
+
+def detach_working_copy(*, keep_edits: bool) -> None:
+    """Switch the layers back to their data sources without syncing, keeping the copy to reopen with the plan"""
+    global _working_copy  # noqa: PLW0603
+    if _working_copy is not None:
+        _working_copy.detach(keep_edits=keep_edits)
+        logger.info("Kept the working copy of plan %s in %s", _working_copy.plan_id, _working_copy.path)
+        _working_copy = None
+
+
+def discard_working_copy() -> None:
+    """Close the working copy without syncing, dropping the changes that have not been synced"""
+    global _working_copy  # noqa: PLW0603
+    if _working_copy is not None:
+        _working_copy.close()
+        _working_copy = None
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+from qgis.core import Qgis
+from qgis.PyQt.QtCore import QObject, QTimer, pyqtSignal
+from qgis.utils import iface
+
+from arho_feature_template.core.feature_tree_writer import FeatureTreeWriteError
+from arho_feature_template.utils.settings import get_setting
+
+if TYPE_CHECKING:
+    from qgis.core import QgsVectorLayer
+
+    from arho_feature_template.core.feature_tree_writer import FeatureTree
+
+logger = logging.getLogger(__name__)
+
+DEFERRED_COMMIT_SETTING = "template_deferred_commit"
+
+# Template features are committed when this many are waiting
+COMMIT_BATCH_SIZE_SETTING = "template_commit_batch_size"
+DEFAULT_COMMIT_BATCH_SIZE = 20
+
+# Template features are committed at the latest this long after the first one was added, 0 to disable
+COMMIT_INTERVAL_SETTING = "template_commit_interval_s"
+DEFAULT_COMMIT_INTERVAL_S = 60
+
+
+class EditBufferError(FeatureTreeWriteError):
+    def __init__(self, layer_name: str):
+        super().__init__(f"Failed to add features to the edit buffer of layer {layer_name}")
+
+
+class UnsavedChangesError(FeatureTreeWriteError):
+    def __init__(self, layer_name: str):
+        super().__init__(f"Layer {layer_name} has unsaved changes, save them before creating template features")
+
+
+class TemplateEditSession(QObject):
+    """Collects template features in the edit buffers of their layers and commits them in batches
+
+    Committing flushes the edit buffer and reloads the layer, so committing many features
+    at once is much faster than committing each of them. The layers are committed in the
+    order the features were written, so that referenced features are committed first.
+
+    Committing a layer commits its whole edit buffer, so features are not added to layers
+    that have unsaved changes of their own when the session starts using them. Edits made
+    to the layers of the session before it is committed are committed with it."""
+
+    pending_count_changed = pyqtSignal(int)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.batch_size = max(1, get_setting(COMMIT_BATCH_SIZE_SETTING, DEFAULT_COMMIT_BATCH_SIZE))
+        self.pending_count = 0
+        # Layers with uncommitted template features in commit order
+        self.layers: dict[str, QgsVectorLayer] = {}
+        # Layer ids of each pending template feature and its child features
+        self._pending_layer_ids: list[frozenset[str]] = []
+
+        self.commit_timer = QTimer(self)
+        self.commit_timer.setSingleShot(True)
+        self.commit_timer.setInterval(1000 * get_setting(COMMIT_INTERVAL_SETTING, DEFAULT_COMMIT_INTERVAL_S))
+        self.commit_timer.timeout.connect(self.commit)
+
+    def add(self, tree: FeatureTree) -> None:
+        """Add the features of the tree to the edit buffers of their layers"""
+        for layer_id, layer in tree.layers.items():
+            if layer_id not in self.layers and layer.isModified():
+                raise UnsavedChangesError(layer.name())
+
+        added_layers: list[QgsVectorLayer] = []
+        for layer_id in tree.write_order():
+            layer = tree.layers[layer_id]
+            if layer.isEditable() or layer.startEditing():
+                layer.beginEditCommand("Create feature from template")
+                if layer.addFeatures(tree.layer_features[layer_id]):
+                    layer.endEditCommand()
+                    added_layers.append(layer)
+                    continue
+                layer.destroyEditCommand()
+
+            # Remove the features of the tree that were already added
+            for added_layer in added_layers:
+                added_layer.undoStack().undo()
+            raise EditBufferError(layer.name())
+
+        for layer in added_layers:
+            self.layers.setdefault(layer.id(), layer)
+
+        self._pending_layer_ids.append(frozenset(tree.layers))
+        self._set_pending_count(len(self._pending_layer_ids))
+        if self.pending_count >= self.batch_size:
+            self.commit()
+        elif self.commit_timer.interval() > 0 and not self.commit_timer.isActive():
+            self.commit_timer.start()
+
+    def commit(self) -> bool:
+        """Commit the pending template features, returning False if committing failed"""
+        self.commit_timer.stop()
+        if not self.pending_count:
+            return True
+
+        committed_layer_ids = []
+        for layer_id, layer in self.layers.items():
+            if layer.isModified() and not layer.commitChanges(stopEditing=False):
+                # Features referring to the failed features cannot be committed either
+                logger.warning("Failed to commit layer %s: %s", layer.name(), layer.commitErrors())
+                for committed_layer_id in committed_layer_ids:
+                    del self.layers[committed_layer_id]
+                # Template features are pending until all of their layers have been committed
+                self._pending_layer_ids = [
+                    layer_ids for layer_ids in self._pending_layer_ids if not layer_ids.isdisjoint(self.layers)
+                ]
+                self._set_pending_count(len(self._pending_layer_ids))
+                iface.messageBar().pushMessage(
+                    "Error",
+                    f"Templaattikohteiden tallentaminen tasolle {layer.name()} epäonnistui: "
+                    + "; ".join(layer.commitErrors()),
+                    level=Qgis.Critical,
+                )
+                return False
+            committed_layer_ids.append(layer_id)
+
+        iface.messageBar().pushMessage(
+            "Templaatit", f"Tallennettiin {self.pending_count} templaattikohdetta", level=Qgis.Success, duration=3
+        )
+        self.layers.clear()
+        self._pending_layer_ids.clear()
+        self._set_pending_count(0)
+        return True
+
+    def _set_pending_count(self, count: int) -> None:
+        self.pending_count = count
+        self.pending_count_changed.emit(count)
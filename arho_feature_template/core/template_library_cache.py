@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import marshal
+import os
+import sys
+from dataclasses import astuple
+from typing import TYPE_CHECKING, NamedTuple
+
+from arho_feature_template.core.template_library_config import (
+    TemplateLibraryConfig,
+    TemplateLibraryMeta,
+    parse_template_library_config_content,
+    read_template_library_meta,
+    stream_template_library_config,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+    from arho_feature_template.core.template_library_config import FeatureTemplate
+
+logger = logging.getLogger(__name__)
+
+# Bump when the tuple layout of the cached configuration changes
+CACHE_FORMAT_VERSION = 2
+
+
+class CacheEntry(NamedTuple):
+    format_version: int
+    python_version: tuple[int, int]
+    path: str
+    mtime_ns: int
+    size: int
+    digest: str
+    data: tuple
+
+
+class TemplateLibraryCache:
+    """On-disk cache of parsed template library configurations
+
+    Each library file has its own cache entry, which is keyed by the file path and
+    validated against the file's modification time, size and content hash. The parsed
+    configuration is stored as plain tuples serialized with `marshal`, so loading an
+    unchanged library skips YAML parsing altogether."""
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = cache_dir
+
+    def load(
+        self, config_file: Path, on_templates: Callable[[tuple[FeatureTemplate, ...]], None] | None = None
+    ) -> TemplateLibraryConfig:
+        """Load the template library from cache, parsing the YAML file only if it has changed
+
+        If the file is parsed, its templates are passed to `on_templates` in batches as they are
+        parsed, see `stream_template_library_config`. Raises the same errors as
+        `parse_template_library_config`."""
+        path = str(config_file.resolve())
+        stat = config_file.stat()
+        entry = self._read_entry(path)
+
+        if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            config = self._config_from_entry(entry)
+            if config is not None:
+                return config
+
+        content = config_file.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+
+        config = None
+        if entry is not None and entry.digest == digest:
+            # File was touched but its content is the same
+            config = self._config_from_entry(entry)
+        if config is None:
+            logger.debug("Parsing template library %s", path)
+            if on_templates is None:
+                config = parse_template_library_config_content(content)
+            else:
+                config = stream_template_library_config(content, on_templates)
+
+        self._write_entry(
+            CacheEntry(
+                format_version=CACHE_FORMAT_VERSION,
+                python_version=sys.version_info[:2],
+                path=path,
+                mtime_ns=stat.st_mtime_ns,
+                size=stat.st_size,
+                digest=digest,
+                data=astuple(config),
+            )
+        )
+        return config
+
+    def load_meta(self, config_file: Path) -> TemplateLibraryMeta:
+        """Load only the metadata of the template library
+
+        Uses the cached configuration if the file is unchanged, otherwise reads only the
+        `meta` block of the YAML file without touching the cache."""
+        path = str(config_file.resolve())
+        stat = config_file.stat()
+        entry = self._read_entry(path)
+
+        if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            try:
+                return TemplateLibraryMeta(*entry.data[1])
+            except (TypeError, ValueError, IndexError):
+                logger.debug("Ignoring malformed template library cache entry for %s", entry.path)
+
+        return read_template_library_meta(config_file)
+
+    def _entry_path(self, path: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(path.encode('utf-8')).hexdigest()}.cache"  # noqa: S324
+
+    def _read_entry(self, path: str) -> CacheEntry | None:
+        entry_path = self._entry_path(path)
+        if not entry_path.exists():
+            return None
+
+        try:
+            entry = CacheEntry(*marshal.loads(entry_path.read_bytes()))  # noqa: S302
+        except (OSError, EOFError, ValueError, TypeError):
+            logger.debug("Ignoring unreadable template library cache entry %s", entry_path)
+            return None
+
+        if (
+            entry.format_version != CACHE_FORMAT_VERSION
+            or tuple(entry.python_version) != sys.version_info[:2]
+            or entry.path != path
+        ):
+            return None
+        return entry
+
+    def _write_entry(self, entry: CacheEntry) -> None:
+        entry_path = self._entry_path(entry.path)
+        temp_path = entry_path.with_suffix(".tmp")
+        try:
+            content = marshal.dumps(tuple(entry))
+        except ValueError:
+            # Library contains values that marshal does not support, e.g. YAML timestamps
+            logger.debug("Template library %s cannot be cached", entry.path)
+            return
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            temp_path.write_bytes(content)
+            os.replace(temp_path, entry_path)
+        except OSError as e:
+            logger.warning("Failed to write template library cache: %s", e)
+
+    @staticmethod
+    def _config_from_entry(entry: CacheEntry) -> TemplateLibraryConfig | None:
+        try:
+            return TemplateLibraryConfig.from_tuple(entry.data)
+        except (TypeError, ValueError):
+            logger.debug("Ignoring malformed template library cache entry for %s", entry.path)
+            return None
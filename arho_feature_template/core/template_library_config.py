@@ -1,16 +1,26 @@
 from __future__ import annotations
 
 import logging
+import sys
 from dataclasses import dataclass
-from typing import TYPE_CHECKING
+from typing import IO, TYPE_CHECKING, Any, Callable, TypeVar
 
 import yaml
 
+try:
+    # Use the libyaml based loader when PyYAML has been built with it
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader  # type: ignore[assignment]
+
 if TYPE_CHECKING:
+    from collections.abc import Iterator
     from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 SUPPORTED_TEMPLATE_VERSION = 1
 
 
@@ -24,34 +34,86 @@ class TemplateSyntaxError(Exception):
         super().__init__(f"Invalid template syntax: {message}")
 
 
-@dataclass
+def _intern(value: T) -> T:
+    """Intern repeated strings such as layer names and attribute keys to share their memory"""
+    return sys.intern(value) if isinstance(value, str) else value  # type: ignore[return-value]
+
+
+# Template library files may contain YAML of any shape, so the types of the blocks are
+# checked to report malformed libraries as syntax errors.
+
+
+def _mapping(data: Any, name: str) -> dict:
+    if not isinstance(data, dict):
+        msg = f"{name} must be a mapping"
+        raise TemplateSyntaxError(msg)
+    return data
+
+
+def _list(data: dict, key: str) -> list:
+    value = data[key]
+    if not isinstance(value, list):
+        msg = f"'{key}' must be a list"
+        raise TemplateSyntaxError(msg)
+    return value
+
+
+def _str(data: dict, key: str) -> str:
+    value = data[key]
+    if not isinstance(value, str):
+        msg = f"'{key}' must be a string"
+        raise TemplateSyntaxError(msg)
+    return value
+
+
+# The configuration classes are frozen and slotted as large libraries contain tens of
+# thousands of them. Sequences are stored as tuples, so all features without child
+# features share the same empty tuple.
+
+
+@dataclass(frozen=True)
 class TemplateLibraryConfig:
     """Describes the configuration of a template library"""
 
+    __slots__ = ("version", "meta", "templates")
+
     version: str
     meta: TemplateLibraryMeta
-    templates: list[FeatureTemplate]
+    templates: tuple[FeatureTemplate, ...]
 
     @classmethod
     def from_dict(cls, data: dict) -> TemplateLibraryConfig:
-        file_version = data["version"]
-        if file_version != SUPPORTED_TEMPLATE_VERSION:
-            raise TemplateLibraryVersionError(file_version)
-
+        data = _mapping(data, "template library")
         try:
+            file_version = data["version"]
+            if file_version != SUPPORTED_TEMPLATE_VERSION:
+                raise TemplateLibraryVersionError(file_version)
+
             return cls(
                 version=file_version,
                 meta=TemplateLibraryMeta.from_dict(data["meta"]),
-                templates=[FeatureTemplate.from_dict(template) for template in data["templates"]],
+                templates=tuple(FeatureTemplate.from_dict(template) for template in _list(data, "templates")),
             )
         except KeyError as e:
             raise TemplateSyntaxError(str(e)) from e
 
+    @classmethod
+    def from_tuple(cls, data: tuple) -> TemplateLibraryConfig:
+        """Rebuild the configuration from the output of `dataclasses.astuple`"""
+        version, meta, templates = data
+        return cls(
+            version=version,
+            meta=TemplateLibraryMeta(*meta),
+            templates=tuple(FeatureTemplate.from_tuple(template) for template in templates),
+        )
 
-@dataclass
+
+@dataclass(frozen=True)
 class TemplateLibraryMeta:
     """Describes the metadata of a template library"""
 
+    __slots__ = ("name", "group", "sub_group", "description", "version")
+
     name: str
     group: str | None
     sub_group: str | None
@@ -60,8 +122,9 @@ class TemplateLibraryMeta:
 
     @classmethod
     def from_dict(cls, data: dict) -> TemplateLibraryMeta:
+        data = _mapping(data, "'meta'")
         return cls(
-            name=data["name"],
+            name=_str(data, "name"),
             group=data.get("group"),
             sub_group=data.get("sub_group"),
             description=data.get("description"),
@@ -69,10 +132,12 @@ class TemplateLibraryMeta:
         )
 
 
-@dataclass
+@dataclass(frozen=True)
 class FeatureTemplate:
     """Describes a feature template that can include nested features"""
 
+    __slots__ = ("name", "group", "sub_group", "description", "feature")
+
     name: str
     group: str | None
     sub_group: str | None
@@ -81,43 +146,80 @@ class FeatureTemplate:
 
     @classmethod
     def from_dict(cls, data: dict) -> FeatureTemplate:
+        data = _mapping(data, "template")
         return cls(
-            name=data["name"],
-            group=data.get("group"),
-            sub_group=data.get("sub_group"),
+            name=_str(data, "name"),
+            group=_intern(data.get("group")),
+            sub_group=_intern(data.get("sub_group")),
             description=data.get("description"),
             feature=Feature.from_dict(data["feature"]),
         )
 
+    @classmethod
+    def from_tuple(cls, data: tuple) -> FeatureTemplate:
+        name, group, sub_group, description, feature = data
+        return cls(
+            name=name,
+            group=_intern(group),
+            sub_group=_intern(sub_group),
+            description=description,
+            feature=Feature.from_tuple(feature),
+        )
 
-@dataclass
+
+@dataclass(frozen=True)
 class Feature:
     """Describes a feature to be inserted into a Vector layer"""
 
+    __slots__ = ("layer", "attributes", "child_features")
+
     layer: str
-    attributes: list[Attribute]
-    child_features: list[Feature] | None
+    attributes: tuple[Attribute, ...]
+    child_features: tuple[Feature, ...]
 
     @classmethod
     def from_dict(cls, data: dict) -> Feature:
+        data = _mapping(data, "'feature'")
+        child_features = _list(data, "child_features") if "child_features" in data else ()
         return cls(
-            layer=data["layer"],
-            attributes=[Attribute.from_dict(attribute) for attribute in data["attributes"]],
-            child_features=[Feature.from_dict(feature) for feature in data.get("child_features", [])],
+            layer=_intern(_str(data, "layer")),
+            attributes=tuple(Attribute.from_dict(attribute) for attribute in _list(data, "attributes")),
+            child_features=tuple(Feature.from_dict(feature) for feature in child_features),
         )
 
+    @classmethod
+    def from_tuple(cls, data: tuple) -> Feature:
+        layer, attributes, child_features = data
+        return cls(
+            layer=_intern(layer),
+            attributes=tuple(Attribute.from_tuple(attribute) for attribute in attributes),
+            child_features=tuple(Feature.from_tuple(feature) for feature in child_features),
+        )
 
-@dataclass
+
+@dataclass(frozen=True)
 class Attribute:
     """Describes an attribute to be set on a feature"""
 
+    __slots__ = ("attribute", "default", "description")
+
     attribute: str
     default: str | None
     description: str | None
 
     @classmethod
     def from_dict(cls, data: dict) -> Attribute:
-        return cls(attribute=data["attribute"], default=data.get("default"), description=data.get("description"))
+        data = _mapping(data, "attribute")
+        return cls(
+            attribute=_intern(_str(data, "attribute")),
+            default=_intern(data.get("default")),
+            description=data.get("description"),
+        )
+
+    @classmethod
+    def from_tuple(cls, data: tuple) -> Attribute:
+        attribute, default, description = data
+        return cls(attribute=_intern(attribute), default=_intern(default), description=description)
 
     def display(self) -> str:
         if self.description is not None:
@@ -127,7 +229,215 @@ class Attribute:
         return ""
 
 
+def load_yaml(stream: str | bytes | IO) -> Any:
+    """Safely load a YAML document using the fastest available loader"""
+    return yaml.load(stream, Loader=YamlLoader)
+
+
 def parse_template_library_config(template_library_config: Path) -> TemplateLibraryConfig:
     with template_library_config.open(encoding="utf-8") as f:
-        data = yaml.safe_load(f)
+        data = load_yaml(f)
         return TemplateLibraryConfig.from_dict(data)
+
+
+def parse_template_library_config_content(content: str | bytes) -> TemplateLibraryConfig:
+    """Parse a template library configuration that has already been read into memory"""
+    data = load_yaml(content)
+    return TemplateLibraryConfig.from_dict(data)
+
+
+def stream_template_library_config(
+    content: str | bytes, on_templates: Callable[[tuple[FeatureTemplate, ...]], None], batch_size: int = 500
+) -> TemplateLibraryConfig:
+    """Parse a template library, passing its templates to `on_templates` in batches as they are parsed
+
+    The templates are passed on only if the library version has been checked before them,
+    otherwise they are only returned with the whole configuration."""
+    loader = YamlLoader(content)
+    try:
+        version = None
+        meta = None
+        templates: list[FeatureTemplate] | None = None
+        for key in _iter_root_keys(loader):
+            if key == "version":
+                version = loader.construct_document(_compose_node(loader, {}))
+                if version != SUPPORTED_TEMPLATE_VERSION:
+                    raise TemplateLibraryVersionError(version)
+            elif key == "meta":
+                data = loader.construct_document(_compose_node(loader, {}))
+                try:
+                    meta = TemplateLibraryMeta.from_dict(data)
+                except KeyError as e:
+                    raise TemplateSyntaxError(str(e)) from e
+            elif key == "templates":
+                templates = []
+                passed_count = 0 if version is not None else None
+                for template in _iter_sequence(loader, FeatureTemplate.from_dict):
+                    templates.append(template)
+                    if passed_count is not None and len(templates) - passed_count >= batch_size:
+                        on_templates(tuple(templates[passed_count:]))
+                        passed_count = len(templates)
+                if passed_count is not None and passed_count < len(templates):
+                    on_templates(tuple(templates[passed_count:]))
+            else:
+                _skip_node(loader)
+    finally:
+        loader.dispose()
+
+    if version is None or meta is None or templates is None:
+        missing_key = "version" if version is None else "meta" if meta is None else "templates"
+        msg = f"missing '{missing_key}'"
+        raise TemplateSyntaxError(msg)
+    return TemplateLibraryConfig(version=version, meta=meta, templates=tuple(templates))
+
+
+def iter_feature_templates(template_library_config: Path) -> Iterator[FeatureTemplate]:
+    """Parse feature templates from a template library one template at a time
+
+    Only a single template is held in memory at a time, so the caller can start using the
+    templates before the whole file has been read. The library version must be defined
+    before the templates."""
+    with template_library_config.open(encoding="utf-8") as f:
+        loader = YamlLoader(f)
+        try:
+            version = None
+            for key in _iter_root_keys(loader):
+                if key == "version":
+                    version = loader.construct_document(_compose_node(loader, {}))
+                    if version != SUPPORTED_TEMPLATE_VERSION:
+                        raise TemplateLibraryVersionError(version)
+                elif key == "templates":
+                    if version is None:
+                        msg = "'version' must be defined before 'templates'"
+                        raise TemplateSyntaxError(msg)
+                    yield from _iter_sequence(loader, FeatureTemplate.from_dict)
+                else:
+                    _skip_node(loader)
+        finally:
+            loader.dispose()
+
+
+def read_template_library_meta(template_library_config: Path) -> TemplateLibraryMeta:
+    """Read only the metadata of a template library
+
+    Parsing stops as soon as both the `version` and the `meta` blocks have been read, so
+    the templates of the library are not parsed if they are defined after them."""
+    with template_library_config.open(encoding="utf-8") as f:
+        loader = YamlLoader(f)
+        try:
+            version = None
+            meta = None
+            for key in _iter_root_keys(loader):
+                if key == "version":
+                    version = loader.construct_document(_compose_node(loader, {}))
+                    if version != SUPPORTED_TEMPLATE_VERSION:
+                        raise TemplateLibraryVersionError(version)
+                elif key == "meta":
+                    data = loader.construct_document(_compose_node(loader, {}))
+                    try:
+                        meta = TemplateLibraryMeta.from_dict(data)
+                    except KeyError as e:
+                        raise TemplateSyntaxError(str(e)) from e
+                else:
+                    _skip_node(loader)
+                if version is not None and meta is not None:
+                    return meta
+        finally:
+            loader.dispose()
+
+    msg = "missing 'meta'" if meta is None else "missing 'version'"
+    raise TemplateSyntaxError(msg)
+
+
+def _iter_root_keys(loader: YamlLoader) -> Iterator[Any]:
+    """Iterate the keys of the root mapping of the document
+
+    After each key the loader is positioned at the start of the corresponding value,
+    which the caller must consume before advancing the iterator."""
+    loader.get_event()  # StreamStartEvent
+    if not loader.check_event(yaml.DocumentStartEvent):
+        msg = "empty template library"
+        raise TemplateSyntaxError(msg)
+    loader.get_event()
+    if not loader.check_event(yaml.MappingStartEvent):
+        msg = "template library must be a mapping"
+        raise TemplateSyntaxError(msg)
+    loader.get_event()
+
+    while not loader.check_event(yaml.MappingEndEvent):
+        yield loader.construct_document(_compose_node(loader, {}))
+
+
+def _iter_sequence(loader: YamlLoader, from_dict: Callable[[dict], T]) -> Iterator[T]:
+    if not loader.check_event(yaml.SequenceStartEvent):
+        msg = "expected a sequence"
+        raise TemplateSyntaxError(msg)
+    loader.get_event()
+
+    anchors: dict[str, yaml.Node] = {}
+    while not loader.check_event(yaml.SequenceEndEvent):
+        data = loader.construct_document(_compose_node(loader, anchors))
+        try:
+            yield from_dict(data)
+        except KeyError as e:
+            raise TemplateSyntaxError(str(e)) from e
+    loader.get_event()
+
+
+def _skip_node(loader: YamlLoader) -> None:
+    """Consume the events of the next node without composing it"""
+    depth = 0
+    while True:
+        event = loader.get_event()
+        if isinstance(event, (yaml.SequenceStartEvent, yaml.MappingStartEvent)):
+            depth += 1
+        elif isinstance(event, (yaml.SequenceEndEvent, yaml.MappingEndEvent)):
+            depth -= 1
+        if depth == 0:
+            return
+
+
+def _compose_node(loader: YamlLoader, anchors: dict[str, yaml.Node]) -> yaml.Node:
+    """Compose the next node from the event stream
+
+    The libyaml based loader can only compose whole documents, so the nodes are composed
+    here from the parser events in the same way as `yaml.composer.Composer` does."""
+    event = loader.get_event()
+
+    if isinstance(event, yaml.AliasEvent):
+        if event.anchor not in anchors:
+            msg = f"found undefined alias {event.anchor}"
+            raise TemplateSyntaxError(msg)
+        return anchors[event.anchor]
+
+    node: yaml.Node
+    if isinstance(event, yaml.ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+        node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+    elif isinstance(event, yaml.SequenceStartEvent):
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = loader.resolve(yaml.SequenceNode, None, event.implicit)
+        node = yaml.SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        while not loader.check_event(yaml.SequenceEndEvent):
+            node.value.append(_compose_node(loader, anchors))
+        node.end_mark = loader.get_event().end_mark
+    elif isinstance(event, yaml.MappingStartEvent):
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = loader.resolve(yaml.MappingNode, None, event.implicit)
+        node = yaml.MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        while not loader.check_event(yaml.MappingEndEvent):
+            key_node = _compose_node(loader, anchors)
+            value_node = _compose_node(loader, anchors)
+            node.value.append((key_node, value_node))
+        node.end_mark = loader.get_event().end_mark
+    else:
+        msg = f"unexpected {event}"
+        raise TemplateSyntaxError(msg)
+
+    if event.anchor is not None:
+        anchors[event.anchor] = node
+    return node
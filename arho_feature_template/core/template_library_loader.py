@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Callable
+
+import yaml
+from qgis.core import QgsTask
+from qgis.PyQt.QtCore import pyqtSignal
+
+from arho_feature_template.core.template_library_config import TemplateLibraryVersionError, TemplateSyntaxError
+from arho_feature_template.core.template_search import TemplateTrigramIndex
+from arho_feature_template.resources.template_libraries import library_config_files
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from arho_feature_template.core.template_library_config import TemplateLibraryConfig
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateLibraryLoadTask(QgsTask):
+    """Reads template library files in parallel in a background thread
+
+    `library_loaded` is emitted with the file path and the result of `load` for each file
+    in the order of the files, as soon as the file and the files before it have been read,
+    so the results can be used before the whole task finishes. Files that fail to load are
+    reported with `library_failed` and skipped.
+    If no files are given, the bundled template library files are discovered in the
+    background as well.
+
+    If `stream_templates` is set, `load` is also given a callback, which it can call with
+    batches of templates while the file is being parsed. The batches are emitted with
+    `templates_loaded` before `library_loaded` is emitted for the file."""
+
+    library_loaded = pyqtSignal(object, object)
+    library_failed = pyqtSignal(object, str)
+    templates_loaded = pyqtSignal(object, object)
+
+    def __init__(
+        self,
+        description: str,
+        load: Callable[..., object],
+        config_files: list[Path] | None = None,
+        *,
+        stream_templates: bool = False,
+    ):
+        super().__init__(description, QgsTask.CanCancel)
+        self.load = load
+        self.config_files = config_files
+        self.stream_templates = stream_templates
+
+    def run(self) -> bool:
+        config_files = self.config_files if self.config_files is not None else list(library_config_files())
+        if not config_files:
+            return True
+
+        max_workers = min(len(config_files), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._load, config_file) for config_file in config_files]
+            for finished_count, (config_file, future) in enumerate(zip(config_files, futures), start=1):
+                if self.isCanceled():
+                    for pending in futures:
+                        pending.cancel()
+                    return False
+
+                try:
+                    result = future.result()
+                except (OSError, yaml.YAMLError, TemplateLibraryVersionError, TemplateSyntaxError) as e:
+                    self.library_failed.emit(config_file, str(e))
+                else:
+                    self.library_loaded.emit(config_file, result)
+
+                self.setProgress(100 * finished_count / len(futures))
+
+        return True
+
+    def _load(self, config_file: Path) -> object:
+        if self.stream_templates:
+            return self.load(config_file, partial(self.templates_loaded.emit, config_file))
+        return self.load(config_file)
+
+
+class TemplateTrigramIndexTask(QgsTask):
+    """Parses all template libraries and builds a search index over all of their templates
+
+    Already parsed libraries can be given to avoid parsing them again. `index_built` is
+    emitted with the index when the task has finished."""
+
+    index_built = pyqtSignal(object)
+
+    def __init__(
+        self,
+        library_files: dict[str, Path],
+        load: Callable[[Path], TemplateLibraryConfig],
+        library_configs: dict[str, TemplateLibraryConfig],
+    ):
+        super().__init__("Rakennetaan templaattien hakuindeksiä", QgsTask.CanCancel)
+        # Copy the collections as the task runs in another thread
+        self.library_files = dict(library_files)
+        self.library_configs = dict(library_configs)
+        self.load = load
+        self.index: TemplateTrigramIndex | None = None
+
+    def run(self) -> bool:
+        libraries = []
+        for i, (library_name, config_file) in enumerate(self.library_files.items(), start=1):
+            if self.isCanceled():
+                return False
+
+            config = self.library_configs.get(library_name)
+            if config is None:
+                try:
+                    config = self.load(config_file)
+                except (OSError, yaml.YAMLError, TemplateLibraryVersionError, TemplateSyntaxError) as e:
+                    logger.warning("Failed to parse template library configuration %s: %s", config_file, e)
+                    continue
+            libraries.append((library_name, config.templates))
+            # Parsing takes roughly as long as indexing
+            self.setProgress(50 * i / len(self.library_files))
+
+        self.index = TemplateTrigramIndex(libraries)
+        return True
+
+    def finished(self, result: bool) -> None:  # noqa: FBT001
+        if result:
+            self.index_built.emit(self.index)
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Sequence
+
+    from arho_feature_template.core.template_library_config import Attribute, Feature, FeatureTemplate
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Relevance weights of the template fields in the fuzzy search, in the order returned
+# by `_template_field_texts`
+FIELD_WEIGHTS = (1.0, 0.5, 0.5, 0.4, 0.3)
+PREFIX_SIMILARITY = 0.9
+# Trigram similarity is scaled down so that prefix matches rank before typo matches
+TRIGRAM_SIMILARITY_SCALE = 0.8
+MIN_TRIGRAM_SIMILARITY = 0.5
+# Trigrams of shorter query tokens are not selective enough for fuzzy matching
+MIN_TRIGRAM_TOKEN_LENGTH = 3
+# Maximum number of indexed tokens a single query token is expanded to
+MAX_TOKEN_EXPANSIONS = 32
+
+
+def normalize_text(text: str) -> str:
+    """Casefold the text and remove diacritics so that e.g. 'Pysäköinti' matches 'pysakointi'"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(normalize_text(text))
+
+
+class TemplateSearchIndex:
+    """Token prefix index over the names and descriptions of feature templates
+
+    Templates are identified by their position in the sequence given to the index."""
+
+    def __init__(self, templates: Sequence[FeatureTemplate]) -> None:
+        token_templates: defaultdict[str, set[int]] = defaultdict(set)
+        for i, template in enumerate(templates):
+            for text in (template.name, template.description):
+                if text:
+                    for token in tokenize(text):
+                        token_templates[token].add(i)
+
+        self.all_templates = frozenset(range(len(templates)))
+        # Sorted tokens make tokens with a common prefix adjacent
+        self._tokens = sorted(token_templates)
+        self._token_templates = [frozenset(token_templates[token]) for token in self._tokens]
+
+    def search(self, query: str) -> frozenset[int]:
+        """Find the templates where every token of the query is a prefix of some token in the template
+
+        If no template matches, the templates where every token of the query is a part of
+        some token are found instead, e.g. 'alue' in 'Pysäköintialue', as Finnish compound
+        words are written together."""
+        # Longer tokens usually match fewer templates, so they narrow down the result faster
+        query_tokens = sorted(set(tokenize(query)), key=len, reverse=True)
+        result = self._match_all(query_tokens, self._prefix_matches)
+        if not result and query_tokens:
+            result = self._match_all(query_tokens, self._substring_matches)
+        return result
+
+    def _match_all(self, query_tokens: list[str], matches: Callable[[str], frozenset[int]]) -> frozenset[int]:
+        result = self.all_templates
+        for query_token in query_tokens:
+            result = result & matches(query_token)
+            if not result:
+                break
+        return result
+
+    def _prefix_matches(self, prefix: str) -> frozenset[int]:
+        matches: set[int] = set()
+        for i in range(bisect_left(self._tokens, prefix), len(self._tokens)):
+            if not self._tokens[i].startswith(prefix):
+                break
+            matches.update(self._token_templates[i])
+        return frozenset(matches)
+
+    def _substring_matches(self, text: str) -> frozenset[int]:
+        matches: set[int] = set()
+        for token, templates in zip(self._tokens, self._token_templates):
+            if text in token:
+                matches.update(templates)
+        return frozenset(matches)
+
+
+def trigrams(token: str) -> frozenset[str]:
+    padded = f"  {token} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+class TemplateSearchResult(NamedTuple):
+    library_name: str
+    template: FeatureTemplate
+    score: float
+
+
+class TemplateTrigramIndex:
+    """Fuzzy search over the templates of several libraries, ranked by relevance
+
+    Each query token is matched to the indexed tokens by prefix, and by trigram
+    similarity to tolerate typos. The relevance of a template is the mean over the query
+    tokens of the best field weight times token similarity. The fields are the name,
+    group, sub group, description and the attribute defaults of the template.
+
+    Sets of templates are stored as integer bitmasks, or as tuples of template indices
+    when a token occurs in only a few templates. Combining bitmasks is cheap, so the best
+    matches are found without scoring every matching template."""
+
+    def __init__(self, libraries: Iterable[tuple[str, Sequence[FeatureTemplate]]]) -> None:
+        self.entries: list[tuple[str, FeatureTemplate]] = []
+        field_postings: list[defaultdict[str, list[int]]] = [defaultdict(list) for _ in FIELD_WEIGHTS]
+        for library_name, templates in libraries:
+            for template in templates:
+                template_index = len(self.entries)
+                self.entries.append((library_name, template))
+                for postings, text in zip(field_postings, _template_field_texts(template)):
+                    if text:
+                        for token in set(tokenize(text)):
+                            postings[token].append(template_index)
+
+        self.template_count = len(self.entries)
+        # A bitmask takes less memory than a tuple when the token is in more templates than this
+        dense_limit = self.template_count // 64
+        self._field_postings: list[dict[str, int | tuple[int, ...]]] = [
+            {
+                token: self._mask(template_indices) if len(template_indices) > dense_limit else tuple(template_indices)
+                for token, template_indices in postings.items()
+            }
+            for postings in field_postings
+        ]
+
+        self._tokens = sorted(set().union(*field_postings))
+        self._token_trigram_counts = [len(trigrams(token)) for token in self._tokens]
+        trigram_tokens: defaultdict[str, list[int]] = defaultdict(list)
+        for token_index, token in enumerate(self._tokens):
+            for trigram in trigrams(token):
+                trigram_tokens[trigram].append(token_index)
+        self._trigram_tokens = dict(trigram_tokens)
+
+    def search(self, query: str, limit: int = 50) -> list[TemplateSearchResult]:
+        """Find the templates best matching the query, most relevant first"""
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens or not self.entries:
+            return []
+
+        all_templates = (1 << self.template_count) - 1
+        token_levels = []
+        for query_token in query_tokens:
+            score_masks: defaultdict[float, int] = defaultdict(int)
+            for token, similarity in self._similar_tokens(query_token):
+                for weight, postings in zip(FIELD_WEIGHTS, self._field_postings):
+                    template_indices = postings.get(token)
+                    if template_indices is not None:
+                        score_masks[round(weight * similarity, 2)] |= self._mask(template_indices)
+
+            # Partition the templates by their best score for this query token
+            levels = []
+            covered = 0
+            for score in sorted(score_masks, reverse=True):
+                mask = score_masks[score] & ~covered
+                if mask:
+                    levels.append((score, mask))
+                    covered |= mask
+            levels.append((0.0, all_templates & ~covered))
+            token_levels.append(levels)
+
+        return self._best_matches(token_levels, limit)
+
+    def _best_matches(self, token_levels: list[list[tuple[float, int]]], limit: int) -> list[TemplateSearchResult]:
+        """Enumerate combinations of per token score levels in descending total score"""
+        results: list[TemplateSearchResult] = []
+        token_count = len(token_levels)
+        start = (0,) * token_count
+        heap = [(-sum(levels[0][0] for levels in token_levels), start)]
+        seen = {start}
+
+        while heap and len(results) < limit:
+            negative_score, combination = heapq.heappop(heap)
+            if negative_score == 0:
+                # Only templates that match none of the query tokens are left
+                break
+
+            mask = -1
+            for levels, level in zip(token_levels, combination):
+                mask &= levels[level][1]
+                if not mask:
+                    break
+            score = -negative_score / token_count
+            for template_index in _iter_bits(mask):
+                library_name, template = self.entries[template_index]
+                results.append(TemplateSearchResult(library_name, template, score))
+                if len(results) == limit:
+                    break
+
+            for i, level in enumerate(combination):
+                if level + 1 < len(token_levels[i]):
+                    successor = (*combination[:i], level + 1, *combination[i + 1 :])
+                    if successor not in seen:
+                        seen.add(successor)
+                        successor_score = sum(levels[j][0] for levels, j in zip(token_levels, successor))
+                        heapq.heappush(heap, (-successor_score, successor))
+
+        return results
+
+    def _similar_tokens(self, query_token: str) -> list[tuple[str, float]]:
+        similar: dict[str, float] = {}
+
+        prefixed = []
+        for i in range(bisect_left(self._tokens, query_token), len(self._tokens)):
+            if not self._tokens[i].startswith(query_token):
+                break
+            prefixed.append(self._tokens[i])
+        # Prefer the shortest completions, as they are closest to the query
+        for token in sorted(prefixed, key=len)[:MAX_TOKEN_EXPANSIONS]:
+            similar[token] = 1.0 if token == query_token else PREFIX_SIMILARITY
+
+        if len(query_token) >= MIN_TRIGRAM_TOKEN_LENGTH:
+            query_trigrams = trigrams(query_token)
+            shared_counts: Counter[int] = Counter()
+            for trigram in query_trigrams:
+                shared_counts.update(self._trigram_tokens.get(trigram, ()))
+            for token_index, shared_count in shared_counts.most_common(MAX_TOKEN_EXPANSIONS):
+                # Dice coefficient of the trigram sets
+                dice = 2 * shared_count / (len(query_trigrams) + self._token_trigram_counts[token_index])
+                if dice < MIN_TRIGRAM_SIMILARITY:
+                    continue
+                token = self._tokens[token_index]
+                similar[token] = max(similar.get(token, 0.0), dice * TRIGRAM_SIMILARITY_SCALE)
+
+        return sorted(similar.items(), key=lambda item: item[1], reverse=True)[:MAX_TOKEN_EXPANSIONS]
+
+    def _mask(self, template_indices: int | Iterable[int]) -> int:
+        if isinstance(template_indices, int):
+            return template_indices
+        bitmap = bytearray((self.template_count + 7) // 8)
+        for template_index in template_indices:
+            bitmap[template_index >> 3] |= 1 << (template_index & 7)
+        return int.from_bytes(bitmap, "little")
+
+
+def _iter_bits(mask: int) -> Iterator[int]:
+    while mask:
+        lowest_bit = mask & -mask
+        yield lowest_bit.bit_length() - 1
+        mask ^= lowest_bit
+
+
+def _template_field_texts(template: FeatureTemplate) -> tuple[str | None, ...]:
+    defaults = " ".join(
+        str(attribute.default) for attribute in _iter_attributes(template.feature) if attribute.default is not None
+    )
+    return (template.name, template.group, template.sub_group, template.description, defaults)
+
+
+def _iter_attributes(feature: Feature) -> Iterator[Attribute]:
+    yield from feature.attributes
+    for child_feature in feature.child_features:
+        yield from _iter_attributes(child_feature)
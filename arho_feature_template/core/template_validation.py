@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from qgis.core import QgsVectorLayer
+from qgis.PyQt.QtCore import QObject, pyqtSignal
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from arho_feature_template.core.layer_registry import LayerRegistry
+    from arho_feature_template.core.template_library_config import Feature, FeatureTemplate
+
+
+class TemplateValidator(QObject):
+    """Checks that the layers and fields used by templates exist in the project
+
+    A template is valid when the layers of its feature and all of its child features
+    are vector layers whose data providers have the fields of the attributes, as virtual
+    and joined fields cannot be written. Each layer is looked up
+    once and its field names are cached until layers are added, removed or renamed or
+    the fields of the layer change. `validity_changed` is emitted when that happens."""
+
+    validity_changed = pyqtSignal()
+
+    def __init__(self, layer_registry: LayerRegistry) -> None:
+        super().__init__()
+        self.layer_registry = layer_registry
+        self.layer_registry.layers_changed.connect(self.invalidate)
+        # Field names of each layer name, None if there is no such vector layer
+        self._layer_fields: dict[str, frozenset[str] | None] = {}
+        self._field_layers: list[QgsVectorLayer] = []
+
+    def invalidate(self) -> None:
+        self._layer_fields.clear()
+        self._disconnect_layers()
+        self.validity_changed.emit()
+
+    def unload(self) -> None:
+        self.layer_registry.layers_changed.disconnect(self.invalidate)
+        self._disconnect_layers()
+
+    def invalid_templates(self, templates: Sequence[FeatureTemplate]) -> frozenset[int]:
+        """Return the indices of the invalid templates"""
+        return frozenset(i for i, template in enumerate(templates) if not self.is_valid(template))
+
+    def is_valid(self, template: FeatureTemplate) -> bool:
+        return self._is_valid_feature(template.feature)
+
+    def _is_valid_feature(self, feature: Feature) -> bool:
+        field_names = self._field_names(feature.layer)
+        if field_names is None:
+            return False
+        return all(attribute.attribute in field_names for attribute in feature.attributes) and all(
+            self._is_valid_feature(child_feature) for child_feature in feature.child_features
+        )
+
+    def _field_names(self, layer_name: str) -> frozenset[str] | None:
+        try:
+            return self._layer_fields[layer_name]
+        except KeyError:
+            pass
+
+        layers = self.layer_registry.layers_by_name(layer_name)
+        # The first layer is used if there are several layers with the same name
+        layer = layers[0] if layers else None
+        field_names = None
+        if isinstance(layer, QgsVectorLayer):
+            field_names = frozenset(layer.dataProvider().fields().names())
+            layer.updatedFields.connect(self.invalidate)
+            self._field_layers.append(layer)
+        self._layer_fields[layer_name] = field_names
+        return field_names
+
+    def _disconnect_layers(self) -> None:
+        for layer in self._field_layers:
+            try:
+                layer.updatedFields.disconnect(self.invalidate)
+            except (RuntimeError, TypeError):
+                # The layer has already been deleted
+                continue
+        self._field_layers.clear()
@@ -1,8 +1,32 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from contextlib import contextmanager
 from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING
 
-from qgis.core import QgsMapLayer, QgsProject, QgsVectorLayer
+from qgis.core import (
+    QgsExpression,
+    QgsExpressionNodeBinaryOperator,
+    QgsExpressionNodeColumnRef,
+    QgsExpressionNodeLiteral,
+    QgsMapLayer,
+    QgsVectorLayer,
+)
 from qgis.utils import iface
 
+from arho_feature_template.core.layer_registry import get_layer_registry
+from arho_feature_template.core.plan_working_copy import WORKING_COPY_SETTING, close_working_copy, open_working_copy
+from arho_feature_template.utils.settings import get_setting
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+    from qgis.core import QgsRectangle
+
+    from arho_feature_template.core.layer_registry import LayerRegistry
+
 
 # To be extended and moved
 @dataclass
@@ -21,29 +45,218 @@ LAYER_PLAN_ID_MAP = {
 }
 
 
+# Number of recently shown plans whose layer extents are kept
+PLAN_EXTENT_CACHE_SIZE = 10
+
+
 def update_selected_plan(new_plan: LandUsePlan):
     """Update the project layers based on the selected land use plan."""
-    plan_id = new_plan.id
+    # The layers are switched back from the working copy of the previous plan before filtering them
+    if not close_working_copy():
+        return
 
-    for layer_name, field_name in LAYER_PLAN_ID_MAP.items():
-        # Set the filter on each layer using the plan_id
-        set_filter_for_vector_layer(layer_name, field_name, plan_id)
+    plan_filter_manager = get_plan_filter_manager()
+    plan_filter_manager.show_plan(new_plan.id)
+    if get_setting(WORKING_COPY_SETTING, False):
+        open_working_copy(new_plan.id, plan_filter_manager.plan_layers())
 
 
-def set_filter_for_vector_layer(layer_name: str, field_name: str, field_value: str):
-    """Set a filter for the given vector layer."""
-    layers = QgsProject.instance().mapLayersByName(layer_name)
+class PlanFilterManager:
+    """Filters the plan layers of the project to show a single plan
 
-    if not _check_layer_count(layers):
-        return
+    Setting a subset string reloads the data provider of the layer, so all filters are
+    set while map canvas rendering is frozen and layers already showing the plan are
+    skipped. The extents of the layers are kept for the recently shown plans, so that
+    switching back to a plan does not query them from the database again. The extents of
+    a layer are forgotten when edits to it are committed or its data is reloaded.
+
+    Plan filters saved in the project are recognized as set by the plugin when the
+    layers are loaded, so that they can be cleared before the plan has been switched."""
+
+    def __init__(self, layer_registry: LayerRegistry) -> None:
+        self.layer_registry = layer_registry
+        # Layer extents by layer id and subset string, most recently used last
+        self._extents: OrderedDict[tuple[str, str], QgsRectangle] = OrderedDict()
+        # Layers with remembered extents and the slot connected to their data change signals by layer id
+        self._extent_layers: dict[str, tuple[QgsVectorLayer, Callable[..., None]]] = {}
+        # Layer whose filter is being set, as setting a filter also reloads the data
+        self._filtering_layer_id: str | None = None
+        # Subset strings set by the plugin by layer id
+        self._subset_strings: dict[str, str] = {}
+        # Subset strings removed by `clear_filters` by layer id
+        self._cleared_subset_strings: dict[str, str] = {}
+
+        self.layer_registry.layers_changed.connect(self._recognize_plan_filters)
+        self._recognize_plan_filters()
+
+    def unload(self) -> None:
+        self.layer_registry.layers_changed.disconnect(self._recognize_plan_filters)
+        for layer, slot in self._extent_layers.values():
+            try:
+                for signal in _data_change_signals(layer):
+                    signal.disconnect(slot)
+            except (RuntimeError, TypeError):
+                # The layer has already been deleted
+                continue
+        self._extent_layers.clear()
+
+    def show_plan(self, plan_id: str) -> None:
+        self._cleared_subset_strings = {}
+        with _frozen_canvas():
+            for layer_name, field_name in LAYER_PLAN_ID_MAP.items():
+                layer = self._plan_layer(layer_name)
+                if layer is not None:
+                    self._set_filter(layer, QgsExpression.createFieldEqualityExpression(field_name, plan_id))
+
+    def clear_filters(self) -> None:
+        """Remove the filters set by the plugin, so that they can be restored with `restore_filters`
+
+        Layers without filters and layers whose filter has been changed by the user are not touched."""
+        cleared_subset_strings = {}
+        with _frozen_canvas():
+            for layer_id, subset_string in list(self._subset_strings.items()):
+                layer = self.layer_registry.layer(layer_id)
+                if isinstance(layer, QgsVectorLayer) and layer.subsetString() == subset_string:
+                    self._set_filter(layer, "")
+                    cleared_subset_strings[layer_id] = subset_string
+        self._subset_strings = {}
+        # Clearing again before restoring must not forget the filters cleared first
+        self._cleared_subset_strings.update(cleared_subset_strings)
+
+    def restore_filters(self) -> None:
+        """Set the filters removed by `clear_filters` again"""
+        with _frozen_canvas():
+            for layer_id, subset_string in self._cleared_subset_strings.items():
+                layer = self.layer_registry.layer(layer_id)
+                if isinstance(layer, QgsVectorLayer) and not layer.subsetString():
+                    self._set_filter(layer, subset_string)
+        self._cleared_subset_strings = {}
+
+    def plan_layers(self) -> list[QgsVectorLayer]:
+        """Return the plan layers found in the project, referenced layers first"""
+        plan_layers = []
+        for layer_name in LAYER_PLAN_ID_MAP:
+            layers = self.layer_registry.layers_by_name(layer_name)
+            if layers and isinstance(layers[0], QgsVectorLayer):
+                plan_layers.append(layers[0])
+        return plan_layers
 
-    layer = layers[0]
+    def _recognize_plan_filters(self) -> None:
+        for layer_name, field_name in LAYER_PLAN_ID_MAP.items():
+            for layer in self.layer_registry.layers_by_name(layer_name):
+                if not isinstance(layer, QgsVectorLayer) or layer.id() in self._cleared_subset_strings:
+                    continue
+                subset_string = layer.subsetString()
+                if _is_plan_filter(subset_string, field_name):
+                    self._subset_strings.setdefault(layer.id(), subset_string)
 
-    expression = f"\"{field_name}\" = '{field_value}'"
+    def _plan_layer(self, layer_name: str) -> QgsVectorLayer | None:
+        layers = self.layer_registry.layers_by_name(layer_name)
+        if not _check_layer_count(layers) or not _check_vector_layer(layers[0]):
+            return None
+        return layers[0]
 
-    # Apply the filter to the layer
-    if not layer.setSubsetString(expression):
-        iface.messageBar().pushMessage("Error", f"Failed to filter layer {layer_name} with query {expression}", level=3)
+    def _set_filter(self, layer: QgsVectorLayer, subset_string: str) -> None:
+        previous_subset_string = layer.subsetString()
+        if subset_string == previous_subset_string:
+            # E.g. a filter saved in the project is still recognized as set by the plugin
+            if subset_string:
+                self._subset_strings[layer.id()] = subset_string
+            return
+
+        if previous_subset_string:
+            self._remember_extent(layer, previous_subset_string)
+        self._filtering_layer_id = layer.id()
+        try:
+            succeeded = layer.setSubsetString(subset_string)
+        finally:
+            self._filtering_layer_id = None
+        if not succeeded:
+            iface.messageBar().pushMessage(
+                "Error", f"Failed to filter layer {layer.name()} with query {subset_string}", level=3
+            )
+            return
+
+        if subset_string:
+            self._subset_strings[layer.id()] = subset_string
+        else:
+            self._subset_strings.pop(layer.id(), None)
+        extent = self._extents.get((layer.id(), subset_string))
+        if extent is not None:
+            self._extents.move_to_end((layer.id(), subset_string))
+            layer.setExtent(extent)
+
+    def _remember_extent(self, layer: QgsVectorLayer, subset_string: str) -> None:
+        # The extent is remembered when the plan is left, so it includes the edits made to the plan
+        self._extents[(layer.id(), subset_string)] = layer.extent()
+        self._extents.move_to_end((layer.id(), subset_string))
+        while len(self._extents) > PLAN_EXTENT_CACHE_SIZE * len(LAYER_PLAN_ID_MAP):
+            self._extents.popitem(last=False)
+
+        if layer.id() not in self._extent_layers:
+            slot = partial(self._forget_extents, layer.id())
+            for signal in _data_change_signals(layer):
+                signal.connect(slot)
+            self._extent_layers[layer.id()] = (layer, slot)
+
+    def _forget_extents(self, layer_id: str, *_args) -> None:
+        if layer_id == self._filtering_layer_id:
+            return
+        for key in [key for key in self._extents if key[0] == layer_id]:
+            del self._extents[key]
+
+
+def _data_change_signals(layer: QgsVectorLayer) -> tuple:
+    """Return the signals of the changes that may change the extents of the plans on the layer"""
+    return (
+        layer.dataChanged,
+        layer.committedFeaturesAdded,
+        layer.committedFeaturesRemoved,
+        layer.committedGeometriesChanges,
+    )
+
+
+@contextmanager
+def _frozen_canvas() -> Iterator[None]:
+    """Render the map canvas once after the layers have been changed instead of after each change"""
+    canvas = iface.mapCanvas()
+    canvas.freeze(True)
+    try:
+        yield
+    finally:
+        canvas.freeze(False)
+    canvas.refresh()
+
+
+_plan_filter_manager: PlanFilterManager | None = None
+
+
+def get_plan_filter_manager() -> PlanFilterManager:
+    global _plan_filter_manager  # noqa: PLW0603
+    if _plan_filter_manager is None:
+        _plan_filter_manager = PlanFilterManager(get_layer_registry())
+    return _plan_filter_manager
+
+
+def unload_plan_filter_manager() -> None:
+    global _plan_filter_manager  # noqa: PLW0603
+    if _plan_filter_manager is not None:
+        _plan_filter_manager.unload()
+        _plan_filter_manager = None
+
+
+def _is_plan_filter(subset_string: str, field_name: str) -> bool:
+    """Check if the subset string is a filter set by the plugin, i.e. compares the field to a single value"""
+    if not subset_string:
+        return False
+    node = QgsExpression(subset_string).rootNode()
+    return (
+        isinstance(node, QgsExpressionNodeBinaryOperator)
+        and node.op() == QgsExpressionNodeBinaryOperator.boEQ
+        and isinstance(node.opLeft(), QgsExpressionNodeColumnRef)
+        and node.opLeft().name() == field_name
+        and isinstance(node.opRight(), QgsExpressionNodeLiteral)
+    )
 
 
 def _check_layer_count(layers: list) -> bool:
@@ -1,42 +1,108 @@
+from __future__ import annotations
+
+import re
 from importlib import resources
+from itertools import compress
+from typing import TYPE_CHECKING, Callable
 
-from qgis.core import QgsProviderRegistry
 from qgis.PyQt import uic
-from qgis.PyQt.QtCore import QRegularExpression, QSortFilterProxyModel, Qt
-from qgis.PyQt.QtGui import QStandardItem, QStandardItemModel
-from qgis.PyQt.QtWidgets import QComboBox, QDialog, QDialogButtonBox, QLineEdit, QMessageBox, QPushButton, QTableView
-
-from arho_feature_template.core.exceptions import UnexpectedNoneError
+from qgis.PyQt.QtCore import QSortFilterProxyModel, QTimer
+from qgis.PyQt.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QDialogButtonBox,
+    QLabel,
+    QLineEdit,
+    QMessageBox,
+    QProgressBar,
+    QPushButton,
+    QTableView,
+)
+
+from arho_feature_template.gui.plan_table_model import PlanTableModel
+from arho_feature_template.utils.settings import get_setting
+
+if TYPE_CHECKING:
+    from qgis.PyQt.QtCore import QModelIndex
 
 ui_path = resources.files(__package__) / "load_plan_dialog.ui"
 
 LoadPlanDialogBase, _ = uic.loadUiType(ui_path)
 
+SEARCH_DEBOUNCE_SETTING = "plan_search_debounce_ms"
+DEFAULT_SEARCH_DEBOUNCE_MS = 300
+
 
 class PlanFilterProxyModel(QSortFilterProxyModel):
-    def filterAcceptsRow(self, source_row, source_parent):  # noqa: N802
-        model = self.sourceModel()
-        if not model:
-            return False
+    """Shows the plans whose text contains the search text, ignoring case
 
-        filter_text = self.filterRegularExpression().pattern()
-        if not filter_text:
-            return True
+    The rows are matched against the lowercase haystacks of the source model. The
+    result of each row is kept, so that only the rows whose result can change are
+    matched again when the search text is extended or shortened."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.search_text = ""
+        self._search: Callable[[str], object] | None = None
+        # Whether each source row matches the search text, computed for the rows fetched so far
+        self._accepted = bytearray()
+
+    def setSourceModel(self, source_model: PlanTableModel) -> None:  # noqa: N802
+        super().setSourceModel(source_model)
+        source_model.modelAboutToBeReset.connect(self._clear_accepted)
+        self._clear_accepted()
+
+    def set_search_text(self, search_text: str) -> None:
+        search_text = search_text.lower()
+        if search_text == self.search_text:
+            return
+
+        haystacks = self.sourceModel().haystacks
+        search = re.compile(re.escape(search_text)).search
+        accepted = self._accepted
+        if not search_text:
+            self._accepted = bytearray()
+        elif self._search is not None and self.search_text in search_text:
+            # Rows not matching the previous search text cannot match the extended one
+            for row in compress(range(len(accepted)), accepted):
+                if search(haystacks[row]) is None:
+                    accepted[row] = 0
+        elif self._search is not None and search_text in self.search_text:
+            # Rows matching the previous search text match the shortened one as well
+            for row, row_accepted in enumerate(accepted):
+                if not row_accepted and search(haystacks[row]) is not None:
+                    accepted[row] = 1
+        else:
+            self._accepted = bytearray(map(bool, map(search, haystacks)))
+
+        self.search_text = search_text
+        self._search = search if search_text else None
+        # Rebuilding the whole mapping is faster than removing scattered rows from it one range at a time
+        self.invalidate()
 
-        for column in range(5):
-            index = model.index(source_row, column, source_parent)
-            data = model.data(index)
-            if data and filter_text.lower() in data.lower():
-                return True
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:  # noqa: N802, ARG002
+        if self._search is None:
+            return True
+        accepted = self._accepted
+        if source_row >= len(accepted):
+            # Rows are only appended to the source model
+            haystacks = self.sourceModel().haystacks
+            accepted.extend(map(bool, map(self._search, haystacks[len(accepted) :])))
+        return bool(accepted[source_row])
 
-        return False
+    def _clear_accepted(self) -> None:
+        self._accepted = bytearray()
 
 
 class LoadPlanDialog(QDialog, LoadPlanDialogBase):  # type: ignore
     connectionComboBox: QComboBox  # noqa: N815
     push_button_load: QPushButton
+    push_button_refresh: QPushButton
     planTableView: QTableView  # noqa: N815
     searchLineEdit: QLineEdit  # noqa: N815
+    label_plan_table: QLabel
+    loadProgressBar: QProgressBar  # noqa: N815
+    push_button_cancel: QPushButton
     buttonBox: QDialogButtonBox  # noqa: N815
 
     def __init__(self, parent, connections):
@@ -50,81 +116,64 @@ class LoadPlanDialog(QDialog, LoadPlanDialogBase):  # type: ignore
         self.buttonBox.button(QDialogButtonBox.Ok).setEnabled(False)
 
         self.push_button_load.clicked.connect(self.load_plans)
+        self.push_button_refresh.clicked.connect(lambda: self.load_plans(refresh=True))
         self.searchLineEdit.textChanged.connect(self.filter_plans)
 
         self.connectionComboBox.addItems(connections)
+        # The plans of the previous connection are not needed anymore
+        self.connectionComboBox.currentTextChanged.connect(lambda: self.model.set_query(None))
 
         self.planTableView.setSelectionMode(QTableView.SingleSelection)
         self.planTableView.setSelectionBehavior(QTableView.SelectRows)
 
-        self.model = QStandardItemModel()
-        self.model.setColumnCount(5)
-        self.model.setHorizontalHeaderLabels(
-            [
-                "ID",
-                "Tuottajan kaavatunnus",
-                "Nimi",
-                "Kaavan elinkaaren tila",
-                "Kaavalaji",
-            ]
-        )
+        self.model = PlanTableModel(self)
+        self.model.query_failed.connect(self.on_query_failed)
+        self.model.modelReset.connect(self.update_plan_count)
+        self.model.total_count_changed.connect(self.update_plan_count)
+        self.model.loading_changed.connect(self.set_loading)
+        self.model.progress_changed.connect(lambda progress: self.loadProgressBar.setValue(int(progress)))
+        self.push_button_cancel.clicked.connect(self.model.cancel)
+        self.finished.connect(self.model.cancel)
+        self.set_loading(False)
 
         self.filterProxyModel = PlanFilterProxyModel()
         self.filterProxyModel.setSourceModel(self.model)
-        self.filterProxyModel.setFilterCaseSensitivity(Qt.CaseInsensitive)
 
         self.planTableView.setModel(self.filterProxyModel)
         self.planTableView.selectionModel().selectionChanged.connect(self.on_selection_changed)
+        # Resetting the model clears the selection without signaling it
+        self.filterProxyModel.modelReset.connect(self.on_selection_changed)
 
-    def load_plans(self):
-        self.model.removeRows(0, self.model.rowCount())
+        # The search is sent to the database only after typing has paused
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(get_setting(SEARCH_DEBOUNCE_SETTING, DEFAULT_SEARCH_DEBOUNCE_MS))
+        self.search_timer.timeout.connect(self.search_plans)
 
-        selected_connection = self.connectionComboBox.currentText()
-        if not selected_connection:
-            self.planTableView.setModel(QStandardItemModel())
-            return
+    def load_plans(self, *, refresh: bool = False):
+        self.search_timer.stop()
+        self.model.set_query(self.connectionComboBox.currentText() or None, self.searchLineEdit.text(), refresh=refresh)
 
-        provider_registry = QgsProviderRegistry.instance()
-        if provider_registry is None:
-            raise UnexpectedNoneError
-        postgres_provider_metadata = provider_registry.providerMetadata("postgres")
-        if postgres_provider_metadata is None:
-            raise UnexpectedNoneError
-
-        try:
-            connection = postgres_provider_metadata.createConnection(selected_connection)
-            plans = connection.executeSql("""
-                SELECT
-                    p.id,
-                    p.producers_plan_identifier,
-                    p.name ->> 'fin' AS name_fin,
-                    l.name ->> 'fin' AS lifecycle_status_fin,
-                    pt.name ->> 'fin' AS plan_type_fin
-                FROM
-                    hame.plan p
-                LEFT JOIN
-                    codes.lifecycle_status l
-                ON
-                    p.lifecycle_status_id = l.id
-                LEFT JOIN
-                    codes.plan_type pt
-                ON
-                    p.plan_type_id = pt.id;
-            """)
-            for plan in plans:
-                self.model.appendRow([QStandardItem(column) for column in plan])
-
-        except Exception as e:  # noqa: BLE001
-            QMessageBox.critical(self, "Error", f"Failed to load plans: {e}")
-            self.model.removeRows(0, self.model.rowCount())
+    def search_plans(self):
+        if self.model.connection_name is not None and self.model.search_text != self.searchLineEdit.text():
+            self.model.set_query(self.model.connection_name, self.searchLineEdit.text())
 
     def filter_plans(self):
-        search_text = self.searchLineEdit.text()
-        if search_text:
-            search_regex = QRegularExpression(search_text)
-            self.filterProxyModel.setFilterRegularExpression(search_regex)
-        else:
-            self.filterProxyModel.setFilterRegularExpression("")
+        # The loaded plans are filtered right away while the search is sent to the database
+        self.filterProxyModel.set_search_text(self.searchLineEdit.text())
+        self.search_timer.start()
+
+    def update_plan_count(self):
+        count_text = f" ({self.model.total_count})" if self.model.total_count is not None else ""
+        self.label_plan_table.setText(f"Kaavat{count_text}:")
+
+    def set_loading(self, loading: bool):  # noqa: FBT001
+        self.loadProgressBar.setValue(0)
+        self.loadProgressBar.setVisible(loading)
+        self.push_button_cancel.setVisible(loading)
+
+    def on_query_failed(self, message: str):
+        QMessageBox.critical(self, "Error", f"Failed to load plans: {message}")
 
     def on_selection_changed(self):
         # Enable the OK button only if a row is selected
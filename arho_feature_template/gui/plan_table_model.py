@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from qgis.core import QgsApplication
+from qgis.PyQt.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
+
+from arho_feature_template.core.plan_catalog import (
+    PLAN_PAGE_SIZE,
+    CachedPlanList,
+    PlanCatalogVersionTask,
+    PlanQueryTask,
+    get_plan_catalog_cache,
+    plan_haystack,
+)
+
+if TYPE_CHECKING:
+    from qgis.core import QgsTask
+
+    from arho_feature_template.core.plan_catalog import PlanCatalogVersion
+
+PLAN_COLUMN_HEADERS = (
+    "ID",
+    "Tuottajan kaavatunnus",
+    "Nimi",
+    "Kaavan elinkaaren tila",
+    "Kaavalaji",
+)
+
+
+class PlanTableModel(QAbstractTableModel):
+    """Read-only list of the plans in a database, fetched a page at a time as the view is scrolled
+
+    Only the number of matching plans is queried up front, so opening a large catalog
+    costs a count and a single page. The pages are queried in background tasks and their
+    rows are added in chunks as they arrive.
+
+    The fetched plans are kept in the plan catalog cache. A cached list is shown right
+    away and fetched again only if the catalog version of the connection has changed."""
+
+    # Emitted with the error message when querying the plans fails
+    query_failed = pyqtSignal(str)
+    total_count_changed = pyqtSignal(int)
+    loading_changed = pyqtSignal(bool)
+    # Emitted with the progress of the page being loaded, from 0 to 100
+    progress_changed = pyqtSignal(float)
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.connection_name: str | None = None
+        self.search_text = ""
+        self.plan_list = CachedPlanList()
+        self.plan_list.exhausted = True
+        # Loading is paused after it has been canceled or has failed
+        self._paused = False
+        self._task: QgsTask | None = None
+        self._page_row_count = 0
+        # Keep references to the tasks until the task manager is done with them
+        self._tasks: list[QgsTask] = []
+
+    @property
+    def rows(self) -> list[tuple[str | None, ...]]:
+        return self.plan_list.rows
+
+    @property
+    def haystacks(self) -> list[str]:
+        return self.plan_list.haystacks
+
+    @property
+    def total_count(self) -> int | None:
+        return self.plan_list.total_count
+
+    @property
+    def loading(self) -> bool:
+        return self._task is not None
+
+    def set_query(self, connection_name: str | None, search_text: str = "", *, refresh: bool = False) -> None:
+        """Show the plans of the connection that match the search text
+
+        Cached plans are shown if they are current, unless refreshing."""
+        self._abort_task()
+        cache = get_plan_catalog_cache()
+        self.beginResetModel()
+        self.connection_name = connection_name
+        self.search_text = search_text
+        self._paused = False
+        if connection_name is None:
+            self.plan_list = CachedPlanList()
+            self.plan_list.exhausted = True
+        else:
+            if refresh:
+                cache.invalidate(connection_name)
+            self.plan_list = cache.plan_list(connection_name, search_text)
+        self.endResetModel()
+
+        if connection_name is None:
+            return
+        if self.plan_list.total_count is None:
+            self._start_task(PlanQueryTask(connection_name, search_text, None, count=True))
+        elif cache.needs_version_check(connection_name):
+            self._start_task(PlanCatalogVersionTask(connection_name))
+
+    def cancel(self) -> None:
+        """Abort loading plans, keeping the plans that have already been added"""
+        # Scrolling would otherwise start loading the next page right away
+        self._paused = True
+        self._abort_task()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: N802, B008
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: N802, B008
+        return 0 if parent.isValid() else len(PLAN_COLUMN_HEADERS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:  # noqa: N802
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and 0 <= section < len(PLAN_COLUMN_HEADERS):
+            return PLAN_COLUMN_HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        return self.rows[index.row()][index.column()]
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:  # noqa: N802
+        return not parent.isValid() and not self.plan_list.exhausted and not self._paused and self._task is None
+
+    def fetchMore(self, parent: QModelIndex) -> None:  # noqa: N802
+        if self.canFetchMore(parent):
+            after_id = self.rows[-1][0] if self.rows else None
+            self._start_task(PlanQueryTask(self.connection_name, self.search_text, after_id, count=False))
+
+    def _start_task(self, task: PlanCatalogVersionTask | PlanQueryTask) -> None:
+        task.version_fetched.connect(lambda version: self._on_version_fetched(task, version))
+        if isinstance(task, PlanQueryTask):
+            task.count_fetched.connect(lambda total_count: self._on_count_fetched(task, total_count))
+            task.rows_fetched.connect(lambda rows: self._on_rows_fetched(task, rows))
+            task.query_failed.connect(lambda error: task is self._task and self.query_failed.emit(error))
+        task.progressChanged.connect(lambda progress: task is self._task and self.progress_changed.emit(progress))
+        task.taskCompleted.connect(lambda: self._on_task_finished(task, completed=True))
+        task.taskTerminated.connect(lambda: self._on_task_finished(task, completed=False))
+
+        self._task = task
+        self._page_row_count = 0
+        self._tasks.append(task)
+        QgsApplication.taskManager().addTask(task)
+        self.loading_changed.emit(True)
+
+    def _abort_task(self) -> None:
+        task = self._task
+        if task is not None:
+            # Signals already queued by the task are ignored from now on
+            self._task = None
+            task.cancel()
+            self.loading_changed.emit(False)
+
+    def _on_version_fetched(self, task: QgsTask, version: PlanCatalogVersion) -> None:
+        if task is not self._task:
+            return
+        cache = get_plan_catalog_cache()
+        cache.set_version(self.connection_name, version)
+        if isinstance(task, PlanQueryTask):
+            self.plan_list.version = version
+        elif not cache.is_current(self.connection_name, self.plan_list):
+            # The cached plans are outdated
+            self.set_query(self.connection_name, self.search_text)
+
+    def _on_count_fetched(self, task: QgsTask, total_count: int) -> None:
+        if task is self._task:
+            self.plan_list.total_count = total_count
+            self.total_count_changed.emit(total_count)
+
+    def _on_rows_fetched(self, task: QgsTask, rows: list[tuple[str | None, ...]]) -> None:
+        if task is not self._task or not rows:
+            return
+        self._page_row_count += len(rows)
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+        self.rows.extend(rows)
+        self.haystacks.extend(plan_haystack(row) for row in rows)
+        self.endInsertRows()
+
+    def _on_task_finished(self, task: QgsTask, *, completed: bool) -> None:
+        self._tasks.remove(task)
+        if task is not self._task:
+            return
+        self._task = None
+        if not completed:
+            self._paused = True
+        elif isinstance(task, PlanQueryTask):
+            # A short page is the last one
+            self.plan_list.exhausted = self._page_row_count < PLAN_PAGE_SIZE
+        self.loading_changed.emit(False)
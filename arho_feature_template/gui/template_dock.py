@@ -1,26 +1,87 @@
+from __future__ import annotations
+
 from importlib import resources
 from typing import TYPE_CHECKING
 
 from qgis.gui import QgsDockWidget
 from qgis.PyQt import uic
+from qgis.PyQt.QtCore import QSortFilterProxyModel, QTimer, pyqtSignal
+
+from arho_feature_template.gui.template_tree_model import TEMPLATE_INDEX_ROLE, TemplateTreeModel
+from arho_feature_template.utils.settings import get_setting
 
 if TYPE_CHECKING:
     from qgis.gui import QgsFilterLineEdit
-    from qgis.PyQt.QtWidgets import QComboBox, QLabel, QTreeView
+    from qgis.PyQt.QtCore import QModelIndex
+    from qgis.PyQt.QtWidgets import QCheckBox, QComboBox, QLabel, QPushButton, QTreeView
 
 ui_path = resources.files(__package__) / "template_dock.ui"
 DockClass, _ = uic.loadUiType(ui_path)
 
+SEARCH_DEBOUNCE_SETTING = "template_search_debounce_ms"
+DEFAULT_SEARCH_DEBOUNCE_MS = 200
+
+
+class TemplateFilterProxyModel(QSortFilterProxyModel):
+    """Shows only the matching templates and the groups that contain them"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setRecursiveFilteringEnabled(True)
+        self.matching_templates: frozenset[int] | None = None
+
+    def set_matching_templates(self, matching_templates: frozenset[int] | None) -> None:
+        """Set the indices of the templates to show, or None to show all templates"""
+        self.matching_templates = matching_templates
+        source_model = self.sourceModel()
+        if matching_templates is not None and isinstance(source_model, TemplateTreeModel):
+            # Rows that have not been fetched yet would not be filtered
+            source_model.fetch_all()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:  # noqa: N802
+        if self.matching_templates is None:
+            return True
+
+        # Groups have no template index and are shown if any of their children is accepted
+        index = self.sourceModel().index(source_row, 0, source_parent)
+        return index.data(TEMPLATE_INDEX_ROLE) in self.matching_templates
+
 
 class TemplateLibraryDock(QgsDockWidget, DockClass):  # type: ignore
-    library_selection: "QComboBox"
-    search_box: "QgsFilterLineEdit"
+    library_selection: QComboBox
+    search_box: QgsFilterLineEdit
+    search_all_libraries: QCheckBox
     # template_list: "QListView"
-    template_list: "QTreeView"
-    txt_tip: "QLabel"
+    template_list: QTreeView
+    apply_to_selected: QPushButton
+    txt_tip: QLabel
+    deferred_commit: QCheckBox
+    commit_pending: QPushButton
+
+    # Emitted when the search text has not changed for the debounce interval
+    search_text_changed = pyqtSignal(str)
 
     def __init__(self):
         super().__init__()
         self.setupUi(self)
 
         self.search_box.setShowSearchIcon(True)
+        # Avoids measuring every row when laying out large template trees
+        self.template_list.setUniformRowHeights(True)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(get_setting(SEARCH_DEBOUNCE_SETTING, DEFAULT_SEARCH_DEBOUNCE_MS))
+        self.search_timer.timeout.connect(lambda: self.search_text_changed.emit(self.search_box.value()))
+        self.search_box.valueChanged.connect(self.search_timer.start)
+
+    def set_loading(self, loading: bool) -> None:  # noqa: FBT001
+        """Show or hide the loading state of the template list"""
+        self.template_list.setEnabled(not loading)
+        self.txt_tip.setText("Ladataan templaatteja..." if loading else "")
+
+    def set_pending_feature_count(self, count: int) -> None:
+        """Show the number of template features waiting to be committed"""
+        self.commit_pending.setEnabled(count > 0)
+        self.commit_pending.setText(f"Tallenna ({count})" if count else "Tallenna")
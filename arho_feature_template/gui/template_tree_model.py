@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from qgis.PyQt.QtCore import QAbstractItemModel, QModelIndex, Qt
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from arho_feature_template.core.template_library_config import FeatureTemplate
+
+# Item data role holding the index of the template in its library
+TEMPLATE_INDEX_ROLE = Qt.UserRole + 1
+# Item data role holding the template config
+TEMPLATE_ROLE = Qt.UserRole + 2
+
+UNGROUPED_TEMPLATES_GROUP = "Ryhmittelemättömät"
+
+# Number of rows added to a group at a time when the view asks for more
+FETCH_BATCH_SIZE = 100
+
+# Internal id of the indices whose parent is the root
+ROOT_ID = 0
+
+
+class _TemplateGroup:
+    __slots__ = ("fetched_count", "group_id", "name", "parent_id", "row", "rows")
+
+    def __init__(self, group_id: int, name: str, parent_id: int, row: int) -> None:
+        self.group_id = group_id
+        self.name = name
+        self.parent_id = parent_id
+        self.row = row
+        # Rows are sub groups or indices of templates
+        self.rows: list[_TemplateGroup | int] = []
+        self.fetched_count = 0
+
+
+class TemplateTreeModel(QAbstractItemModel):
+    """Read-only tree of templates grouped by their 'group' and 'sub_group'
+
+    Rows are generated on demand from the templates instead of allocating an item per
+    template. The rows of large groups are added in batches as the view asks for more.
+
+    The internal id of an index is the id of the group containing the row, so template
+    rows need no bookkeeping of their own. Invalid templates are shown disabled.
+
+    A model created with a list of templates can be extended with `append_templates`,
+    e.g. to show the templates of a library while it is being parsed."""
+
+    def __init__(self, templates: Sequence[FeatureTemplate], parent=None) -> None:
+        super().__init__(parent)
+        self.templates = templates
+        self.invalid_templates: frozenset[int] = frozenset()
+        self._fetching = False
+
+        self._groups = [_TemplateGroup(ROOT_ID, "", ROOT_ID, 0)]
+        self._groups_by_name: dict[tuple[str, ...], _TemplateGroup] = {}
+        for template_index, template in enumerate(templates):
+            self._add_template(template_index, template)
+
+        for group in self._groups:
+            group.fetched_count = min(len(group.rows), FETCH_BATCH_SIZE)
+
+    def _add_template(self, template_index: int, template: FeatureTemplate) -> None:
+        group = self._get_group(self._groups[ROOT_ID], template.group or UNGROUPED_TEMPLATES_GROUP)
+        if template.sub_group:
+            group = self._get_group(group, template.sub_group)
+        # If template has no sub_group set, list it directly under group
+        group.rows.append(template_index)
+
+    def _get_group(self, parent: _TemplateGroup, name: str) -> _TemplateGroup:
+        key = (parent.name, name) if parent.group_id != ROOT_ID else (name,)
+        group = self._groups_by_name.get(key)
+        if group is None:
+            group = _TemplateGroup(len(self._groups), name, parent.group_id, len(parent.rows))
+            self._groups.append(group)
+            parent.rows.append(group)
+            self._groups_by_name[key] = group
+        return group
+
+    def append_templates(self, templates: Sequence[FeatureTemplate]) -> None:
+        """Add the templates to the end of the list of templates of the model"""
+        templates_list: list[FeatureTemplate] = self.templates  # type: ignore[assignment]
+        for template in templates:
+            self._add_template(len(templates_list), template)
+            templates_list.append(template)
+
+        # Groups come after their parent groups, so the parents have been updated first
+        for group in self._groups:
+            fetched_count = min(len(group.rows), FETCH_BATCH_SIZE)
+            if group.fetched_count >= fetched_count:
+                continue
+            if self._is_fetched(group):
+                self._insert_rows(self._group_index(group), group, fetched_count)
+            else:
+                # The view does not know the group yet
+                group.fetched_count = fetched_count
+
+    def _is_fetched(self, group: _TemplateGroup) -> bool:
+        while group.group_id != ROOT_ID:
+            parent = self._groups[group.parent_id]
+            if group.row >= parent.fetched_count:
+                return False
+            group = parent
+        return True
+
+    def _group_index(self, group: _TemplateGroup) -> QModelIndex:
+        if group.group_id == ROOT_ID:
+            return QModelIndex()
+        return self.createIndex(group.row, 0, group.parent_id)
+
+    def _row(self, index: QModelIndex) -> _TemplateGroup | int:
+        return self._groups[index.internalId()].rows[index.row()]
+
+    def _group(self, index: QModelIndex) -> _TemplateGroup | None:
+        """Return the group shown at the index, the root for an invalid index or None for a template"""
+        if not index.isValid():
+            return self._groups[ROOT_ID]
+        row = self._groups[index.internalId()].rows[index.row()]
+        return row if row.__class__ is _TemplateGroup else None
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:  # noqa: B008
+        group = self._group(parent)
+        if group is None or column != 0 or not 0 <= row < group.fetched_count:
+            return QModelIndex()
+        return self.createIndex(row, column, group.group_id)
+
+    def parent(self, index: QModelIndex) -> QModelIndex:  # type: ignore[override]
+        if not index.isValid() or index.internalId() == ROOT_ID:
+            return QModelIndex()
+        return self._group_index(self._groups[index.internalId()])
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: N802, B008
+        group = self._group(parent)
+        return group.fetched_count if group is not None and parent.column() <= 0 else 0
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: N802, ARG002, B008
+        return 1
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:  # noqa: N802, B008
+        # Groups have children even when none of them has been fetched yet
+        group = self._group(parent)
+        return group is not None and bool(group.rows)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:  # noqa: N802
+        group = self._group(parent)
+        return group is not None and group.fetched_count < len(group.rows) and not self._fetching
+
+    def fetchMore(self, parent: QModelIndex) -> None:  # noqa: N802
+        if not self.canFetchMore(parent):
+            return
+        group = self._group(parent)
+        self._insert_rows(parent, group, min(group.fetched_count + FETCH_BATCH_SIZE, len(group.rows)))
+
+    def _insert_rows(self, parent: QModelIndex, group: _TemplateGroup, fetched_count: int) -> None:
+        # Views may ask for more rows while the rows are being inserted
+        self._fetching = True
+        self.beginInsertRows(parent, group.fetched_count, fetched_count - 1)
+        group.fetched_count = fetched_count
+        self.endInsertRows()
+        self._fetching = False
+
+    def fetch_all(self) -> None:
+        """Fetch the rows of all groups, e.g. so that all of them can be filtered"""
+        for group in self._groups:
+            if group.fetched_count < len(group.rows):
+                self._insert_rows(self._group_index(group), group, len(group.rows))
+
+    def set_invalid_templates(self, invalid_templates: frozenset[int]) -> None:
+        if invalid_templates == self.invalid_templates:
+            return
+        self.invalid_templates = invalid_templates
+        for group in self._groups:
+            if group.fetched_count:
+                parent = self._group_index(group)
+                self.dataChanged.emit(self.index(0, 0, parent), self.index(group.fetched_count - 1, 0, parent))
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        if not index.isValid():
+            return Qt.NoItemFlags
+        if self._row(index) in self.invalid_templates:
+            return Qt.ItemIsSelectable
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+
+        row = self._row(index)
+        if isinstance(row, _TemplateGroup):
+            return row.name if role == Qt.DisplayRole else None
+
+        template = self.templates[row]
+        if role == Qt.DisplayRole:
+            return template.name
+        if role == Qt.ToolTipRole:
+            return template.description
+        if role == TEMPLATE_INDEX_ROLE:
+            return row
+        if role == TEMPLATE_ROLE:
+            return template
+        return None
@@ -2,21 +2,31 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Callable, cast
 
-from qgis.core import QgsProject, QgsVectorLayer
+from qgis.core import QgsApplication, QgsProject, QgsVectorLayer
 from qgis.PyQt.QtCore import QCoreApplication, Qt, QTranslator
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction, QDialog, QMessageBox, QWidget
 from qgis.utils import iface
 
 from arho_feature_template.core.feature_template_library import FeatureTemplater, TemplateGeometryDigitizeMapTool
+from arho_feature_template.core.layer_registry import unload_layer_registry
 from arho_feature_template.core.new_plan import NewPlan
-from arho_feature_template.core.update_plan import LandUsePlan, update_selected_plan
+from arho_feature_template.core.plan_working_copy import (
+    WORKING_COPY_SETTING,
+    detach_working_copy,
+    discard_working_copy,
+    get_working_copy,
+    sync_working_copy,
+)
+from arho_feature_template.core.update_plan import LandUsePlan, unload_plan_filter_manager, update_selected_plan
 from arho_feature_template.gui.load_plan_dialog import LoadPlanDialog
+from arho_feature_template.processing.provider import Provider
 from arho_feature_template.qgis_plugin_tools.tools.custom_logging import setup_logger, teardown_logger
 from arho_feature_template.qgis_plugin_tools.tools.i18n import setup_translation
 from arho_feature_template.qgis_plugin_tools.tools.resources import plugin_name
 from arho_feature_template.utils.db_utils import get_existing_database_connection_names
 from arho_feature_template.utils.misc_utils import handle_unsaved_changes
+from arho_feature_template.utils.settings import get_setting, set_setting
 
 if TYPE_CHECKING:
     from qgis.gui import QgisInterface, QgsMapTool
@@ -125,7 +135,13 @@ class Plugin:
 
         return action
 
+    def initProcessing(self) -> None:  # noqa N802
+        self.provider = Provider()
+        QgsApplication.processingRegistry().addProvider(self.provider)
+
     def initGui(self) -> None:  # noqa N802
+        self.initProcessing()
+
         self.templater = FeatureTemplater()
         self.new_plan = NewPlan()
 
@@ -157,6 +173,35 @@ class Plugin:
             status_tip="Lataa/avaa kaava",
         )
 
+        self.working_copy_action = self.add_action(
+            "",
+            "Muokkaa kaavaa paikallisessa työkopiossa",
+            toggled_callback=lambda enabled: set_setting(WORKING_COPY_SETTING, enabled),
+            checkable=True,
+            add_to_menu=True,
+            add_to_toolbar=False,
+            status_tip="Kopioi ladatun kaavan kohteet paikalliseen GeoPackage-tiedostoon muokkausta varten",
+        )
+        self.working_copy_action.setChecked(get_setting(WORKING_COPY_SETTING, False))
+
+        self.sync_working_copy_action = self.add_action(
+            "",
+            "Tallenna kaavan työkopio tietokantaan",
+            sync_working_copy,
+            add_to_menu=True,
+            add_to_toolbar=False,
+            status_tip="Tallenna työkopion muutokset tietokantaan",
+        )
+
+        self.discard_working_copy_action = self.add_action(
+            "",
+            "Hylkää kaavan työkopio",
+            self.discard_working_copy,
+            add_to_menu=True,
+            add_to_toolbar=False,
+            status_tip="Palauta kaavan tasot tietokantaan tallentamatta työkopion muutoksia",
+        )
+
         self.template_dock_action = self.add_action(
             "",
             "Kaavatemplaatit",
@@ -171,6 +216,35 @@ class Plugin:
         if not isinstance(new_tool, TemplateGeometryDigitizeMapTool):
             self.template_dock_action.setChecked(False)
 
+    def discard_working_copy(self) -> None:
+        if get_working_copy() is None:
+            return
+        response = QMessageBox.question(
+            None,
+            "Hylkää kaavan työkopio",
+            "Työkopion tallentamattomat muutokset menetetään. Hylätäänkö työkopio?",
+            QMessageBox.Yes | QMessageBox.No,
+        )
+        if response == QMessageBox.Yes:
+            discard_working_copy()
+
+    def detach_working_copy(self) -> None:
+        """Switch the layers back to the database, keeping the working copy and its unsynced changes"""
+        working_copy = get_working_copy()
+        if working_copy is None:
+            return
+        keep_edits = (
+            not working_copy.is_modified()
+            or QMessageBox.question(
+                None,
+                "Kaavan työkopio",
+                "Työkopion tasoilla on tallentamattomia muutoksia. Tallennetaanko muutokset työkopioon?",
+                QMessageBox.Yes | QMessageBox.No,
+            )
+            == QMessageBox.Yes
+        )
+        detach_working_copy(keep_edits=keep_edits)
+
     def add_new_plan(self):
         self.new_plan.add_new_plan()
 
@@ -211,6 +285,11 @@ class Plugin:
             iface.removeToolBarIcon(action)
         teardown_logger(Plugin.name)
 
+        QgsApplication.processingRegistry().removeProvider(self.provider)
+        self.templater.unload()
+        self.detach_working_copy()
+        unload_plan_filter_manager()
+        unload_layer_registry()
         self.templater.template_dock.close()
 
     def dock_visibility_changed(self, visible: bool) -> None:  # noqa: FBT001
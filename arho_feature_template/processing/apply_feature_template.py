@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import yaml
+from qgis.core import (
+    QgsFeatureRequest,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeedback,
+    QgsProcessingOutputNumber,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterFile,
+    QgsProcessingParameterString,
+)
+
+from arho_feature_template.core.feature_tree_writer import FeatureTreeWriteError, feature_with_defaults, stamp_template
+from arho_feature_template.core.layer_registry import (
+    LayerNotFoundError,
+    LayerNotVectorTypeError,
+    LayerRegistry,
+    get_layer_from_project,
+)
+from arho_feature_template.core.template_library_config import (
+    TemplateLibraryVersionError,
+    TemplateSyntaxError,
+    iter_feature_templates,
+)
+
+if TYPE_CHECKING:
+    from qgis.core import QgsProcessingFeatureSource
+
+    from arho_feature_template.core.template_library_config import FeatureTemplate
+
+
+class ApplyFeatureTemplateAlgorithm(QgsProcessingAlgorithm):
+    """Creates a feature with its child features from a template for each input geometry"""
+
+    TEMPLATE_LIBRARY = "TEMPLATE_LIBRARY"
+    TEMPLATE = "TEMPLATE"
+    INPUT = "INPUT"
+    FEATURE_COUNT = "FEATURE_COUNT"
+
+    def name(self) -> str:
+        return "apply_feature_template"
+
+    def displayName(self) -> str:  # noqa: N802
+        return "Luo kohteet templaatista"
+
+    def group(self) -> str:
+        return "Templaatit"
+
+    def groupId(self) -> str:  # noqa: N802
+        return "templates"
+
+    def shortHelpString(self) -> str:  # noqa: N802
+        return (
+            "Luo templaatin mukaisen kohteen alikohteineen jokaiselle syötetason geometrialle. "
+            "Kohteet tallennetaan projektin tasoille templaatin oletusarvoilla."
+        )
+
+    def createInstance(self) -> ApplyFeatureTemplateAlgorithm:  # noqa: N802
+        return ApplyFeatureTemplateAlgorithm()
+
+    def flags(self) -> QgsProcessingAlgorithm.Flags:
+        # Features are written to the layers of the project, which must not be used from another thread
+        return super().flags() | QgsProcessingAlgorithm.FlagNoThreading
+
+    def initAlgorithm(self, config: dict[str, Any] | None = None) -> None:  # noqa: N802, ARG002
+        self.addParameter(QgsProcessingParameterFile(self.TEMPLATE_LIBRARY, "Templaattikirjasto", extension="yaml"))
+        self.addParameter(QgsProcessingParameterString(self.TEMPLATE, "Templaatin nimi"))
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(self.INPUT, "Geometriat", [QgsProcessing.TypeVectorAnyGeometry])
+        )
+        self.addOutput(QgsProcessingOutputNumber(self.FEATURE_COUNT, "Luotujen kohteiden määrä"))
+
+    def processAlgorithm(  # noqa: N802
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> dict[str, Any]:
+        library_file = Path(self.parameterAsFile(parameters, self.TEMPLATE_LIBRARY, context))
+        template_name = self.parameterAsString(parameters, self.TEMPLATE, context)
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        if source is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT))
+
+        try:
+            # Templates are read only until the template is found
+            template = next(
+                (template for template in iter_feature_templates(library_file) if template.name == template_name),
+                None,
+            )
+        except (OSError, yaml.YAMLError, TemplateLibraryVersionError, TemplateSyntaxError) as e:
+            msg = f"Failed to read template library {library_file}: {e}"
+            raise QgsProcessingException(msg) from e
+        if template is None:
+            msg = f"Template {template_name} not found in {library_file}"
+            raise QgsProcessingException(msg)
+
+        # The features are written to the layers of the project of the context, which may not be the current one
+        project = context.project()
+        if project is None:
+            msg = "The algorithm must be run with a project containing the template layers"
+            raise QgsProcessingException(msg)
+        layer_registry = LayerRegistry(project)
+        try:
+            return self._apply_template(template, source, layer_registry, context, feedback)
+        finally:
+            layer_registry.unload()
+
+    def _apply_template(
+        self,
+        template: FeatureTemplate,
+        source: QgsProcessingFeatureSource,
+        layer_registry: LayerRegistry,
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> dict[str, Any]:
+        try:
+            layer = get_layer_from_project(template.feature.layer, layer_registry)
+        except (LayerNotFoundError, LayerNotVectorTypeError) as e:
+            raise QgsProcessingException(str(e)) from e
+
+        request = QgsFeatureRequest().setNoAttributes().setDestinationCrs(layer.crs(), context.transformContext())
+        geometries = []
+        # The feature count is -1 if it is not known
+        total = max(source.featureCount(), 1)
+        for i, feature in enumerate(source.getFeatures(request)):
+            if feedback.isCanceled():
+                return {self.FEATURE_COUNT: 0}
+            geometries.append(feature.geometry())
+            feedback.setProgress(50 * i / total)
+
+        feedback.pushInfo(f"Writing {len(geometries)} features from template {template.name}")
+        try:
+            tree = stamp_template(
+                template.feature, feature_with_defaults(template.feature, layer.fields()), geometries, layer_registry
+            )
+        except (LayerNotFoundError, LayerNotVectorTypeError, FeatureTreeWriteError) as e:
+            raise QgsProcessingException(str(e)) from e
+        feedback.setProgress(100)
+
+        for layer_id, features in tree.layer_features.items():
+            feedback.pushInfo(f"{tree.layers[layer_id].name()}: {len(features)} features")
+        return {self.FEATURE_COUNT: len(tree.layer_features[layer.id()])}
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from qgis.core import QgsProcessingProvider
+
+from arho_feature_template.processing.apply_feature_template import ApplyFeatureTemplateAlgorithm
+from arho_feature_template.processing.validate_template_library import ValidateTemplateLibraryAlgorithm
+
+
+class Provider(QgsProcessingProvider):
+    """Processing algorithms for using feature templates without the template dock"""
+
+    def id(self) -> str:
+        return "arho_feature_template"
+
+    def name(self) -> str:
+        return "ARHO kaavatemplaatit"
+
+    def loadAlgorithms(self) -> None:  # noqa: N802
+        self.addAlgorithm(ApplyFeatureTemplateAlgorithm())
+        self.addAlgorithm(ValidateTemplateLibraryAlgorithm())
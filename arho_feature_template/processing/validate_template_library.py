@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import yaml
+from qgis.core import (
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeedback,
+    QgsProcessingOutputNumber,
+    QgsProcessingParameterFile,
+)
+
+from arho_feature_template.core.layer_registry import LayerRegistry
+from arho_feature_template.core.template_library_config import (
+    TemplateLibraryVersionError,
+    TemplateSyntaxError,
+    iter_feature_templates,
+)
+from arho_feature_template.core.template_validation import TemplateValidator
+
+
+class ValidateTemplateLibraryAlgorithm(QgsProcessingAlgorithm):
+    """Checks that a template library can be parsed and that its templates match the project layers"""
+
+    TEMPLATE_LIBRARY = "TEMPLATE_LIBRARY"
+    TEMPLATE_COUNT = "TEMPLATE_COUNT"
+    INVALID_TEMPLATE_COUNT = "INVALID_TEMPLATE_COUNT"
+
+    def name(self) -> str:
+        return "validate_template_library"
+
+    def displayName(self) -> str:  # noqa: N802
+        return "Tarkista templaattikirjasto"
+
+    def group(self) -> str:
+        return "Templaatit"
+
+    def groupId(self) -> str:  # noqa: N802
+        return "templates"
+
+    def shortHelpString(self) -> str:  # noqa: N802
+        return (
+            "Tarkistaa templaattikirjaston syntaksin ja sen, että templaattien tasot ja kentät "
+            "löytyvät projektista. Virheelliset templaatit listataan lokiin."
+        )
+
+    def createInstance(self) -> ValidateTemplateLibraryAlgorithm:  # noqa: N802
+        return ValidateTemplateLibraryAlgorithm()
+
+    def flags(self) -> QgsProcessingAlgorithm.Flags:
+        # The layer registry and the validator connect to the signals of the project and its layers,
+        # which must not be used from another thread
+        return super().flags() | QgsProcessingAlgorithm.FlagNoThreading
+
+    def initAlgorithm(self, config: dict[str, Any] | None = None) -> None:  # noqa: N802, ARG002
+        self.addParameter(QgsProcessingParameterFile(self.TEMPLATE_LIBRARY, "Templaattikirjasto", extension="yaml"))
+        self.addOutput(QgsProcessingOutputNumber(self.TEMPLATE_COUNT, "Templaattien määrä"))
+        self.addOutput(QgsProcessingOutputNumber(self.INVALID_TEMPLATE_COUNT, "Virheellisten templaattien määrä"))
+
+    def processAlgorithm(  # noqa: N802
+        self, parameters: dict[str, Any], context: QgsProcessingContext, feedback: QgsProcessingFeedback
+    ) -> dict[str, Any]:
+        library_file = Path(self.parameterAsFile(parameters, self.TEMPLATE_LIBRARY, context))
+
+        # The registry is not shared with the plugin, as the project of the context may not be the current one
+        project = context.project()
+        if project is None:
+            msg = "The algorithm must be run with a project containing the template layers"
+            raise QgsProcessingException(msg)
+        layer_registry = LayerRegistry(project)
+        validator = TemplateValidator(layer_registry)
+        template_count = 0
+        invalid_template_count = 0
+        try:
+            for template in iter_feature_templates(library_file):
+                if feedback.isCanceled():
+                    break
+                template_count += 1
+                if not validator.is_valid(template):
+                    invalid_template_count += 1
+                    feedback.reportError(f"Template {template.name} refers to missing layers or fields")
+        except (OSError, yaml.YAMLError, TemplateLibraryVersionError, TemplateSyntaxError) as e:
+            msg = f"Failed to read template library {library_file}: {e}"
+            raise QgsProcessingException(msg) from e
+        finally:
+            validator.unload()
+            layer_registry.unload()
+
+        feedback.pushInfo(f"{template_count} templates, {invalid_template_count} invalid")
+        return {self.TEMPLATE_COUNT: template_count, self.INVALID_TEMPLATE_COUNT: invalid_template_count}
@@ -9,9 +9,9 @@ if TYPE_CHECKING:
 
 
 def library_config_files() -> Iterator[Path]:
-    """Get all template library configuration files."""
+    """Get all template library configuration files in the order of their names."""
 
-    for resource in resources.files(__package__).iterdir():
+    for resource in sorted(resources.files(__package__).iterdir(), key=lambda resource: resource.name):
         with resources.as_file(resource) as resource_path:
             if resource_path.suffix == ".yaml":
                 yield resource_path
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
 import logging
+from typing import TYPE_CHECKING
 
 from qgis.core import QgsProviderRegistry
 
 from arho_feature_template.core.exceptions import UnexpectedNoneError
 
+if TYPE_CHECKING:
+    from qgis.core import QgsAbstractDatabaseProviderConnection
+
 LOGGER = logging.getLogger("LandUsePlugin")
 
 
@@ -24,3 +28,20 @@ def get_existing_database_connection_names() -> list[str]:
         raise UnexpectedNoneError
 
     return list(postgres_provider_metadata.dbConnections(False))
+
+
+def get_database_connection(connection_name: str) -> QgsAbstractDatabaseProviderConnection:
+    """
+    Create a connection to the PostgreSQL database saved with the given name.
+
+    :raises QgsProviderConnectionException: If the connection cannot be created.
+    """
+
+    provider_registry = QgsProviderRegistry.instance()
+    if provider_registry is None:
+        raise UnexpectedNoneError
+    postgres_provider_metadata = provider_registry.providerMetadata("postgres")
+    if postgres_provider_metadata is None:
+        raise UnexpectedNoneError
+
+    return postgres_provider_metadata.createConnection(connection_name)
@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import os
 
 from qgis.core import QgsProject, QgsVectorLayer
@@ -31,15 +33,58 @@ def commit_all_layer_changes() -> bool:
     Returns True if all changes were successfully committed, False if any failed.
     """
     project = QgsProject.instance()
-    layers = project.mapLayers().values()
-    all_committed = True
+    layers = [
+        layer for layer in project.mapLayers().values() if isinstance(layer, QgsVectorLayer) and layer.isModified()
+    ]
 
-    for layer in layers:
-        if isinstance(layer, QgsVectorLayer) and layer.isModified() and not layer.commitChanges():
-            QMessageBox.critical(None, "Virhe", f"Tason {layer.name()} muutosten tallentaminen epäonnistui.")
-            all_committed = False
+    errors = commit_layers(layers, project)
+    if errors:
+        QMessageBox.critical(
+            None, "Virhe", "Seuraavien tasojen muutosten tallentaminen epäonnistui:\n\n" + "\n".join(errors)
+        )
+    return not errors
+
+
+def commit_layers(layers: list[QgsVectorLayer], project: QgsProject) -> list[str]:
+    """
+    Commit the layers, returning the errors of the layers that failed.
+
+    Referenced layers are committed before the layers referring to them, so that the features
+    they refer to already exist. Layers of a transaction group are committed together by QGIS,
+    so the layers that are no longer modified are skipped.
 
-    return all_committed
+    The layers are not grouped into a transaction per connection, nor committed concurrently:
+    edit buffers can only be committed in the main thread, and an edit buffer cannot be moved
+    into a transaction once editing has started. One transaction per connection is only used
+    when the project itself creates transaction groups.
+    """
+    referenced_layer_ids: dict[str, set[str]] = {}
+    for relation in project.relationManager().relations().values():
+        referenced_layer_ids.setdefault(relation.referencingLayerId(), set()).add(relation.referencedLayerId())
+
+    return [
+        f"{layer.name()}: {'; '.join(layer.commitErrors())}"
+        for layer in _referenced_first(layers, referenced_layer_ids)
+        if layer.isModified() and not layer.commitChanges()
+    ]
+
+
+def _referenced_first(layers: list[QgsVectorLayer], referenced_layer_ids: dict[str, set[str]]) -> list[QgsVectorLayer]:
+    layers_by_id = {layer.id(): layer for layer in layers}
+    ordered: dict[str, QgsVectorLayer] = {}
+
+    def visit(layer_id: str, visiting: set[str]) -> None:
+        if layer_id in ordered or layer_id in visiting:
+            return
+        visiting.add(layer_id)
+        for referenced_layer_id in referenced_layer_ids.get(layer_id, ()):
+            if referenced_layer_id in layers_by_id:
+                visit(referenced_layer_id, visiting)
+        ordered[layer_id] = layers_by_id[layer_id]
+
+    for layer in layers:
+        visit(layer.id(), set())
+    return list(ordered.values())
 
 
 def handle_unsaved_changes() -> bool:
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from typing import TypeVar
+
+from qgis.core import QgsSettings
+
+SETTINGS_GROUP = "arho_feature_template"
+
+T = TypeVar("T")
+
+
+def get_setting(key: str, default: T) -> T:
+    """Read a plugin setting, converting the value to the type of the default value"""
+    return QgsSettings().value(f"{SETTINGS_GROUP}/{key}", default, type=type(default))
+
+
+def set_setting(key: str, value: object) -> None:
+    QgsSettings().setValue(f"{SETTINGS_GROUP}/{key}", value)
@@ -13,3 +13,148 @@ fixtures:
   This should be used with tests that add stuff to QgsProject.
 
 """
+
+from __future__ import annotations
+
+import random
+
+import pytest
+import yaml
+from qgis.core import QgsProject, QgsRelation, QgsVectorLayer
+
+from arho_feature_template.core.layer_registry import unload_layer_registry
+from arho_feature_template.core.template_library_config import TemplateLibraryConfig
+from arho_feature_template.core.update_plan import unload_plan_filter_manager
+
+WORDS = [
+    "asuinrakennusten",
+    "liikerakennusten",
+    "teollisuus",
+    "varasto",
+    "puisto",
+    "lähivirkistys",
+    "urheilu",
+    "pysäköinti",
+    "katu",
+    "tori",
+    "kortteli",
+    "rakennusala",
+    "tehokkuusluku",
+    "kerrosluku",
+    "suojeltava",
+    "maisema",
+    "vesialue",
+    "yleinen",
+    "erillispientalojen",
+    "ympäristö",
+]
+
+
+def _template_library_data(template_count: int, seed: int = 0) -> dict:
+    """Generate a template library configuration with the given number of templates"""
+    rng = random.Random(seed)
+    templates = []
+    for i in range(template_count):
+        words = rng.sample(WORDS, 3)
+        templates.append(
+            {
+                "name": f"{' '.join(words).capitalize()} {i}",
+                "group": f"Ryhmä {i % 10}",
+                "sub_group": f"Alaryhmä {i % 7}" if i % 3 else None,
+                "description": f"Kuvaus: {' '.join(rng.sample(WORDS, 5))}",
+                "feature": {
+                    "layer": "Osa-alue",
+                    "attributes": [
+                        {"attribute": "name", "default": words[0]},
+                        {"attribute": "type_of_underground_id", "default": 1},
+                    ],
+                    "child_features": [
+                        {
+                            "layer": "plan_requlation_group",
+                            "attributes": [{"attribute": "name", "default": words[1]}],
+                            "child_features": [
+                                {
+                                    "layer": "plan_requlation",
+                                    "attributes": [
+                                        {"attribute": "type_of_plan_regulation_id", "default": words[2]},
+                                        {"attribute": "numeric_default"},
+                                    ],
+                                }
+                            ],
+                        }
+                    ],
+                },
+            }
+        )
+    return {"version": 1, "meta": {"name": f"Generated library {template_count}"}, "templates": templates}
+
+
+@pytest.fixture
+def write_template_library(tmp_path):
+    """Returns a function that writes a generated template library to a file"""
+
+    def _write(template_count: int):
+        path = tmp_path / f"library-{template_count}.yaml"
+        dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+        with path.open("w", encoding="utf-8") as f:
+            yaml.dump(_template_library_data(template_count), f, Dumper=dumper, allow_unicode=True, sort_keys=False)
+        return path
+
+    return _write
+
+
+@pytest.fixture
+def generate_library_config():
+    """Returns a function that generates a parsed template library"""
+
+    def _generate(template_count: int) -> TemplateLibraryConfig:
+        return TemplateLibraryConfig.from_dict(_template_library_data(template_count))
+
+    return _generate
+
+
+@pytest.fixture
+def generate_library_data():
+    """Returns a function that generates the data of a template library file"""
+    return _template_library_data
+
+
+@pytest.fixture
+def project(qgis_new_project, qgis_iface):  # noqa: ARG001
+    """Returns the cleared current project, unloading the plan filter manager and the layer registry afterwards
+
+    The plugin shows its messages through the mocked iface."""
+    project = QgsProject.instance()
+    yield project
+    unload_plan_filter_manager()
+    unload_layer_registry()
+
+
+@pytest.fixture
+def add_layer():
+    """Returns a function that adds a memory layer to a project"""
+
+    def _add_layer(project: QgsProject, uri: str, name: str) -> QgsVectorLayer:
+        layer = QgsVectorLayer(uri, name, "memory")
+        project.addMapLayer(layer)
+        return layer
+
+    return _add_layer
+
+
+@pytest.fixture
+def add_relation():
+    """Returns a function that adds a relation referring to the id field of the referenced layer to a project"""
+
+    def _add_relation(
+        project: QgsProject, referencing_layer: QgsVectorLayer, referenced_layer: QgsVectorLayer, referencing_field: str
+    ) -> None:
+        relation = QgsRelation()
+        relation.setId(f"{referencing_layer.name()}_{referenced_layer.name()}")
+        relation.setReferencingLayer(referencing_layer.id())
+        relation.setReferencedLayer(referenced_layer.id())
+        relation.addFieldPair(referencing_field, "id")
+        assert relation.isValid()
+        project.relationManager().addRelation(relation)
+
+    return _add_relation
@@ -0,0 +1,146 @@
+import time
+
+import pytest
+from qgis.core import QgsFeature, QgsGeometry
+
+from arho_feature_template.core.feature_tree_writer import (
+    FeatureTreeWriteError,
+    MissingRelationError,
+    UnknownFieldError,
+    stamp_template,
+    write_feature_tree,
+)
+from arho_feature_template.core.template_library_config import Attribute, Feature
+
+
+@pytest.fixture
+def layers(project, add_layer, add_relation):
+    land_use_area = add_layer(project, "Polygon?crs=EPSG:3067&field=id:string&field=name:string", "Osa-alue")
+    group = add_layer(
+        project, "None?field=id:string&field=land_use_area_id:string&field=name:string", "plan_requlation_group"
+    )
+    regulation = add_layer(
+        project,
+        "None?field=id:string&field=plan_regulation_group_id:string&field=type_of_plan_regulation_id:string",
+        "plan_requlation",
+    )
+    add_relation(project, group, land_use_area, "land_use_area_id")
+    add_relation(project, regulation, group, "plan_regulation_group_id")
+    return land_use_area, group, regulation
+
+
+def _attribute(name, default=None):
+    return Attribute(attribute=name, default=default, description=None)
+
+
+def _feature_config():
+    regulations = tuple(
+        Feature(
+            layer="plan_requlation", attributes=(_attribute("type_of_plan_regulation_id", value),), child_features=()
+        )
+        for value in ("korttelinNumero", "kayttotarkoitus")
+    )
+    group = Feature(
+        layer="plan_requlation_group", attributes=(_attribute("name", "Korttelin numero"),), child_features=regulations
+    )
+    return Feature(layer="Osa-alue", attributes=(_attribute("name"),), child_features=(group,))
+
+
+def _digitized_feature(layer):
+    feature = QgsFeature(layer.fields())
+    feature.setGeometry(QgsGeometry.fromWkt("POLYGON((0 0, 1 0, 1 1, 0 0))"))
+    feature.setAttribute("name", "Kortteli 1")
+    return feature
+
+
+def test_writes_child_features_linked_to_their_parents(layers):
+    land_use_area, group, regulation = layers
+
+    write_feature_tree(_feature_config(), _digitized_feature(land_use_area))
+
+    [area_feature] = land_use_area.getFeatures()
+    [group_feature] = group.getFeatures()
+    regulation_features = list(regulation.getFeatures())
+
+    assert area_feature["name"] == "Kortteli 1"
+    assert area_feature["id"]
+    assert group_feature["land_use_area_id"] == area_feature["id"]
+    assert group_feature["name"] == "Korttelin numero"
+    assert {feature["type_of_plan_regulation_id"] for feature in regulation_features} == {
+        "korttelinNumero",
+        "kayttotarkoitus",
+    }
+    assert {feature["plan_regulation_group_id"] for feature in regulation_features} == {group_feature["id"]}
+
+
+def test_nothing_is_written_without_a_relation(project, layers):
+    land_use_area, group, _ = layers
+    project.relationManager().clear()
+
+    with pytest.raises(MissingRelationError):
+        write_feature_tree(_feature_config(), _digitized_feature(land_use_area))
+
+    assert land_use_area.featureCount() == 0
+    assert group.featureCount() == 0
+
+
+def test_unknown_fields_of_child_features_are_errors(layers):
+    land_use_area, group, _ = layers
+    child = Feature(layer="plan_requlation_group", attributes=(_attribute("virtual", "x"),), child_features=())
+    feature_config = Feature(layer="Osa-alue", attributes=(), child_features=(child,))
+
+    with pytest.raises(UnknownFieldError):
+        write_feature_tree(feature_config, _digitized_feature(land_use_area))
+
+    assert land_use_area.featureCount() == 0
+    assert group.featureCount() == 0
+
+
+def test_integer_keys_are_not_generated(project, add_layer, add_relation):
+    land_use_area = add_layer(project, "Polygon?crs=EPSG:3067&field=id:integer&field=name:string", "Osa-alue")
+    group = add_layer(
+        project, "None?field=id:string&field=land_use_area_id:integer&field=name:string", "plan_requlation_group"
+    )
+    add_relation(project, group, land_use_area, "land_use_area_id")
+    child = Feature(layer="plan_requlation_group", attributes=(), child_features=())
+    feature_config = Feature(layer="Osa-alue", attributes=(), child_features=(child,))
+
+    with pytest.raises(FeatureTreeWriteError):
+        write_feature_tree(feature_config, _digitized_feature(land_use_area))
+
+    assert land_use_area.featureCount() == 0
+
+
+def _geometries(count):
+    return [QgsGeometry.fromWkt(f"POLYGON(({i} 0, {i + 1} 0, {i + 1} 1, {i} 0))") for i in range(count)]
+
+
+def test_stamping_creates_linked_features_for_each_geometry(layers):
+    land_use_area, group, regulation = layers
+
+    stamp_template(_feature_config(), _digitized_feature(land_use_area), _geometries(3))
+
+    area_ids = {feature["id"] for feature in land_use_area.getFeatures()}
+    group_features = list(group.getFeatures())
+    assert len(area_ids) == 3
+    assert {feature["land_use_area_id"] for feature in group_features} == area_ids
+    assert {feature["name"] for feature in land_use_area.getFeatures()} == {"Kortteli 1"}
+    assert {feature["plan_regulation_group_id"] for feature in regulation.getFeatures()} == {
+        feature["id"] for feature in group_features
+    }
+    assert regulation.featureCount() == 6
+
+
+@pytest.mark.benchmark
+def test_benchmark_stamping_throughput(layers, record_property):
+    land_use_area, _, _ = layers
+    geometries = _geometries(10_000)
+
+    start = time.perf_counter()
+    tree = stamp_template(_feature_config(), _digitized_feature(land_use_area), geometries)
+    elapsed = time.perf_counter() - start
+
+    feature_count = sum(len(features) for features in tree.layer_features.values())
+    record_property("stamping_s", round(elapsed, 2))
+    record_property("features_per_s", round(feature_count / elapsed))
+    assert feature_count == 40_000
@@ -0,0 +1,35 @@
+import pytest
+
+from arho_feature_template.core.layer_registry import LayerRegistry
+
+
+@pytest.fixture
+def registry(project):
+    registry = LayerRegistry(project)
+    yield registry
+    registry.unload()
+
+
+def test_finds_layers_by_name_and_id(project, registry, add_layer):
+    kaava = add_layer(project, "Point?crs=EPSG:3067", "Kaava")
+    osa_alue = add_layer(project, "Point?crs=EPSG:3067", "Osa-alue")
+
+    assert registry.layers_by_name("Kaava") == [kaava]
+    assert registry.layers_by_name("Osa-alue") == [osa_alue]
+    assert registry.layers_by_name("Viivat") == []
+    assert registry.layer(osa_alue.id()) is osa_alue
+
+
+def test_is_updated_when_layers_change(project, registry, add_layer):
+    kaava = add_layer(project, "Point?crs=EPSG:3067", "Kaava")
+    assert registry.layers_by_name("Kaava") == [kaava]
+
+    kaava.setName("Vanha kaava")
+    assert registry.layers_by_name("Kaava") == []
+    assert registry.layers_by_name("Vanha kaava") == [kaava]
+
+    new_kaava = add_layer(project, "Point?crs=EPSG:3067", "Kaava")
+    assert registry.layers_by_name("Kaava") == [new_kaava]
+
+    project.removeMapLayer(new_kaava.id())
+    assert registry.layers_by_name("Kaava") == []
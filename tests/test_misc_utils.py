@@ -0,0 +1,26 @@
+from qgis.core import QgsFeature, QgsVectorLayer
+
+from arho_feature_template.utils.misc_utils import commit_layers
+
+
+def _add_edited_layer(project, uri, name):
+    layer = QgsVectorLayer(uri, name, "memory")
+    project.addMapLayer(layer)
+    layer.startEditing()
+    layer.addFeature(QgsFeature(layer.fields()))
+    return layer
+
+
+def test_commit_layers_commits_referenced_layers_first(project, add_relation):
+    regulation = _add_edited_layer(project, "None?field=id:string&field=group_id:string", "regulation")
+    group = _add_edited_layer(project, "None?field=id:string", "group")
+    add_relation(project, regulation, group, "group_id")
+
+    committed = []
+    for layer in (regulation, group):
+        layer.afterCommitChanges.connect(lambda layer=layer: committed.append(layer.name()))
+
+    assert commit_layers([regulation, group], project) == []
+    assert committed == ["group", "regulation"]
+    assert not regulation.isModified()
+    assert not group.isModified()
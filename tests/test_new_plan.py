@@ -0,0 +1,54 @@
+import time
+
+import pytest
+from qgis.core import QgsFeature, QgsGeometry, QgsVectorLayer
+from qgis.utils import iface
+
+from arho_feature_template.core.new_plan import NewPlan
+
+
+def _kaava_layer(project, plan_count):
+    layer = QgsVectorLayer("Polygon?crs=EPSG:3067&field=id:string&field=name:string", "Kaava", "memory")
+    features = []
+    for i in range(plan_count):
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes([f"plan-{i}", f"Kaava {i}"])
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    project.addMapLayer(layer)
+    return layer
+
+
+def _digitize_plan(layer, plan_id):
+    new_plan = NewPlan()
+    iface.setActiveLayer(layer)
+    layer.startEditing()
+    layer.featureAdded.connect(new_plan.feature_added)
+
+    feature = QgsFeature(layer.fields())
+    feature.setAttributes([plan_id, "Uusi kaava"])
+    feature.setGeometry(QgsGeometry.fromWkt("POLYGON((0 0, 1 0, 1 1, 0 0))"))
+    layer.addFeature(feature)
+
+
+def test_new_plan_is_selected_after_commit(project):
+    layer = _kaava_layer(project, 10)
+
+    _digitize_plan(layer, "new-plan")
+
+    assert not layer.isEditable()
+    assert layer.subsetString() == "\"id\" = 'new-plan'"
+    assert [feature["name"] for feature in layer.getFeatures()] == ["Uusi kaava"]
+
+
+@pytest.mark.benchmark
+def test_benchmark_new_plan_creation_with_large_kaava_layer(project, record_property):
+    for plan_count in (1_000, 100_000):
+        layer = _kaava_layer(project, plan_count)
+
+        start = time.perf_counter()
+        _digitize_plan(layer, "new-plan")
+        record_property(f"{plan_count}_plans_s", round(time.perf_counter() - start, 4))
+
+        assert layer.subsetString() == "\"id\" = 'new-plan'"
+        project.removeMapLayer(layer.id())
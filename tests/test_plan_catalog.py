@@ -0,0 +1,70 @@
+from arho_feature_template.core.plan_catalog import (
+    PlanCatalogCache,
+    like_pattern,
+    plan_page_query,
+    quote_literal,
+)
+
+
+def test_quote_literal_escapes_quotes_and_backslashes():
+    assert quote_literal("O'Brien \\ kaava") == "E'O''Brien \\\\ kaava'"
+
+
+def test_like_pattern_matches_wildcards_literally():
+    assert like_pattern("100%_a\\b") == "%100\\%\\_a\\\\b%"
+
+
+def test_plan_page_query_pages_by_id():
+    query = plan_page_query("asema'kaava", "abc", 50)
+
+    assert "ILIKE E'%asema''kaava%'" in query
+    assert "p.id > E'abc'" in query
+    assert query.endswith("ORDER BY p.id LIMIT 50")
+
+
+def test_plan_page_query_without_filters_has_no_where_clause():
+    assert "WHERE" not in plan_page_query("", None, 50)
+
+
+def test_plan_catalog_cache_keeps_plan_lists_of_the_current_version():
+    cache = PlanCatalogCache()
+    plan_list = cache.plan_list("db", "asema")
+    assert cache.needs_version_check("db")
+
+    cache.set_version("db", (10, "2024-01-01"))
+    plan_list.version = (10, "2024-01-01")
+    plan_list.rows.append(("1", "a", "b", "c", "d"))
+
+    assert not cache.needs_version_check("db")
+    assert cache.plan_list("db", "asema") is plan_list
+    assert cache.plan_list("db", "") is not plan_list
+
+    cache.set_version("db", (11, "2024-01-02"))
+    assert cache.plan_list("db", "asema") is not plan_list
+
+
+def test_plan_catalog_cache_evicts_least_recently_used_plan_lists():
+    cache = PlanCatalogCache(max_size=2)
+    cache.set_version("db", (1, None))
+    plan_lists = {}
+    for search_text in ("a", "b"):
+        plan_lists[search_text] = cache.plan_list("db", search_text)
+        plan_lists[search_text].version = (1, None)
+
+    cache.plan_list("db", "a")
+    cache.plan_list("db", "c")
+
+    assert cache.plan_list("db", "a") is plan_lists["a"]
+    assert cache.plan_list("db", "b") is not plan_lists["b"]
+
+
+def test_plan_catalog_cache_invalidate_forgets_the_connection():
+    cache = PlanCatalogCache()
+    cache.set_version("db", (1, None))
+    plan_list = cache.plan_list("db", "")
+    plan_list.version = (1, None)
+
+    cache.invalidate("db")
+
+    assert cache.needs_version_check("db")
+    assert cache.plan_list("db", "") is not plan_list
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from arho_feature_template.core.plan_catalog import CachedPlanList, plan_haystack
+from arho_feature_template.gui.load_plan_dialog import PlanFilterProxyModel
+from arho_feature_template.gui.plan_table_model import PlanTableModel
+
+LIFECYCLE_STATUSES = ("Vireilletullut", "Valmisteluvaihe", "Ehdotusvaihe", "Hyväksytty", "Voimassa")
+PLAN_TYPES = ("Asemakaava", "Yleiskaava", "Maakuntakaava")
+
+
+def _plan_model(count):
+    plan_list = CachedPlanList()
+    plan_list.rows = [
+        (
+            f"{i:08x}-0000-0000-0000-000000000000",
+            f"KAAVA-{i}",
+            f"Kaava {i} Keskusta" if i % 10 == 0 else f"Kaava {i}",
+            LIFECYCLE_STATUSES[i % len(LIFECYCLE_STATUSES)],
+            PLAN_TYPES[i % len(PLAN_TYPES)],
+        )
+        for i in range(count)
+    ]
+    plan_list.haystacks = [plan_haystack(row) for row in plan_list.rows]
+    plan_list.exhausted = True
+
+    model = PlanTableModel()
+    model.beginResetModel()
+    model.plan_list = plan_list
+    model.endResetModel()
+    return model
+
+
+def _shown_plan_names(proxy):
+    return [proxy.index(row, 2).data() for row in range(proxy.rowCount())]
+
+
+def _matching_plan_names(model, search_text):
+    return [row[2] for row in model.rows if any(value and search_text.lower() in value.lower() for value in row)]
+
+
+@pytest.fixture
+def proxy(qgis_new_project):  # noqa: ARG001
+    proxy = PlanFilterProxyModel()
+    proxy.setSourceModel(_plan_model(100))
+    return proxy
+
+
+def test_filter_matches_any_column_ignoring_case(proxy):
+    proxy.set_search_text("KESKUSTA")
+    assert _shown_plan_names(proxy) == _matching_plan_names(proxy.sourceModel(), "keskusta")
+
+    proxy.set_search_text("asemakaava")
+    assert _shown_plan_names(proxy) == _matching_plan_names(proxy.sourceModel(), "asemakaava")
+
+
+def test_filter_is_updated_when_search_text_is_extended_and_shortened(proxy):
+    for search_text in ("k", "ka", "kaava 1", "kaava 12", "kaava 1", "", "1"):
+        proxy.set_search_text(search_text)
+        assert _shown_plan_names(proxy) == _matching_plan_names(proxy.sourceModel(), search_text)
+
+
+def test_filter_does_not_match_across_columns(proxy):
+    proxy.set_search_text("keskusta vireilletullut")
+    assert proxy.rowCount() == 0
+
+
+@pytest.mark.benchmark
+def test_benchmark_filtering_100k_plans(qgis_new_project, record_property):  # noqa: ARG001
+    proxy = PlanFilterProxyModel()
+    proxy.setSourceModel(_plan_model(100_000))
+
+    for search_text in ("k", "ke", "kes", "kesk", "keskusta", "kesk", "asemakaava"):
+        start = time.perf_counter()
+        proxy.set_search_text(search_text)
+        row_count = proxy.rowCount()
+        elapsed = time.perf_counter() - start
+
+        record_property(f"{search_text}_s", round(elapsed, 3))
+        record_property(f"{search_text}_rows", row_count)
+        # Typing a character must not block the dialog noticeably
+        assert elapsed < 0.5
+    assert row_count == len(_matching_plan_names(proxy.sourceModel(), "asemakaava"))
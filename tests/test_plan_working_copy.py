@@ -0,0 +1,150 @@
+import pytest
+from qgis.core import QgsFeature, QgsGeometry, QgsProject, QgsVectorFileWriter, QgsVectorLayer
+
+from arho_feature_template.core import plan_working_copy
+from arho_feature_template.core.plan_working_copy import PlanWorkingCopy, close_working_copy
+
+
+def _database_layer(tmp_path, name, plan_features):
+    """Return a layer filtered to plan 'a' in a GeoPackage standing in for the database"""
+    source = QgsVectorLayer(
+        "Polygon?crs=EPSG:3067&field=id:string&field=plan_id:string&field=name:string", name, "memory"
+    )
+    features = []
+    for feature_id, plan_id, x in plan_features:
+        feature = QgsFeature(source.fields())
+        feature.setAttributes([feature_id, plan_id, f"Kohde {feature_id}"])
+        feature.setGeometry(QgsGeometry.fromWkt(f"POLYGON(({x} 0, {x + 1} 0, {x + 1} 1, {x} 0))"))
+        features.append(feature)
+    source.dataProvider().addFeatures(features)
+
+    path = tmp_path / f"{name}.gpkg"
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = "GPKG"
+    QgsVectorFileWriter.writeAsVectorFormatV2(source, str(path), QgsProject.instance().transformContext(), options)
+    layer = QgsVectorLayer(f"{path}|subset=\"plan_id\" = 'a'", name, "ogr")
+    QgsProject.instance().addMapLayer(layer)
+    return layer
+
+
+def _names(layer):
+    return {feature["id"]: feature["name"] for feature in layer.getFeatures()}
+
+
+@pytest.fixture
+def layer(qgis_new_project, tmp_path):  # noqa: ARG001
+    # The feature of the other plan comes first, so that new features do not get its fid in the copy
+    return _database_layer(tmp_path, "Osa-alue", [("3", "b", 2), ("1", "a", 0), ("2", "a", 1)])
+
+
+@pytest.fixture
+def database_layer(tmp_path):
+    """Return the unfiltered layer of the database file, which the working copy does not touch"""
+    return QgsVectorLayer(str(tmp_path / "Osa-alue.gpkg"), "database", "ogr")
+
+
+@pytest.fixture
+def working_copy(layer, tmp_path):
+    working_copy = PlanWorkingCopy("a", tmp_path / "working_copy.gpkg")
+    working_copy.open([layer])
+    yield working_copy
+    working_copy.close()
+
+
+def test_layers_are_switched_to_a_copy_of_the_plan(layer, working_copy):
+    assert layer.providerType() == "ogr"
+    assert str(working_copy.path) in layer.source()
+    assert _names(layer) == {"1": "Kohde 1", "2": "Kohde 2"}
+
+    working_copy.close()
+
+    assert "working_copy" not in layer.source()
+    assert layer.subsetString() == "\"plan_id\" = 'a'"
+
+
+def _change_name(layer, feature_id, name):
+    feature = next(feature for feature in layer.getFeatures() if feature["id"] == feature_id)
+    assert layer.dataProvider().changeAttributeValues({feature.id(): {layer.fields().lookupField("name"): name}})
+
+
+def test_sync_writes_only_the_changes(layer, working_copy, database_layer):
+    layer.startEditing()
+    features = {feature["id"]: feature for feature in layer.getFeatures()}
+    layer.changeAttributeValue(features["1"].id(), layer.fields().lookupField("name"), "Muutettu")
+    layer.deleteFeature(features["2"].id())
+    new_feature = QgsFeature(layer.fields())
+    new_feature.setAttribute("plan_id", "a")
+    new_feature.setAttribute("name", "Uusi")
+    new_feature.setGeometry(QgsGeometry.fromWkt("POLYGON((5 0, 6 0, 6 1, 5 0))"))
+    layer.addFeature(new_feature)
+    assert layer.commitChanges()
+
+    result = working_copy.sync()
+    assert result.change_count == 3
+    assert result.conflicts == []
+    # Nothing is written again
+    assert working_copy.sync().change_count == 0
+
+    names = _names(database_layer)
+    assert names.pop("1") == "Muutettu"
+    assert names.pop("3") == "Kohde 3"
+    assert list(names.values()) == ["Uusi"]
+
+    working_copy.close()
+
+    assert _names(layer) == {"1": "Muutettu", next(iter(names)): "Uusi"}
+
+
+def test_sync_skips_features_changed_in_the_database(layer, working_copy, database_layer):
+    _change_name(database_layer, "1", "Muutettu tietokannassa")
+    features = {feature["id"]: feature for feature in database_layer.getFeatures()}
+    assert database_layer.dataProvider().deleteFeatures([features["2"].id()])
+    layer.startEditing()
+    features = {feature["id"]: feature for feature in layer.getFeatures()}
+    layer.changeAttributeValue(features["1"].id(), layer.fields().lookupField("name"), "Muutettu")
+    layer.changeAttributeValue(features["2"].id(), layer.fields().lookupField("name"), "Muutettu")
+    assert layer.commitChanges()
+
+    result = working_copy.sync()
+
+    assert result.change_count == 0
+    assert sorted(result.conflicts) == ["Osa-alue 1", "Osa-alue 2"]
+    assert _names(database_layer) == {"1": "Muutettu tietokannassa", "3": "Kohde 3"}
+
+
+def test_detached_copy_is_reopened_with_its_changes(layer, working_copy, database_layer):
+    layer.startEditing()
+    features = {feature["id"]: feature for feature in layer.getFeatures()}
+    layer.changeAttributeValue(features["1"].id(), layer.fields().lookupField("name"), "Muutettu")
+
+    working_copy.detach(keep_edits=True)
+
+    assert "working_copy" not in layer.source()
+    assert _names(layer) == {"1": "Kohde 1", "2": "Kohde 2"}
+
+    reopened = PlanWorkingCopy("a", working_copy.path)
+    assert reopened.is_kept()
+    assert reopened.reopen([layer])
+    assert _names(layer) == {"1": "Muutettu", "2": "Kohde 2"}
+
+    result = reopened.sync()
+    reopened.close()
+
+    assert result.change_count == 1
+    assert _names(database_layer)["1"] == "Muutettu"
+    assert not reopened.is_kept()
+
+
+def test_copy_with_conflicts_is_not_closed(layer, working_copy, database_layer, qgis_iface, monkeypatch):  # noqa: ARG001
+    monkeypatch.setattr(plan_working_copy, "_working_copy", working_copy)
+    _change_name(database_layer, "1", "Muutettu tietokannassa")
+    layer.startEditing()
+    features = {feature["id"]: feature for feature in layer.getFeatures()}
+    layer.changeAttributeValue(features["1"].id(), layer.fields().lookupField("name"), "Muutettu")
+    assert layer.commitChanges()
+
+    assert not close_working_copy()
+
+    assert plan_working_copy.get_working_copy() is working_copy
+    assert str(working_copy.path) in layer.source()
+    assert _names(layer)["1"] == "Muutettu"
@@ -0,0 +1,136 @@
+import pytest
+from qgis.core import QgsFeature, QgsGeometry, QgsProcessingContext, QgsProcessingFeedback, QgsProject
+
+from arho_feature_template.processing.apply_feature_template import ApplyFeatureTemplateAlgorithm
+from arho_feature_template.processing.validate_template_library import ValidateTemplateLibraryAlgorithm
+
+
+def _add_template_layers(project, add_layer, add_relation):
+    land_use_area = add_layer(
+        project,
+        "Polygon?crs=EPSG:3067&field=id:string&field=name:string&field=type_of_underground_id:integer",
+        "Osa-alue",
+    )
+    group = add_layer(
+        project, "None?field=id:string&field=land_use_area_id:string&field=name:string", "plan_requlation_group"
+    )
+    regulation = add_layer(
+        project,
+        "None?field=id:string&field=plan_regulation_group_id:string"
+        "&field=type_of_plan_regulation_id:string&field=numeric_default:double",
+        "plan_requlation",
+    )
+    add_relation(project, group, land_use_area, "land_use_area_id")
+    add_relation(project, regulation, group, "plan_regulation_group_id")
+    return land_use_area, group, regulation
+
+
+@pytest.fixture
+def template_layers(project, add_layer, add_relation):
+    return _add_template_layers(project, add_layer, add_relation)
+
+
+def _run(algorithm, parameters, project):
+    algorithm = algorithm.create()
+    context = QgsProcessingContext()
+    context.setProject(project)
+    results, succeeded = algorithm.run(parameters, context, QgsProcessingFeedback())
+    assert succeeded
+    return results
+
+
+def test_validate_template_library(project, template_layers, write_template_library):
+    library_file = str(write_template_library(20))
+
+    results = _run(ValidateTemplateLibraryAlgorithm(), {"TEMPLATE_LIBRARY": library_file}, project)
+    assert results == {"TEMPLATE_COUNT": 20, "INVALID_TEMPLATE_COUNT": 0}
+
+    _, _, regulation = template_layers
+    project.removeMapLayer(regulation.id())
+
+    results = _run(ValidateTemplateLibraryAlgorithm(), {"TEMPLATE_LIBRARY": library_file}, project)
+    assert results == {"TEMPLATE_COUNT": 20, "INVALID_TEMPLATE_COUNT": 20}
+
+
+def _geometry_layer(project, add_layer, count):
+    geometries = add_layer(project, "Polygon?crs=EPSG:3067", "geometries")
+    features = []
+    for i in range(count):
+        feature = QgsFeature(geometries.fields())
+        feature.setGeometry(QgsGeometry.fromWkt(f"POLYGON(({i} 0, {i + 1} 0, {i + 1} 1, {i} 0))"))
+        features.append(feature)
+    geometries.dataProvider().addFeatures(features)
+    return geometries
+
+
+def test_apply_feature_template(project, template_layers, add_layer, write_template_library, generate_library_data):
+    land_use_area, group, regulation = template_layers
+    geometries = _geometry_layer(project, add_layer, 5)
+    template = generate_library_data(3)["templates"][1]
+
+    results = _run(
+        ApplyFeatureTemplateAlgorithm(),
+        {"TEMPLATE_LIBRARY": str(write_template_library(3)), "TEMPLATE": template["name"], "INPUT": geometries},
+        project,
+    )
+
+    assert results == {"FEATURE_COUNT": 5}
+    assert {feature["name"] for feature in land_use_area.getFeatures()} == {
+        template["feature"]["attributes"][0]["default"]
+    }
+    assert group.featureCount() == 5
+    assert regulation.featureCount() == 5
+
+
+def test_apply_feature_template_writes_to_the_project_of_the_context(
+    template_layers, add_layer, add_relation, write_template_library, generate_library_data
+):
+    other_project = QgsProject()
+    land_use_area, group, regulation = _add_template_layers(other_project, add_layer, add_relation)
+    geometries = _geometry_layer(other_project, add_layer, 2)
+    template = generate_library_data(3)["templates"][0]
+
+    results = _run(
+        ApplyFeatureTemplateAlgorithm(),
+        {"TEMPLATE_LIBRARY": str(write_template_library(3)), "TEMPLATE": template["name"], "INPUT": geometries},
+        other_project,
+    )
+
+    assert results == {"FEATURE_COUNT": 2}
+    assert (land_use_area.featureCount(), group.featureCount(), regulation.featureCount()) == (2, 2, 2)
+    assert all(layer.featureCount() == 0 for layer in template_layers)
+
+
+class _ErrorFeedback(QgsProcessingFeedback):
+    def __init__(self):
+        super().__init__()
+        self.errors = []
+
+    def reportError(self, error, fatalError=False):  # noqa: N802, N803, FBT002, ARG002
+        self.errors.append(error)
+
+
+def _run_failing(algorithm, parameters, project):
+    context = QgsProcessingContext()
+    context.setProject(project)
+    feedback = _ErrorFeedback()
+    _, succeeded = algorithm.create().run(parameters, context, feedback)
+    assert not succeeded
+    return feedback.errors
+
+
+def test_broken_library_is_a_processing_error(project, tmp_path):
+    library_file = tmp_path / "library.yaml"
+    library_file.write_text("version: 1\ntemplates: [\n", encoding="utf-8")
+
+    errors = _run_failing(ValidateTemplateLibraryAlgorithm(), {"TEMPLATE_LIBRARY": str(library_file)}, project)
+
+    assert any("Failed to read template library" in error for error in errors)
+
+
+def test_missing_project_is_a_processing_error(write_template_library):
+    errors = _run_failing(
+        ValidateTemplateLibraryAlgorithm(), {"TEMPLATE_LIBRARY": str(write_template_library(1))}, None
+    )
+
+    assert any("project" in error for error in errors)
@@ -0,0 +1,81 @@
+import pytest
+from qgis.core import QgsFeature, QgsField, QgsGeometry
+from qgis.PyQt.QtCore import QVariant
+
+from arho_feature_template.core.feature_tree_writer import build_feature_tree
+from arho_feature_template.core.template_edit_session import TemplateEditSession, UnsavedChangesError
+from arho_feature_template.core.template_library_config import Attribute, Feature
+
+
+@pytest.fixture
+def layer(project, add_layer):
+    return add_layer(project, "Polygon?crs=EPSG:3067&field=id:string&field=name:string", "Osa-alue")
+
+
+@pytest.fixture
+def session():
+    session = TemplateEditSession()
+    session.batch_size = 3
+    return session
+
+
+def _tree(layer, name):
+    feature = QgsFeature(layer.fields())
+    feature.setGeometry(QgsGeometry.fromWkt("POLYGON((0 0, 1 0, 1 1, 0 0))"))
+    feature.setAttribute("name", name)
+    config = Feature(
+        layer="Osa-alue", attributes=(Attribute(attribute="name", default=None, description=None),), child_features=()
+    )
+    return build_feature_tree(config, feature)
+
+
+def test_features_are_committed_in_batches(layer, session):
+    session.add(_tree(layer, "Kortteli 1"))
+    session.add(_tree(layer, "Kortteli 2"))
+
+    assert session.pending_count == 2
+    assert layer.isModified()
+    assert layer.dataProvider().featureCount() == 0
+
+    session.add(_tree(layer, "Kortteli 3"))
+
+    assert session.pending_count == 0
+    assert not layer.isModified()
+    assert {feature["name"] for feature in layer.dataProvider().getFeatures()} == {
+        "Kortteli 1",
+        "Kortteli 2",
+        "Kortteli 3",
+    }
+
+
+def test_pending_features_are_committed_on_demand(layer, session):
+    pending_counts = []
+    session.pending_count_changed.connect(pending_counts.append)
+
+    session.add(_tree(layer, "Kortteli 1"))
+    assert session.commit()
+
+    assert pending_counts == [1, 0]
+    assert layer.dataProvider().featureCount() == 1
+
+
+def test_layers_with_unsaved_changes_are_not_used(layer, session):
+    layer.startEditing()
+    layer.addFeature(QgsFeature(layer.fields()))
+
+    with pytest.raises(UnsavedChangesError):
+        session.add(_tree(layer, "Kortteli 1"))
+
+    assert session.pending_count == 0
+    assert len(layer.editBuffer().addedFeatures()) == 1
+
+
+def test_features_are_added_to_layers_with_expression_fields(layer, session):
+    layer.addExpressionField('upper("name")', QgsField("label", QVariant.String))
+
+    session.add(_tree(layer, "Kortteli 1"))
+
+    assert session.pending_count == 1
+    assert [feature["label"] for feature in layer.getFeatures()] == ["KORTTELI 1"]
+    assert session.commit()
+    assert [feature["name"] for feature in layer.dataProvider().getFeatures()] == ["Kortteli 1"]
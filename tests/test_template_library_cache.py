@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from arho_feature_template.core import template_library_cache
+from arho_feature_template.core.template_library_cache import TemplateLibraryCache
+from arho_feature_template.core.template_library_config import parse_template_library_config
+
+LIBRARY = """
+version: 1
+meta:
+  name: Test library
+templates:
+  - name: Rakennusala
+    group: Osa-alue
+    feature:
+      layer: Osa-alue
+      attributes:
+        - attribute: type_of_underground_id
+          default: 1
+      child_features:
+        - layer: plan_requlation_group
+          attributes:
+            - attribute: name
+              default: Tehokkuusluku
+"""
+
+
+@pytest.fixture
+def library_file(tmp_path):
+    path = tmp_path / "library.yaml"
+    path.write_text(LIBRARY, encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TemplateLibraryCache(tmp_path / "cache")
+
+
+def _fail_parse(_content):
+    pytest.fail("YAML should not be parsed")
+
+
+def test_cached_config_equals_parsed_config(library_file, cache):
+    assert cache.load(library_file) == parse_template_library_config(library_file)
+    assert cache.load(library_file) == parse_template_library_config(library_file)
+
+
+def test_unchanged_file_is_not_reparsed(library_file, cache, monkeypatch):
+    cache.load(library_file)
+    monkeypatch.setattr(template_library_cache, "parse_template_library_config_content", _fail_parse)
+
+    assert cache.load(library_file).meta.name == "Test library"
+
+
+def test_touched_file_with_same_content_is_not_reparsed(library_file, cache, monkeypatch):
+    cache.load(library_file)
+    stat = library_file.stat()
+    os.utime(library_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    monkeypatch.setattr(template_library_cache, "parse_template_library_config_content", _fail_parse)
+
+    assert cache.load(library_file).meta.name == "Test library"
+
+
+def test_changed_file_is_reparsed(library_file, cache):
+    cache.load(library_file)
+    library_file.write_text(LIBRARY.replace("Test library", "Changed library"), encoding="utf-8")
+
+    assert cache.load(library_file).meta.name == "Changed library"
+
+
+def test_corrupted_cache_entry_falls_back_to_yaml(library_file, cache):
+    cache.load(library_file)
+    for entry in cache.cache_dir.iterdir():
+        entry.write_bytes(b"not a cache entry")
+
+    assert cache.load(library_file) == parse_template_library_config(library_file)
+
+
+def test_meta_is_read_from_cache(library_file, cache, monkeypatch):
+    cache.load(library_file)
+    monkeypatch.setattr(template_library_cache, "read_template_library_meta", _fail_parse)
+
+    assert cache.load_meta(library_file).name == "Test library"
+
+
+def test_parsed_templates_are_passed_on_in_batches(library_file, cache):
+    batches = []
+
+    config = cache.load(library_file, batches.append)
+    assert batches == [config.templates]
+
+    # Cached templates are returned at once
+    batches.clear()
+    assert cache.load(library_file, batches.append) == config
+    assert batches == []
@@ -0,0 +1,230 @@
+import time
+import tracemalloc
+from dataclasses import make_dataclass
+
+import pytest
+import yaml
+
+from arho_feature_template.core.template_library_config import (
+    TemplateLibraryConfig,
+    TemplateLibraryVersionError,
+    TemplateSyntaxError,
+    iter_feature_templates,
+    load_yaml,
+    parse_template_library_config,
+    read_template_library_meta,
+    stream_template_library_config,
+)
+
+
+def test_streamed_templates_equal_parsed_templates(write_template_library):
+    library_file = write_template_library(50)
+
+    assert tuple(iter_feature_templates(library_file)) == parse_template_library_config(library_file).templates
+
+
+def test_streaming_resolves_anchors_and_aliases(tmp_path):
+    library_file = tmp_path / "library.yaml"
+    library_file.write_text(
+        """
+version: 1
+meta:
+  name: Anchors
+templates:
+  - name: First
+    feature: &feature
+      layer: Osa-alue
+      attributes:
+        - attribute: type_of_underground_id
+          default: 1
+  - name: Second
+    feature: *feature
+""",
+        encoding="utf-8",
+    )
+
+    first, second = iter_feature_templates(library_file)
+
+    assert first.feature == second.feature
+    assert first.feature.attributes[0].default == 1
+
+
+def test_streaming_checks_version(tmp_path):
+    library_file = tmp_path / "library.yaml"
+    library_file.write_text("version: 2\ntemplates: []\n", encoding="utf-8")
+
+    with pytest.raises(TemplateLibraryVersionError):
+        list(iter_feature_templates(library_file))
+
+
+def test_streaming_raises_syntax_error_for_missing_keys(tmp_path):
+    library_file = tmp_path / "library.yaml"
+    library_file.write_text("version: 1\ntemplates:\n  - group: No name\n", encoding="utf-8")
+
+    with pytest.raises(TemplateSyntaxError):
+        list(iter_feature_templates(library_file))
+
+
+def test_read_meta_only(write_template_library):
+    library_file = write_template_library(50)
+
+    assert read_template_library_meta(library_file) == parse_template_library_config(library_file).meta
+
+
+def test_read_meta_defined_after_templates(tmp_path):
+    library_file = tmp_path / "library.yaml"
+    library_file.write_text(
+        "version: 1\ntemplates:\n  - name: Template\n    feature: {layer: Osa-alue}\nmeta:\n  name: Last\n",
+        encoding="utf-8",
+    )
+
+    assert read_template_library_meta(library_file).name == "Last"
+
+
+def test_read_meta_checks_version_defined_after_meta(tmp_path):
+    library_file = tmp_path / "library.yaml"
+    library_file.write_text("meta:\n  name: First\ntemplates: []\nversion: 2\n", encoding="utf-8")
+
+    with pytest.raises(TemplateLibraryVersionError):
+        read_template_library_meta(library_file)
+
+
+def test_read_meta_raises_syntax_error_without_meta(tmp_path):
+    library_file = tmp_path / "library.yaml"
+    library_file.write_text("version: 1\ntemplates: []\n", encoding="utf-8")
+
+    with pytest.raises(TemplateSyntaxError):
+        read_template_library_meta(library_file)
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(not hasattr(yaml, "CSafeLoader"), reason="PyYAML is built without libyaml")
+def test_benchmark_yaml_loaders(write_template_library, record_property):
+    library_file = write_template_library(10_000)
+    content = library_file.read_text(encoding="utf-8")
+
+    timings = {}
+    for loader in (yaml.SafeLoader, yaml.CSafeLoader):
+        start = time.perf_counter()
+        config = TemplateLibraryConfig.from_dict(yaml.load(content, Loader=loader))
+        timings[loader.__name__] = time.perf_counter() - start
+        assert len(config.templates) == 10_000
+
+    start = time.perf_counter()
+    for _ in iter_feature_templates(library_file):
+        pass
+    timings["streaming"] = time.perf_counter() - start
+
+    for name, seconds in timings.items():
+        record_property(f"{name}_s", round(seconds, 3))
+    assert timings["CSafeLoader"] < timings["SafeLoader"]
+
+
+# Unslotted dataclasses with lists, like the configuration classes used to be
+LegacyTemplate = make_dataclass("LegacyTemplate", ["name", "group", "sub_group", "description", "feature"])
+LegacyFeature = make_dataclass("LegacyFeature", ["layer", "attributes", "child_features"])
+LegacyAttribute = make_dataclass("LegacyAttribute", ["attribute", "default", "description"])
+
+
+def _legacy_feature(data):
+    return LegacyFeature(
+        layer=data["layer"],
+        attributes=[
+            LegacyAttribute(attribute["attribute"], attribute.get("default"), attribute.get("description"))
+            for attribute in data["attributes"]
+        ],
+        child_features=[_legacy_feature(feature) for feature in data.get("child_features", [])],
+    )
+
+
+def _legacy_templates(data):
+    return [
+        LegacyTemplate(
+            template["name"],
+            template.get("group"),
+            template.get("sub_group"),
+            template.get("description"),
+            _legacy_feature(template["feature"]),
+        )
+        for template in data["templates"]
+    ]
+
+
+def _allocated_size(factory):
+    """Memory retained by the result of the factory, the loaded YAML data is freed before measuring"""
+    tracemalloc.start()
+    try:
+        result = factory()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+@pytest.mark.benchmark
+def test_benchmark_config_memory(write_template_library, record_property):
+    content = write_template_library(10_000).read_text(encoding="utf-8")
+
+    legacy_size = _allocated_size(lambda: _legacy_templates(load_yaml(content)))
+    compact_size = _allocated_size(lambda: TemplateLibraryConfig.from_dict(load_yaml(content)))
+
+    record_property("legacy_mb", round(legacy_size / 1e6, 1))
+    record_property("compact_mb", round(compact_size / 1e6, 1))
+    assert compact_size < legacy_size
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "",
+        "version: 1\nmeta: foo\ntemplates: []\n",
+        "- version: 1\n",
+        "version: 1\nmeta: {name: Kirjasto}\ntemplates: [{name: T, feature: {layer: L, attributes: null}}]\n",
+        "version: 1\nmeta: {name: Kirjasto}\ntemplates: [foo]\n",
+    ],
+)
+def test_malformed_libraries_raise_syntax_error(tmp_path, content):
+    path = tmp_path / "library.yaml"
+    path.write_text(content, encoding="utf-8")
+
+    with pytest.raises(TemplateSyntaxError):
+        parse_template_library_config(path)
+
+
+@pytest.mark.parametrize("content", ["", "version: 1\nmeta: foo\n", "- version: 1\n", "version: 1\nmeta: {name: 1}\n"])
+def test_read_meta_raises_syntax_error_for_malformed_libraries(tmp_path, content):
+    path = tmp_path / "library.yaml"
+    path.write_text(content, encoding="utf-8")
+
+    with pytest.raises(TemplateSyntaxError):
+        read_template_library_meta(path)
+
+
+def test_streaming_raises_syntax_error_for_malformed_templates(tmp_path):
+    path = tmp_path / "library.yaml"
+    path.write_text("version: 1\ntemplates: [{name: T, feature: {layer: L, attributes: null}}]\n", encoding="utf-8")
+
+    with pytest.raises(TemplateSyntaxError):
+        list(iter_feature_templates(path))
+
+
+def test_streamed_config_equals_parsed_config(write_template_library):
+    library_file = write_template_library(120)
+    batches = []
+
+    config = stream_template_library_config(library_file.read_bytes(), batches.append, batch_size=50)
+
+    assert config == parse_template_library_config(library_file)
+    assert [len(batch) for batch in batches] == [50, 50, 20]
+    assert sum(batches, ()) == config.templates
+
+
+def test_streamed_templates_are_not_passed_on_before_version():
+    batches = []
+    content = "templates: []\nmeta: {name: Kirjasto}\nversion: 1\n"
+
+    config = stream_template_library_config(content, batches.append)
+
+    assert config.meta.name == "Kirjasto"
+    assert batches == []
@@ -0,0 +1,53 @@
+import threading
+
+from qgis.PyQt.QtCore import QCoreApplication
+
+from arho_feature_template.core.template_library_cache import TemplateLibraryCache
+from arho_feature_template.core.template_library_config import read_template_library_meta
+from arho_feature_template.core.template_library_loader import TemplateLibraryLoadTask
+
+
+def test_libraries_are_loaded_in_file_order_skipping_malformed_files(tmp_path, write_template_library):
+    malformed_file = tmp_path / "malformed.yaml"
+    malformed_file.write_text("version: 1\nmeta: {name: [\n", encoding="utf-8")
+    empty_file = tmp_path / "empty.yaml"
+    empty_file.write_text("", encoding="utf-8")
+    config_files = [
+        write_template_library(30),
+        malformed_file,
+        write_template_library(1),
+        empty_file,
+        write_template_library(2),
+    ]
+    task = TemplateLibraryLoadTask("test", read_template_library_meta, config_files)
+    loaded = []
+    failed = []
+    task.library_loaded.connect(lambda config_file, meta: loaded.append((config_file, meta.name)))
+    task.library_failed.connect(lambda config_file, _: failed.append(config_file))
+
+    assert task.run()
+
+    assert loaded == [
+        (config_files[0], "Generated library 30"),
+        (config_files[2], "Generated library 1"),
+        (config_files[4], "Generated library 2"),
+    ]
+    assert failed == [malformed_file, empty_file]
+
+
+def test_templates_are_emitted_before_the_library(write_template_library, tmp_path):
+    config_file = write_template_library(10)
+    task = TemplateLibraryLoadTask(
+        "test", TemplateLibraryCache(tmp_path / "cache").load, [config_file], stream_templates=True
+    )
+    events = []
+    task.templates_loaded.connect(lambda _, templates: events.append(("templates", len(templates))))
+    task.library_loaded.connect(lambda _, config: events.append(("library", len(config.templates))))
+
+    # The signals are queued to the main thread like when the task manager runs the task
+    thread = threading.Thread(target=task.run)
+    thread.start()
+    thread.join()
+    QCoreApplication.processEvents()
+
+    assert events == [("templates", 10), ("library", 10)]
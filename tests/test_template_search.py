@@ -0,0 +1,113 @@
+import time
+
+import pytest
+
+from arho_feature_template.core.template_library_config import Attribute, Feature, FeatureTemplate
+from arho_feature_template.core.template_search import TemplateSearchIndex, TemplateTrigramIndex, normalize_text
+
+
+def _template(name, description=None, group=None, default=None):
+    return FeatureTemplate(
+        name=name,
+        group=group,
+        sub_group=None,
+        description=description,
+        feature=Feature(
+            layer="Osa-alue",
+            attributes=(Attribute(attribute="name", default=default, description=None),),
+            child_features=(),
+        ),
+    )
+
+
+@pytest.fixture
+def index():
+    return TemplateSearchIndex(
+        [
+            _template("Asuinrakennusten alue"),
+            _template("Pysäköintialue", "Autopaikat"),
+            _template("Rakennusala"),
+        ]
+    )
+
+
+def test_normalize_text_removes_finnish_diacritics():
+    assert normalize_text("Pysäköinti Åland") == "pysakointi aland"
+
+
+def test_empty_query_matches_all(index):
+    assert index.search("") == {0, 1, 2}
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    [
+        ("rak", {2}),
+        ("asuin alue", {0}),
+        ("ALUE", {0}),
+        ("pysakointi", {1}),
+        ("pysäk", {1}),
+        ("autop", {1}),
+        ("puisto", set()),
+    ],
+)
+def test_search_matches_token_prefixes(index, query, expected):
+    assert index.search(query) == expected
+
+
+@pytest.mark.parametrize(("query", "expected"), [("intialue", {1}), ("nnus", {0, 2}), ("paikat alue", {1})])
+def test_search_falls_back_to_parts_of_compound_words(index, query, expected):
+    assert index.search(query) == expected
+
+
+@pytest.fixture
+def trigram_index():
+    return TemplateTrigramIndex(
+        [
+            ("Asemakaava", [_template("Rakennusala"), _template("Korttelialue", group="Osa-alue")]),
+            ("Yleiskaava", [_template("Pysäköintialue", "Autopaikat"), _template("Puisto", default="rakennusala")]),
+        ]
+    )
+
+
+def _names(results):
+    return [result.template.name for result in results]
+
+
+def test_fuzzy_search_ranks_name_matches_first(trigram_index):
+    results = trigram_index.search("rakennusala")
+
+    assert _names(results) == ["Rakennusala", "Puisto"]
+    assert results[0].library_name == "Asemakaava"
+    assert results[0].score > results[1].score
+
+
+def test_fuzzy_search_tolerates_typos(trigram_index):
+    assert _names(trigram_index.search("pysakonti")) == ["Pysäköintialue"]
+
+
+def test_fuzzy_search_matches_prefixes_and_groups(trigram_index):
+    assert _names(trigram_index.search("osa")) == ["Korttelialue"]
+
+
+def test_fuzzy_search_ranks_templates_matching_more_tokens_first(trigram_index):
+    assert _names(trigram_index.search("puisto rakennusala")) == ["Puisto", "Rakennusala"]
+
+
+def test_fuzzy_search_limits_results(trigram_index):
+    assert len(trigram_index.search("a", limit=1)) == 1
+
+
+@pytest.mark.benchmark
+def test_benchmark_fuzzy_search_latency(generate_library_config, record_property):
+    config = generate_library_config(50_000)
+    index = TemplateTrigramIndex([(config.meta.name, config.templates)])
+
+    for query in ("rakennusala", "asuin alue", "pysakointi 123", "korttli", "ryhmä 3", "a"):
+        start = time.perf_counter()
+        results = index.search(query)
+        elapsed = time.perf_counter() - start
+
+        record_property(f"{query}_ms", round(elapsed * 1000, 2))
+        assert results
+        assert elapsed < 0.01
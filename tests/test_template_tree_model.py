@@ -0,0 +1,111 @@
+import pytest
+from qgis.PyQt.QtCore import QModelIndex, Qt
+
+from arho_feature_template.gui import template_tree_model
+from arho_feature_template.gui.template_tree_model import TEMPLATE_INDEX_ROLE, TEMPLATE_ROLE, TemplateTreeModel
+
+
+@pytest.fixture
+def model(generate_library_config):
+    return TemplateTreeModel(generate_library_config(200).templates)
+
+
+def _texts(model, parent=QModelIndex()):  # noqa: B008
+    return [model.index(row, 0, parent).data() for row in range(model.rowCount(parent))]
+
+
+def test_templates_are_grouped_by_group_and_sub_group(model):
+    groups = _texts(model)
+    assert groups == list(dict.fromkeys(template.group for template in model.templates))
+
+    group = model.index(0, 0)
+    assert group.data(TEMPLATE_ROLE) is None
+    assert model.parent(group) == QModelIndex()
+
+    templates = [template for template in model.templates if template.group == groups[0] and not template.sub_group]
+    rows = [model.index(row, 0, group) for row in range(model.rowCount(group))]
+    template_rows = [row for row in rows if row.data(TEMPLATE_ROLE) is not None]
+    assert [row.data(TEMPLATE_ROLE) for row in template_rows] == templates
+    assert all(model.templates[row.data(TEMPLATE_INDEX_ROLE)] is row.data(TEMPLATE_ROLE) for row in template_rows)
+    assert all(model.parent(row) == group for row in rows)
+
+
+def test_sub_groups_contain_their_templates(model):
+    group = model.index(0, 0)
+    sub_group = next(
+        model.index(row, 0, group)
+        for row in range(model.rowCount(group))
+        if model.index(row, 0, group).data(TEMPLATE_ROLE) is None
+    )
+
+    template_index = model.index(0, 0, sub_group)
+    template = template_index.data(TEMPLATE_ROLE)
+    assert template.name == template_index.data(Qt.DisplayRole)
+    assert (template.group, template.sub_group) == (group.data(), sub_group.data())
+    assert model.parent(template_index) == sub_group
+    assert not model.hasChildren(template_index)
+    assert model.rowCount(template_index) == 0
+
+
+def test_large_groups_are_fetched_in_batches(monkeypatch, generate_library_config):
+    monkeypatch.setattr(template_tree_model, "FETCH_BATCH_SIZE", 2)
+    model = TemplateTreeModel(generate_library_config(20).templates)
+    group = model.index(0, 0)
+    total_count = len(model._group(group).rows)  # noqa: SLF001
+
+    assert model.rowCount(group) == min(2, total_count)
+    while model.canFetchMore(group):
+        model.fetchMore(group)
+    assert model.rowCount(group) == total_count
+
+
+def test_fetch_all_fetches_every_group(monkeypatch, generate_library_config):
+    monkeypatch.setattr(template_tree_model, "FETCH_BATCH_SIZE", 1)
+    model = TemplateTreeModel(generate_library_config(50).templates)
+
+    model.fetch_all()
+
+    def count_templates(parent):
+        assert not model.canFetchMore(parent)
+        rows = [model.index(row, 0, parent) for row in range(model.rowCount(parent))]
+        return sum(count_templates(row) if row.data(TEMPLATE_ROLE) is None else 1 for row in rows)
+
+    assert count_templates(QModelIndex()) == len(model.templates)
+
+
+def test_invalid_templates_are_disabled(model):
+    group = model.index(0, 0)
+    template_index = next(
+        model.index(row, 0, group)
+        for row in range(model.rowCount(group))
+        if model.index(row, 0, group).data(TEMPLATE_ROLE) is not None
+    )
+    assert model.flags(template_index) & Qt.ItemIsEnabled
+
+    model.set_invalid_templates(frozenset({template_index.data(TEMPLATE_INDEX_ROLE)}))
+
+    assert not model.flags(template_index) & Qt.ItemIsEnabled
+    assert model.flags(group) & Qt.ItemIsEnabled
+
+
+def test_appended_templates_are_added_to_their_groups(monkeypatch, generate_library_config):
+    monkeypatch.setattr(template_tree_model, "FETCH_BATCH_SIZE", 3)
+    templates = generate_library_config(60).templates
+    model = TemplateTreeModel([])
+    inserted_counts = []
+    model.rowsInserted.connect(lambda _parent, first, last: inserted_counts.append(last - first + 1))
+
+    model.append_templates(templates[:20])
+    model.append_templates(templates[20:])
+    model.fetch_all()
+
+    expected = TemplateTreeModel(templates)
+    expected.fetch_all()
+
+    def tree(model, parent=QModelIndex()):  # noqa: B008
+        rows = [model.index(row, 0, parent) for row in range(model.rowCount(parent))]
+        return [(row.data(), row.data(TEMPLATE_INDEX_ROLE), tree(model, row)) for row in rows]
+
+    assert model.templates == list(templates)
+    assert tree(model) == tree(expected)
+    assert inserted_counts
@@ -0,0 +1,70 @@
+import pytest
+from qgis.core import QgsField
+from qgis.PyQt.QtCore import QVariant
+
+from arho_feature_template.core.layer_registry import LayerRegistry
+from arho_feature_template.core.template_library_config import Attribute, Feature, FeatureTemplate
+from arho_feature_template.core.template_validation import TemplateValidator
+
+
+@pytest.fixture
+def validator(project):
+    registry = LayerRegistry(project)
+    validator = TemplateValidator(registry)
+    yield validator
+    validator.unload()
+    registry.unload()
+
+
+def _uri(*field_names):
+    return "Polygon?crs=EPSG:3067" + "".join(f"&field={field_name}:string" for field_name in field_names)
+
+
+def _feature(layer, *attributes, child_features=()):
+    return Feature(
+        layer=layer,
+        attributes=tuple(Attribute(attribute=attribute, default=None, description=None) for attribute in attributes),
+        child_features=tuple(child_features),
+    )
+
+
+def _template(feature):
+    return FeatureTemplate(name="Template", group=None, sub_group=None, description=None, feature=feature)
+
+
+def test_checks_layers_and_fields_of_child_features(project, validator, add_layer):
+    add_layer(project, _uri("name"), "Osa-alue")
+    add_layer(project, _uri("name"), "plan_requlation_group")
+
+    templates = [
+        _template(_feature("Osa-alue", "name", child_features=[_feature("plan_requlation_group", "name")])),
+        _template(_feature("Osa-alue", "name", child_features=[_feature("plan_requlation", "name")])),
+        _template(_feature("Osa-alue", "type_of_underground_id")),
+        _template(_feature("Viivat")),
+    ]
+
+    assert validator.invalid_templates(templates) == {1, 2, 3}
+
+
+def test_results_are_updated_when_layers_or_fields_change(project, validator, add_layer):
+    changes = []
+    validator.validity_changed.connect(lambda: changes.append(True))
+    template = _template(_feature("Osa-alue", "name", "type_of_underground_id"))
+
+    assert not validator.is_valid(template)
+
+    layer = add_layer(project, _uri("name"), "Osa-alue")
+    assert changes
+    assert not validator.is_valid(template)
+
+    layer.dataProvider().addAttributes([QgsField("type_of_underground_id", QVariant.Int)])
+    layer.updateFields()
+    assert validator.is_valid(template)
+
+
+def test_virtual_fields_are_not_valid_attributes(project, validator, add_layer):
+    layer = add_layer(project, _uri("name"), "Osa-alue")
+    layer.addExpressionField('upper("name")', QgsField("upper_name", QVariant.String))
+
+    assert validator.is_valid(_template(_feature("Osa-alue", "name")))
+    assert not validator.is_valid(_template(_feature("Osa-alue", "upper_name")))
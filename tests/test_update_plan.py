@@ -0,0 +1,124 @@
+import pytest
+from qgis.core import QgsFeature, QgsGeometry, QgsProject, QgsRectangle, QgsVectorLayer
+
+from arho_feature_template.core.layer_registry import LayerRegistry
+from arho_feature_template.core.update_plan import LAYER_PLAN_ID_MAP, PlanFilterManager
+
+
+@pytest.fixture
+def plan_layers(qgis_new_project, qgis_iface):  # noqa: ARG001
+    layers = {}
+    for layer_name, field_name in LAYER_PLAN_ID_MAP.items():
+        layer = QgsVectorLayer(f"Polygon?crs=EPSG:3067&field={field_name}:string", layer_name, "memory")
+        features = []
+        for plan_id, x in (("a", 0), ("b", 10)):
+            feature = QgsFeature(layer.fields())
+            feature.setAttribute(field_name, plan_id)
+            feature.setGeometry(QgsGeometry.fromWkt(f"POLYGON(({x} 0, {x + 1} 0, {x + 1} 1, {x} 0))"))
+            features.append(feature)
+        layer.dataProvider().addFeatures(features)
+        QgsProject.instance().addMapLayer(layer)
+        layers[layer_name] = layer
+    return layers
+
+
+@pytest.fixture
+def manager(plan_layers):  # noqa: ARG001
+    registry = LayerRegistry(QgsProject.instance())
+    manager = PlanFilterManager(registry)
+    yield manager
+    manager.unload()
+    registry.unload()
+
+
+def test_show_plan_filters_all_plan_layers(manager, plan_layers):
+    manager.show_plan("a")
+
+    for layer_name, field_name in LAYER_PLAN_ID_MAP.items():
+        layer = plan_layers[layer_name]
+        assert layer.subsetString() == f"\"{field_name}\" = 'a'"
+        assert layer.featureCount() == 1
+
+
+def test_show_plan_skips_layers_already_showing_the_plan(manager, plan_layers):
+    manager.show_plan("a")
+    changed_layers = []
+    for layer in plan_layers.values():
+        layer.subsetStringChanged.connect(lambda layer=layer: changed_layers.append(layer))
+
+    manager.show_plan("a")
+
+    assert changed_layers == []
+
+
+def test_show_plan_restores_the_extents_of_recent_plans(manager, plan_layers):
+    layer = plan_layers["Kaava"]
+    manager.show_plan("a")
+    assert layer.extent() == QgsRectangle(0, 0, 1, 1)
+    # The extent of a plan is remembered when the plan is left
+    layer.setExtent(QgsRectangle(0, 0, 5, 5))
+
+    manager.show_plan("b")
+    assert layer.extent() == QgsRectangle(10, 0, 11, 1)
+
+    manager.show_plan("a")
+    assert layer.extent() == QgsRectangle(0, 0, 5, 5)
+
+
+def test_committed_edits_drop_the_remembered_extents(manager, plan_layers):
+    layer = plan_layers["Kaava"]
+    manager.show_plan("a")
+    layer.setExtent(QgsRectangle(0, 0, 5, 5))
+    manager.show_plan("b")
+
+    layer.startEditing()
+    [feature] = layer.getFeatures()
+    layer.changeGeometry(feature.id(), QgsGeometry.fromWkt("POLYGON((10 0, 12 0, 12 1, 10 0))"))
+    assert layer.commitChanges()
+    manager.show_plan("a")
+
+    assert layer.extent() == QgsRectangle(0, 0, 1, 1)
+
+
+def test_clear_filters_clears_only_plugin_filters_and_restores_them(manager, plan_layers):
+    user_layer = QgsVectorLayer("Point?crs=EPSG:3067&field=name:string", "Käyttäjän taso", "memory")
+    user_layer.setSubsetString("\"name\" = 'x'")
+    QgsProject.instance().addMapLayer(user_layer)
+    manager.show_plan("a")
+    # Filters changed by the user are left alone
+    plan_layers["Viivat"].setSubsetString("\"plan_id\" = 'b'")
+
+    manager.clear_filters()
+
+    assert plan_layers["Kaava"].subsetString() == ""
+    assert plan_layers["Viivat"].subsetString() == "\"plan_id\" = 'b'"
+    assert user_layer.subsetString() == "\"name\" = 'x'"
+
+    manager.restore_filters()
+
+    assert plan_layers["Kaava"].subsetString() == "\"id\" = 'a'"
+    assert plan_layers["Kaava"].extent() == QgsRectangle(0, 0, 1, 1)
+    assert plan_layers["Viivat"].subsetString() == "\"plan_id\" = 'b'"
+
+
+def test_filters_saved_in_the_project_are_cleared(plan_layers):
+    for layer_name, field_name in LAYER_PLAN_ID_MAP.items():
+        plan_layers[layer_name].setSubsetString(f"\"{field_name}\" = 'a'")
+    plan_layers["Viivat"].setSubsetString("\"plan_id\" = 'a' OR \"plan_id\" = 'b'")
+    registry = LayerRegistry(QgsProject.instance())
+    manager = PlanFilterManager(registry)
+
+    manager.clear_filters()
+    # Clearing again does not forget the filters to restore
+    manager.clear_filters()
+
+    assert plan_layers["Kaava"].subsetString() == ""
+    assert plan_layers["Osa-alue"].subsetString() == ""
+    assert plan_layers["Viivat"].subsetString() == "\"plan_id\" = 'a' OR \"plan_id\" = 'b'"
+
+    manager.restore_filters()
+
+    assert plan_layers["Kaava"].subsetString() == "\"id\" = 'a'"
+    assert plan_layers["Osa-alue"].subsetString() == "\"plan_id\" = 'a'"
+    manager.unload()
+    registry.unload()